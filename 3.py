@@ -28,6 +28,7 @@ from datetime import datetime, timedelta, date
 import shutil
 import difflib
 import plotly.graph_objects as go # Görsel grafikler için gerekli
+from telemetry import traced_generate  # Her Gemini çağrısı telemetriye yazılır
 from PIL import Image
 
 
@@ -305,7 +306,7 @@ def perform_ocr_gemini(file_bytes, mime_type, api_key, prompt_text="Bu dosyanın
     for model_name in available_models:
         try:
             model = genai.GenerativeModel(model_name)
-            response = model.generate_content([prompt_text, image_part])
+            response = traced_generate(model, [prompt_text, image_part])
             return response.text
         except: continue
     return "Analiz Başarısız."
@@ -334,7 +335,7 @@ def get_ai_response(prompt, api_key):
     for model_name in candidate_models:
         try:
             model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt)
+            response = traced_generate(model, prompt)
             return response.text 
         except: continue 
     
@@ -343,7 +344,7 @@ def get_ai_response(prompt, api_key):
             if 'generateContent' in m.supported_generation_methods:
                 try:
                     model = genai.GenerativeModel(m.name)
-                    response = model.generate_content(prompt)
+                    response = traced_generate(model, prompt)
                     return response.text
                 except: continue
     except: pass
@@ -397,7 +398,7 @@ def get_gemini_text_response(prompt, api_key):
         # 3. ADIM: Seçilen modelle üretimi yap
         try:
             model = genai.GenerativeModel(selected_model)
-            response = model.generate_content(prompt)
+            response = traced_generate(model, prompt)
             return response.text
         except Exception as e:
             return f"Model Hatası ({selected_model}): {str(e)}"
@@ -672,7 +673,7 @@ def render_deepfake_module(api_key):
                             3. Güvenilirlik puanı (0-100).
                             ÇIKTI: GÜVEN_SKORU: [Sayı] ...
                             """
-                            response = model.generate_content([prompt, image])
+                            response = traced_generate(model, [prompt, image])
                             report_text = response.text
 
                         # --- SES ANALİZİ ---
@@ -694,7 +695,7 @@ def render_deepfake_module(api_key):
                                     
                                     prompt = f"""Ses Transkripti: "{text_output}". Bu konuşma doğal mı, kurgu mu? Puanla (0-100). ÇIKTI: GÜVEN_SKORU: [Sayı] ..."""
                                     model_text = genai.GenerativeModel('gemini-pro')
-                                    response = model_text.generate_content(prompt)
+                                    response = traced_generate(model_text, prompt)
                                     report_text = response.text
                             except ImportError:
                                 st.error("Ses analizi için 'SpeechRecognition' kütüphanesi yüklü değil.")
@@ -835,7 +836,7 @@ def render_osint_module(api_key):
                     Kısa ve net cevap ver.
                     """
                     with st.spinner("Yapay zeka veriyi yorumluyor..."):
-                        response = model.generate_content(prompt)
+                        response = traced_generate(model, prompt)
                         st.write(response.text)
 
 def render_precedent_alert_module(api_key):
@@ -919,7 +920,7 @@ def render_precedent_alert_module(api_key):
                         AKSİYON: [Öneri]
                         """
                         
-                        response = model.generate_content(prompt)
+                        response = traced_generate(model, prompt)
                         
                         st.divider()
                         st.markdown("### 🚨 Tespit Edilen Riskler ve Fırsatlar")
@@ -992,7 +993,7 @@ def render_owner_mode(api_key):
                     model = genai.GenerativeModel(active_model)
                     
                     try:
-                        response = model.generate_content(["Bu resimdeki yazıları oku:", image])
+                        response = traced_generate(model, ["Bu resimdeki yazıları oku:", image])
                         text = f"[RESİM İÇERİĞİ]:\n{response.text}"
                     except:
                         text = "[RESİM OKUNAMADI: Seçilen model görsel desteklemiyor olabilir.]"
@@ -1068,7 +1069,7 @@ def render_owner_mode(api_key):
                             context = st.session_state.web_memory[:90000]
                             final_prompt = f"VERİLER:\n{context}\n\nSORU: {prompt}"
                             
-                            response = model.generate_content(final_prompt)
+                            response = traced_generate(model, final_prompt)
                             st.markdown(response.text)
                             st.session_state.web_history.append({"role": "assistant", "content": response.text})
                         except Exception as e:
@@ -1117,7 +1118,7 @@ def render_property_genealogy(api_key):
                     # Otomatik model seçimi
                     active_model = get_best_model()
                     model = genai.GenerativeModel(active_model)
-                    response = model.generate_content(["Bu belgedeki isimleri ve tarihleri oku:", image])
+                    response = traced_generate(model, ["Bu belgedeki isimleri ve tarihleri oku:", image])
                     text = response.text
             else:
                 text = file_bytes.decode("utf-8", errors='ignore')
@@ -1165,7 +1166,7 @@ def render_property_genealogy(api_key):
                     FORMAT: [{{"yil": "...", "kimden": "...", "kime": "...", "islem": "...", "durum": "Aktif/Pasif/Kritik"}}]
                     SADECE JSON VER.
                     """
-                    response = model.generate_content(prompt)
+                    response = traced_generate(model, prompt)
                     clean_json = response.text.replace("```json", "").replace("```", "").strip()
                     st.session_state.prop_history = json.loads(clean_json)
                     status_box.success(f"Tamamlandı! (Kullanılan Model: {active_model_name})")
@@ -1226,7 +1227,7 @@ def render_property_genealogy(api_key):
                     """
                     
                     # stream=True ile parça parça alıyoruz
-                    response = model.generate_content(prompt, stream=True)
+                    response = traced_generate(model, prompt, stream=True)
                     
                     full_text = ""
                     for chunk in response:
@@ -1387,7 +1388,7 @@ def render_limitations_heatmap(api_key):
                     4. Faiz başlangıç tarihleri için stratejik bir öneri ver.
                     """
                     
-                    response = model.generate_content(prompt, stream=True)
+                    response = traced_generate(model, prompt, stream=True)
                     
                     full_text = ""
                     for chunk in response:
@@ -1521,7 +1522,7 @@ def render_conflict_scanner(api_key):
                         4. Hukuki Tavsiye: Bu bağlantıyı mahkemede nasıl delillendiririm?
                         """
                         
-                        response = model.generate_content(prompt, stream=True)
+                        response = traced_generate(model, prompt, stream=True)
                         
                         full_text = ""
                         for chunk in response:
@@ -1598,7 +1599,7 @@ def render_mediation_checker(api_key):
                     **💡 Kısa Özet:** ...
                     """
                     
-                    response = model.generate_content(prompt, stream=True)
+                    response = traced_generate(model, prompt, stream=True)
                     
                     full_text = ""
                     for chunk in response:
@@ -1749,7 +1750,7 @@ def render_forensic_map(api_key):
                         4. SONUÇ: "Bu kavşakta son 1 yılda çok kaza olduysa, kusur sürücüde değil yoldadır" tezini savunacak hukuki argümanlar yaz.
                         """
                         
-                        response = model.generate_content(prompt)
+                        response = traced_generate(model, prompt)
                         st.session_state.ai_map_result = response.text
                         status_box.empty() # Yükleniyor yazısını kaldır
                         
@@ -1866,7 +1867,7 @@ def render_temporal_law_machine(api_key):
                     - Davayı kazanmak için mahkemeye "Olay tarihindeki mevzuat uygulanmalıdır" itirazını nasıl sunmalıyım?
                     """
                     
-                    response = model.generate_content(prompt, stream=True)
+                    response = traced_generate(model, prompt, stream=True)
                     
                     full_text = ""
                     status_text.empty() # Yazıyı temizle
@@ -1982,7 +1983,7 @@ def render_expert_report_auditor(api_key):
                     - "Ek Rapor" veya "Yeni Bilirkişi Heyeti" talep etmek için gerekçe oluştur.
                     """
                     
-                    response = model.generate_content(prompt, stream=True)
+                    response = traced_generate(model, prompt, stream=True)
                     
                     full_text = ""
                     for chunk in response:
@@ -2136,20 +2137,20 @@ def render_corporate_memory(api_key):
                                     # Eğer model vision desteklemiyorsa flash'a zorla
                                     if "flash" not in active_model_name and "1.5" not in active_model_name:
                                         model_vision = genai.GenerativeModel("models/gemini-1.5-flash")
-                                        response = model_vision.generate_content([prompt, image_data])
+                                        response = traced_generate(model_vision, [prompt, image_data])
                                     else:
-                                        response = model.generate_content([prompt, image_data])
+                                        response = traced_generate(model, [prompt, image_data])
                                 else:
                                     if len(content) > 5:
-                                        response = model.generate_content(prompt + f"\n\nMETİN:\n{content[:20000]}")
+                                        response = traced_generate(model, prompt + f"\n\nMETİN:\n{content[:20000]}")
                             except Exception as api_err:
                                 st.warning(f"Model hatası ({active_model_name}), yedek model deneniyor...")
                                 # Hata verirse kesin çalışan Flash modelini dene
                                 backup_model = genai.GenerativeModel("models/gemini-1.5-flash")
                                 if is_image:
-                                    response = backup_model.generate_content([prompt, image_data])
+                                    response = traced_generate(backup_model, [prompt, image_data])
                                 else:
-                                    response = backup_model.generate_content(prompt + f"\n\nMETİN:\n{content[:20000]}")
+                                    response = traced_generate(backup_model, prompt + f"\n\nMETİN:\n{content[:20000]}")
 
                             # Sonucu İşle
                             if response and response.text:
@@ -2202,7 +2203,7 @@ def render_corporate_memory(api_key):
                         model = genai.GenerativeModel(active_model)
                         context = st.session_state.archive_df.to_json(orient="records", force_ascii=False)
                         prompt = f"VERİTABANI:\n{context}\n\nSORU: {query}\n\nBu veritabanına göre cevapla:"
-                        st.markdown(model.generate_content(prompt).text)
+                        st.markdown(traced_generate(model, prompt).text)
                     except Exception as e:
                         st.error(f"Hata: {e}")
 
@@ -23,6 +23,8 @@ import json
 import os
 from PIL import Image
 from PIL.ExifTags import TAGS  # <--- Bu çok önemli, eksikse hata verir
+from ai_gateway import generate_text
+from ai_executor import QuotaBudgetExceeded
 import time
 from datetime import datetime, timedelta, date
 import shutil
@@ -500,28 +502,18 @@ def read_excel_file(file_bytes):
         return f"Excel Hatası: {str(e)}"
 
 # --- AKILLI AI MOTORU ---
+def budget_message(error):
+    """Günlük istek bütçesi dolduğunda kullanıcıya gösterilen metin"""
+    return f"⏳ Günlük AI istek bütçesi doldu: {error} Yarın tekrar deneyin veya yöneticinize başvurun."
+
 def get_ai_response(prompt, api_key):
     if not api_key: return "Lütfen API Anahtarı giriniz."
-    genai.configure(api_key=api_key)
-    candidate_models = ['gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-1.0-pro', 'gemini-pro']
-    
-    for model_name in candidate_models:
-        try:
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt)
-            return response.text 
-        except: continue 
-    
+    # Model sırası, yedekleme ve kalıcı yanıt önbelleği ai_gateway içinde
     try:
-        for m in genai.list_models():
-            if 'generateContent' in m.supported_generation_methods:
-                try:
-                    model = genai.GenerativeModel(m.name)
-                    response = model.generate_content(prompt)
-                    return response.text
-                except: continue
-    except: pass
-    return "Hata: AI yanıt veremedi."
+        res = generate_text(prompt, api_key)
+    except QuotaBudgetExceeded as e:
+        return budget_message(e)
+    return res if res is not None else "Hata: AI yanıt veremedi."
 
 # ==========================================
 # YENİ EKLENEN MODÜLLER (CHECK-UP & ZAMAN MAKİNESİ)
@@ -26,9 +26,27 @@ from PIL.ExifTags import TAGS  # <--- Bu çok önemli, eksikse hata verir
 import time
 from datetime import datetime, timedelta, date
 import shutil
+from collections import Counter
 import difflib
 import plotly.graph_objects as go # Görsel grafikler için gerekli
 from PIL import Image
+from model_registry import pick_best_model, model_candidates, registry as model_registry
+from model_health import model_health
+from response_cache import response_cache
+from ai_gateway import generate_text, stream_text, open_context, generate_with_context
+from context_cache import context_cache
+from single_flight import single_flight
+from semantic_cache import semantic_cache
+from keyword_matcher import get_matcher
+from map_reduce import fits_single_prompt, reduce_prompt, run_map, split_documents
+from statute_index import ArticleRef, detect_law_number, detect_title, parse_reference, statute_index
+from citation_graph import citation_graph, extract_citations, impact_dot, node_label
+from archive_index import (archive_digest, build_archive, format_context, hit_sources, open_archive,
+                           open_saved_archive, saved_archives, search_archive)
+from telemetry import llm_module, traced_generate, telemetry_store
+from ai_executor import run_parallel, DEFAULT_WORKERS, QuotaBudgetExceeded, scheduler_stats
+from gemini_client import gemini_model
+from context_packer import pack_context
 
 
 
@@ -277,7 +295,6 @@ def speech_to_text(audio_bytes):
 # --- MULTIMODAL VE OCR FONKSİYONLARI ---
 def perform_ocr_gemini(file_bytes, mime_type, api_key, prompt_text="Bu dosyanın içeriğini tam olarak metne dök."):
     if not api_key: return "API Key Yok"
-    genai.configure(api_key=api_key)
     
     if mime_type in ['image/tiff', 'image/tif']:
         try:
@@ -290,25 +307,13 @@ def perform_ocr_gemini(file_bytes, mime_type, api_key, prompt_text="Bu dosyanın
         except Exception as e:
             return f"TIFF Dönüştürme Hatası: {str(e)}"
 
-    available_models = []
-    try:
-        for m in genai.list_models():
-            if 'generateContent' in m.supported_generation_methods:
-                if '1.5' in m.name or 'vision' in m.name:
-                    available_models.append(m.name)
-    except: pass
-    
-    if not available_models: available_models = ['models/gemini-1.5-flash', 'models/gemini-1.5-pro']
-
+    # Ses/Video için ses destekli, diğerleri için görsel destekli modeller (önbellekten)
+    capability = "audio" if mime_type.startswith(("audio/", "video/")) else "vision"
     image_part = {"mime_type": mime_type, "data": file_bytes.getvalue()}
     
-    for model_name in available_models:
-        try:
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content([prompt_text, image_part])
-            return response.text
-        except: continue
-    return "Analiz Başarısız."
+    # Aynı dosya + prompt daha önce okunduysa kalıcı önbellekten döner
+    res = generate_text(prompt_text, api_key, attachments=[image_part], capability=capability)
+    return res if res is not None else "Analiz Başarısız."
 
 def extract_text_from_docx(file_bytes):
     try:
@@ -325,29 +330,178 @@ def read_excel_file(file_bytes):
     except Exception as e:
         return f"Excel Hatası: {str(e)}"
 
+# --- BAĞLAM BÜTÇELERİ (token) ---
+# Eski karakter kesimlerinin (~3.3 karakter/token) karşılığı
+BUDGET_DOC_CHAT = 6000        # Tek belge sohbeti / dilekçe (eski [:20000])
+BUDGET_CORPUS = 150000        # Dalgıç / arşiv (eski [:500000])
+BUDGET_ASSISTANT = 30000      # Sesli asistan dosyaları (eski [:100000])
+BUDGET_WEB_MEMORY = 27000     # Patron modu web hafızası (eski [:90000])
+BUDGET_LONG_DOC = 15000       # Uzun tek belge analizi (eski [:50000])
+BUDGET_GENEALOGY = 12000      # Soy ağacı metni (eski [:40000])
+BUDGET_REPORT = 3000          # Bilirkişi raporu (eski [:10000])
+BUDGET_UYAP_DOSYA = 7500      # UYAP dosyası başına tüm evraklar (eski 5 x [:5000])
+
+def pack_for_prompt(text, budget, query=None):
+    """Metni token bütçesine sığdırır; kırpıldıysa neyin dışarıda kaldığını not düşer."""
+    packed = pack_context(text or "", budget, query=query)
+    if packed.truncated:
+        st.caption(f"✂️ {packed.summary()}")
+    return packed.text
+
 # --- AKILLI AI MOTORU ---
 def get_ai_response(prompt, api_key):
     if not api_key: return "Lütfen API Anahtarı giriniz."
-    genai.configure(api_key=api_key)
-    candidate_models = ['gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-1.0-pro', 'gemini-pro']
-    
-    for model_name in candidate_models:
-        try:
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt)
-            return response.text 
-        except: continue 
-    
+    # Model sırası, yedekleme ve kalıcı yanıt önbelleği ai_gateway içinde
     try:
-        for m in genai.list_models():
-            if 'generateContent' in m.supported_generation_methods:
-                try:
-                    model = genai.GenerativeModel(m.name)
-                    response = model.generate_content(prompt)
-                    return response.text
-                except: continue
-    except: pass
-    return "Hata: AI yanıt veremedi."
+        res = generate_text(prompt, api_key)
+    except QuotaBudgetExceeded as e:
+        return budget_message(e)
+    return res if res is not None else "Hata: AI yanıt veremedi."
+
+def budget_message(error):
+    """Günlük istek bütçesi dolduğunda kullanıcıya gösterilen metin"""
+    return f"⏳ Günlük AI istek bütçesi doldu: {error} Yarın tekrar deneyin veya yöneticinize başvurun."
+
+def ask_semantic(scope, question, prompt, api_key):
+    """Benzer soru daha önce yanıtlandıysa (anlamsal önbellek) o cevabı, yoksa AI yanıtını döndürür.
+    (cevap, önbellek notu) ikilisi döner; not yalnızca önbellekten gelince doludur."""
+    if not api_key: return "Lütfen API Anahtarı giriniz.", ""
+    vector = semantic_cache.embed(question, api_key)
+    hit = semantic_cache.lookup(scope, question, api_key, vector=vector)
+    if hit is not None:
+        note = (f"♻️ Önbellekten: benzer soru (%{hit.similarity * 100:.0f} benzerlik, "
+                f"{datetime.fromtimestamp(hit.created).strftime('%d.%m.%Y')}): “{hit.question[:120]}”")
+        return hit.answer, note
+    res = get_ai_response(prompt, api_key)
+    if not res.startswith(("Hata", "⏳", "Lütfen")):
+        semantic_cache.put(scope, question, res, api_key, vector=vector)
+    return res, ""
+
+def ask_with_context(question, context_text, api_key, inline_budget, system_instruction=None):
+    """Çok turlu sohbet: bağlam bir kez açılır (mümkünse sunucu önbelleğine yüklenir),
+    sonraki turlarda yalnızca soru gönderilir."""
+    if not api_key: return "Lütfen API Anahtarı giriniz."
+    handle = open_context(api_key, context_text or "", system_instruction)
+    if handle.note: st.caption(f"✂️ {handle.note}")
+    if not handle.remote and handle.tokens > inline_budget:
+        st.caption(f"✂️ Bağlam soruya göre ~{inline_budget:,} tokene paketlendi.")
+    try:
+        res = generate_with_context(question, handle, api_key, inline_budget=inline_budget)
+    except QuotaBudgetExceeded as e:
+        return budget_message(e)
+    return res if res is not None else "Hata: AI yanıt veremedi."
+
+def stream_ai_response(prompt, api_key, box_class=None, keep=False):
+    """get_ai_response'un akışlı sürümü: yanıtı geldikçe ekrana yazar, tam metni döndürür.
+    keep=False ise akış alanı sonunda temizlenir (sonuç session_state'ten çizilir).
+    Akış yarıda kesilirse eksik metin uyarıyla ekranda kalır, boş metin döner."""
+    if not api_key: return "Lütfen API Anahtarı giriniz."
+    placeholder = st.empty()
+    placeholder.info("AI yanıtı bekleniyor...")
+    stream = stream_text(prompt, api_key)
+    full_text = ""
+    for piece in stream:
+        full_text += piece
+        placeholder.markdown(full_text + "▌")
+    if full_text and stream.error:
+        # Yarıda kesilen yanıt ekranda bırakılır ama tamamlanmış sonuç olarak döndürülmez
+        placeholder.markdown(full_text)
+        st.warning(f"⚠️ Yanıt yarıda kesildi ({stream.error}). Gösterilen metin eksiktir; lütfen tekrar deneyin.")
+        return ""
+    if not full_text:
+        full_text = budget_message(stream.error) if isinstance(stream.error, QuotaBudgetExceeded) else "Hata: AI yanıt veremedi."
+    if not keep:
+        placeholder.empty()
+    elif box_class:
+        placeholder.markdown(f"<div class='{box_class}'>{full_text}</div>", unsafe_allow_html=True)
+    else:
+        placeholder.markdown(full_text)
+    return full_text
+
+def render_ai_diagnostics():
+    """Model devre kesicileri, model listesi ve yanıt önbelleği durumu (sidebar)."""
+    with st.expander("🩺 AI Teşhis Paneli"):
+        st.markdown("**Model Sağlığı (Devre Kesici)**")
+        health_rows = model_health.snapshot()
+        if health_rows: st.dataframe(pd.DataFrame(health_rows), use_container_width=True, hide_index=True)
+        else: st.caption("Henüz model çağrısı yapılmadı.")
+
+        st.markdown("**Model Listesi Önbelleği**")
+        registry_rows = model_registry.stats()
+        if registry_rows: st.dataframe(pd.DataFrame(registry_rows), use_container_width=True, hide_index=True)
+        else: st.caption("Henüz model listelenmedi.")
+
+        cache_stats = response_cache.stats()
+        st.markdown("**Yanıt Önbelleği**")
+        st.caption(f"İsabet: {cache_stats['hits']} · Iskalama: {cache_stats['misses']} · "
+                   f"Oran: %{cache_stats['hit_ratio'] * 100:.0f} · Kayıt: {cache_stats['entries']} · "
+                   f"Boyut: {cache_stats['bytes'] / 1024 / 1024:.1f} MB")
+
+        ctx_stats = context_cache.stats()
+        st.markdown("**Bağlam Önbelleği (Sohbet)**")
+        st.caption(f"Tanıtıcı: {ctx_stats['tanitici']} · Sunucuda: {ctx_stats['sunucuda']} · "
+                   f"Yükleme: {ctx_stats['yukleme']} · Hatalı yükleme: {ctx_stats['yukleme_hatasi']} · "
+                   f"Kullanım: {ctx_stats['kullanim']}")
+
+        sem_stats = semantic_cache.stats()
+        st.markdown("**Anlamsal Soru Önbelleği (Bana Sor / İçtihat)**")
+        st.caption(f"Kayıt: {sem_stats['kayit']} · İsabet: {sem_stats['isabet']} · Iskalama: {sem_stats['iskalama']} · "
+                   f"Oran: %{sem_stats['oran'] * 100:.0f} · Eşik: {sem_stats['esik']}")
+
+        flight_stats = single_flight.stats()
+        st.markdown("**Eşzamanlı İstek Birleştirme**")
+        st.caption(f"Süren: {flight_stats['suren']} · Gönderilen: {flight_stats['lider']} · "
+                   f"Birleştirilen (tekrar gönderilmeyen): {flight_stats['birlestirilen']}")
+
+        st.markdown("**İstek Kuyruğu (Öncelik / Bütçe)**")
+        queue_rows = scheduler_stats()
+        if queue_rows: st.dataframe(pd.DataFrame(queue_rows), use_container_width=True, hide_index=True)
+        else: st.caption("Henüz sıraya giren istek yok.")
+
+        if st.button("♻️ Devreleri ve Model Listesini Sıfırla"):
+            model_health.reset()
+            model_registry.invalidate()
+            st.rerun()
+
+def render_ai_telemetry_dashboard():
+    """Yönetim paneli: modül başına AI çağrı hacmi, p50/p95 gecikme, token ve önbellek oranı."""
+    st.subheader("📈 AI Telemetri")
+    st.caption("Her Gemini çağrısı modül (sekme), model, bayt, token, gecikme, TTFT, tekrar ve önbellek sonucuyla kaydedilir.")
+    pencereler = {"Son 1 saat": 3600, "Son 24 saat": 86400, "Son 7 gün": 7 * 86400, "Son 30 gün": 30 * 86400}
+    secim = st.selectbox("Zaman aralığı", list(pencereler), index=1, key="telemetri_pencere")
+    since = time.time() - pencereler[secim]
+
+    ozet = telemetry_store.summary(since)
+    if not ozet:
+        st.info("Bu aralıkta kayıtlı AI çağrısı yok.")
+        return
+
+    df = pd.DataFrame(ozet)
+    toplam = int(df["cagri"].sum())
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Toplam Çağrı", toplam)
+    k2.metric("En Yavaş Modül (p95)", f"{df['p95_sn'].max():.1f} sn", df.iloc[0]["modul"], delta_color="off")
+    k3.metric("Token (Giriş / Çıkış)", f"{int(df['giris_token'].sum()):,} / {int(df['cikis_token'].sum()):,}")
+    k4.metric("Hata", int(df["hata"].sum()))
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(name="p50", x=df["modul"], y=df["p50_sn"]))
+    fig.add_trace(go.Bar(name="p95", x=df["modul"], y=df["p95_sn"]))
+    fig.update_layout(barmode="group", height=350, yaxis_title="Gecikme (sn)", margin=dict(t=20, b=20))
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.markdown("**Modül Bazında Özet**")
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+    with st.expander("Son 100 Çağrı"):
+        son = pd.DataFrame(telemetry_store.events(since, limit=100))
+        if not son.empty:
+            son["ts"] = pd.to_datetime(son["ts"], unit="s")
+        st.dataframe(son, use_container_width=True, hide_index=True)
+
+    if st.button("🗑️ Telemetri Kayıtlarını Temizle"):
+        telemetry_store.clear()
+        st.rerun()
 
 # ==========================================
 # YENİ EKLENEN MODÜLLER (CHECK-UP & ZAMAN MAKİNESİ)
@@ -358,46 +512,14 @@ def get_gemini_text_response(prompt, api_key):
     if not api_key: return "Lütfen API Anahtarınızı giriniz."
     
     try:
-        genai.configure(api_key=api_key)
         
-        # 1. ADIM: Kullanıcının erişebildiği modelleri listele
-        available_models = []
-        try:
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    available_models.append(m.name)
-        except Exception as e:
-            # Listeleme hatası olursa manuel listeye dön
-            available_models = ["models/gemini-1.5-flash", "models/gemini-pro", "gemini-1.5-flash"]
-
-        # 2. ADIM: En iyi modeli seç (Hız > Kalite sıralaması)
-        selected_model = None
-        
-        # Öncelik 1: Flash modeller (Hızlı)
-        for m in available_models:
-            if 'flash' in m.lower():
-                selected_model = m
-                break
-        
-        # Öncelik 2: Pro modeller (Eğer flash yoksa)
-        if not selected_model:
-            for m in available_models:
-                if 'pro' in m.lower() and 'vision' not in m.lower():
-                    selected_model = m
-                    break
-        
-        # Öncelik 3: Listede ne varsa ilki
-        if not selected_model and available_models:
-            selected_model = available_models[0]
-            
-        # Hiçbiri yoksa son çare
-        if not selected_model:
-            selected_model = "models/gemini-1.5-flash"
+        # 1-2. ADIM: Erişilebilir modeller önbellekten gelir, en iyisi seçilir (Hız > Kalite)
+        selected_model = pick_best_model(api_key)
 
         # 3. ADIM: Seçilen modelle üretimi yap
         try:
-            model = genai.GenerativeModel(selected_model)
-            response = model.generate_content(prompt)
+            model = gemini_model(api_key, selected_model)
+            response = traced_generate(model, prompt)
             return response.text
         except Exception as e:
             return f"Model Hatası ({selected_model}): {str(e)}"
@@ -640,12 +762,8 @@ def render_deepfake_module(api_key):
                 else:
                     with st.spinner("Dosya bit-bit inceleniyor, metadata taranıyor ve AI analizi yapılıyor..."):
                         
-                        genai.configure(api_key=api_key)
-                        # Model seçimi (Hata verirse Pro'ya düş)
-                        try:
-                            model = genai.GenerativeModel('gemini-1.5-flash')
-                        except:
-                            model = genai.GenerativeModel('gemini-pro-vision')
+                        # Model seçimi (Görsel destekli en iyi model)
+                        model = gemini_model(api_key, pick_best_model(api_key, "vision"))
                         
                         report_text = ""
                         fake_score = 0
@@ -672,7 +790,7 @@ def render_deepfake_module(api_key):
                             3. Güvenilirlik puanı (0-100).
                             ÇIKTI: GÜVEN_SKORU: [Sayı] ...
                             """
-                            response = model.generate_content([prompt, image])
+                            response = traced_generate(model, [prompt, image])
                             report_text = response.text
 
                         # --- SES ANALİZİ ---
@@ -693,8 +811,8 @@ def render_deepfake_module(api_key):
                                     text_output = r.recognize_google(audio_data, language="tr-TR")
                                     
                                     prompt = f"""Ses Transkripti: "{text_output}". Bu konuşma doğal mı, kurgu mu? Puanla (0-100). ÇIKTI: GÜVEN_SKORU: [Sayı] ..."""
-                                    model_text = genai.GenerativeModel('gemini-pro')
-                                    response = model_text.generate_content(prompt)
+                                    model_text = gemini_model(api_key, pick_best_model(api_key))
+                                    response = traced_generate(model_text, prompt)
                                     report_text = response.text
                             except ImportError:
                                 st.error("Ses analizi için 'SpeechRecognition' kütüphanesi yüklü değil.")
@@ -821,8 +939,7 @@ def render_osint_module(api_key):
                 if not api_key:
                     st.error("API Anahtarı gerekli.")
                 else:
-                    genai.configure(api_key=api_key)
-                    model = genai.GenerativeModel('gemini-pro')
+                    model = gemini_model(api_key, pick_best_model(api_key))
                     prompt = f"""
                     GÖREV: Bir OSINT (Açık Kaynak İstihbaratı) uzmanısın.
                     HEDEF KİŞİ: {target_name}
@@ -835,7 +952,7 @@ def render_osint_module(api_key):
                     Kısa ve net cevap ver.
                     """
                     with st.spinner("Yapay zeka veriyi yorumluyor..."):
-                        response = model.generate_content(prompt)
+                        response = traced_generate(model, prompt)
                         st.write(response.text)
 
 def render_precedent_alert_module(api_key):
@@ -884,25 +1001,15 @@ def render_precedent_alert_module(api_key):
                 st.write(f"📅 **Bugün Yayınlanan Kritik Karar Sayısı:** {len(daily_decisions)}")
                 
                 with st.spinner("Uygun yapay zeka modeli aranıyor ve analiz yapılıyor..."):
-                    genai.configure(api_key=api_key)
                     
-                    # --- OTOMATİK MODEL SEÇİCİ (HATA ÇÖZÜMÜ) ---
-                    target_model_name = "models/gemini-pro" # Varsayılan
-                    try:
-                        # Sistemdeki mevcut modelleri listele ve ilk çalışanı seç
-                        for m in genai.list_models():
-                            if 'generateContent' in m.supported_generation_methods:
-                                if 'gemini' in m.name:
-                                    target_model_name = m.name
-                                    break
-                    except Exception as e:
-                        st.warning(f"Model listesi alınamadı, varsayılan deneniyor: {e}")
+                    # --- OTOMATİK MODEL SEÇİCİ (Önbellekli kayıt defteri) ---
+                    target_model_name = pick_best_model(api_key)
 
                     # Seçilen modeli ekrana yaz (Debug için)
                     # st.caption(f"Kullanılan Model: {target_model_name}") 
                     
                     try:
-                        model = genai.GenerativeModel(target_model_name)
+                        model = gemini_model(api_key, target_model_name)
                         
                         cases_str = str(st.session_state.my_cases)
                         decisions_str = "\n".join(daily_decisions)
@@ -919,7 +1026,7 @@ def render_precedent_alert_module(api_key):
                         AKSİYON: [Öneri]
                         """
                         
-                        response = model.generate_content(prompt)
+                        response = traced_generate(model, prompt)
                         
                         st.divider()
                         st.markdown("### 🚨 Tespit Edilen Riskler ve Fırsatlar")
@@ -942,20 +1049,6 @@ def render_precedent_alert_module(api_key):
 def render_owner_mode(api_key):
     st.info("👑 **Sahip Modu (Web):** Bilgisayarınızdaki dosyaları seçip sürükleyin. Sistem, hesabınızda çalışan en uygun Yapay Zeka modelini otomatik bulup kullanacaktır.")
 
-    # --- 0. OTOMATİK MODEL BULUCU (HATA ÖNLEYİCİ) ---
-    def get_working_model():
-        """Sistemdeki aktif modelleri tarar ve ilk çalışanı getirir."""
-        default_model = "models/gemini-pro" # En kötü ihtimal yedeği
-        try:
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    # İsminde 'gemini' geçen ilk modeli al (flash, pro, 1.5 vs.)
-                    if 'gemini' in m.name:
-                        return m.name
-        except:
-            pass
-        return default_model
-
     # --- 1. DOSYA OKUMA MOTORU ---
     def get_file_text(file_obj, api_key_for_ocr):
         filename = file_obj.name.lower()
@@ -988,11 +1081,11 @@ def render_owner_mode(api_key):
                     image = Image.open(io.BytesIO(file_bytes))
                     
                     # Dinamik model seçimi
-                    active_model = get_working_model()
-                    model = genai.GenerativeModel(active_model)
+                    active_model = pick_best_model(api_key_for_ocr, "vision")
+                    model = gemini_model(api_key_for_ocr, active_model)
                     
                     try:
-                        response = model.generate_content(["Bu resimdeki yazıları oku:", image])
+                        response = traced_generate(model, ["Bu resimdeki yazıları oku:", image])
                         text = f"[RESİM İÇERİĞİ]:\n{response.text}"
                     except:
                         text = "[RESİM OKUNAMADI: Seçilen model görsel desteklemiyor olabilir.]"
@@ -1022,14 +1115,16 @@ def render_owner_mode(api_key):
             elif not api_key:
                 st.error("API Anahtarı yok.")
             else:
-                genai.configure(api_key=api_key)
                 full_text = ""
                 bar = st.progress(0)
                 
-                for i, file in enumerate(uploaded_files):
-                    content = get_file_text(file, api_key)
+                # Dosyalar (özellikle resim OCR'ları) eşzamanlı okunur, sıra korunur
+                contents = run_parallel(lambda f: get_file_text(f, api_key), uploaded_files,
+                                        st.session_state.get("ai_workers"),
+                                        lambda done, total: bar.progress(done / total))
+                for file, content in zip(uploaded_files, contents):
+                    if isinstance(content, Exception): content = f"[Okuma Hatası]: {str(content)}"
                     full_text += f"\n=== DOSYA: {file.name} ===\n{content}\n"
-                    bar.progress((i + 1) / len(uploaded_files))
                 
                 st.session_state.web_memory = full_text
                 st.session_state.web_history = [] 
@@ -1059,18 +1154,11 @@ def render_owner_mode(api_key):
                 with st.chat_message("assistant"):
                     with st.spinner("Düşünüyor..."):
                         try:
-                            # BURADA OTOMATİK MODEL SEÇİLİYOR
-                            active_model_name = get_working_model()
-                            # st.caption(f"Kullanılan Model: {active_model_name}") # İstersen açıp görebilirsin
-                            
-                            model = genai.GenerativeModel(active_model_name)
-                            
-                            context = st.session_state.web_memory[:90000]
-                            final_prompt = f"VERİLER:\n{context}\n\nSORU: {prompt}"
-                            
-                            response = model.generate_content(final_prompt)
-                            st.markdown(response.text)
-                            st.session_state.web_history.append({"role": "assistant", "content": response.text})
+                            # Web hafızası bir kez yüklenir, her turda yalnızca soru gider
+                            answer = ask_with_context(f"SORU: {prompt}", f"VERİLER:\n{st.session_state.web_memory}",
+                                                      api_key, BUDGET_WEB_MEMORY)
+                            st.markdown(answer)
+                            st.session_state.web_history.append({"role": "assistant", "content": answer})
                         except Exception as e:
                             st.error(f"Cevap üretilemedi: {e}")
 
@@ -1081,24 +1169,6 @@ import time
 def render_property_genealogy(api_key):
     st.info("🌳 **Mülkiyet Soyağacı:** Tapu ve kadastro belgelerinizi yükleyin, AI zinciri kursun.")
 
-    # --- 0. AKILLI MODEL SEÇİCİ (HATA ÖNLEYİCİ) ---
-    def get_best_model():
-        """Hesapta aktif olan en hızlı modeli bulur."""
-        try:
-            available_models = []
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    available_models.append(m.name)
-            
-            # Öncelik Sırası: 1. Flash (Hızlı), 2. Pro (Standart), 3. Herhangi biri
-            for m in available_models:
-                if 'flash' in m: return m
-            for m in available_models:
-                if 'pro' in m: return m
-            return available_models[0] if available_models else "models/gemini-pro"
-        except:
-            return "models/gemini-pro" # En kötü ihtimal yedeği
-
     # --- 1. DOSYA OKUMA ---
     def get_genealogy_file_text(file_obj, api_key_for_ocr):
         filename = file_obj.name.lower()
@@ -1115,9 +1185,9 @@ def render_property_genealogy(api_key):
                 if api_key_for_ocr:
                     image = Image.open(io.BytesIO(file_bytes))
                     # Otomatik model seçimi
-                    active_model = get_best_model()
-                    model = genai.GenerativeModel(active_model)
-                    response = model.generate_content(["Bu belgedeki isimleri ve tarihleri oku:", image])
+                    active_model = pick_best_model(api_key_for_ocr, "vision")
+                    model = gemini_model(api_key_for_ocr, active_model)
+                    response = traced_generate(model, ["Bu belgedeki isimleri ve tarihleri oku:", image])
                     text = response.text
             else:
                 text = file_bytes.decode("utf-8", errors='ignore')
@@ -1147,25 +1217,27 @@ def render_property_genealogy(api_key):
                 status_box = st.empty()
                 status_box.info("Belgeler okunuyor...")
                 
-                genai.configure(api_key=api_key)
                 full_text = ""
-                for f in uploaded_files:
-                    full_text += f"\nDOC: {f.name}\n" + get_genealogy_file_text(f, api_key)
+                # Tapu görüntüleri eşzamanlı OCR'lanır, sıra korunur
+                texts = run_parallel(lambda f: get_genealogy_file_text(f, api_key), uploaded_files,
+                                     st.session_state.get("ai_workers"))
+                for f, txt in zip(uploaded_files, texts):
+                    full_text += f"\n--- DOC: {f.name} ---\n" + ("" if isinstance(txt, Exception) else txt)
                 
                 try:
                     status_box.info("AI Modeli seçiliyor ve zincir kuruluyor...")
                     
                     # OTOMATİK MODEL SEÇİMİ
-                    active_model_name = get_best_model()
-                    model = genai.GenerativeModel(active_model_name)
+                    active_model_name = pick_best_model(api_key)
+                    model = gemini_model(api_key, active_model_name)
                     
                     prompt = f"""
                     GÖREV: Metinlerdeki mülkiyet devirlerini JSON listesi yap.
-                    METİN: {full_text[:40000]}
+                    METİN: {pack_for_prompt(full_text, BUDGET_GENEALOGY, query='satış devir tapu miras intikal hibe ipotek')}
                     FORMAT: [{{"yil": "...", "kimden": "...", "kime": "...", "islem": "...", "durum": "Aktif/Pasif/Kritik"}}]
                     SADECE JSON VER.
                     """
-                    response = model.generate_content(prompt)
+                    response = traced_generate(model, prompt)
                     clean_json = response.text.replace("```json", "").replace("```", "").strip()
                     st.session_state.prop_history = json.loads(clean_json)
                     status_box.success(f"Tamamlandı! (Kullanılan Model: {active_model_name})")
@@ -1207,11 +1279,10 @@ def render_property_genealogy(api_key):
                 output_placeholder.text("Model aranıyor ve analiz başlıyor...")
                 
                 try:
-                    genai.configure(api_key=api_key)
                     
                     # OTOMATİK MODEL SEÇİMİ
-                    active_model_name = get_best_model()
-                    model = genai.GenerativeModel(active_model_name)
+                    active_model_name = pick_best_model(api_key)
+                    model = gemini_model(api_key, active_model_name)
                     
                     chain_data = json.dumps(st.session_state.prop_history, ensure_ascii=False)
                     
@@ -1226,7 +1297,7 @@ def render_property_genealogy(api_key):
                     """
                     
                     # stream=True ile parça parça alıyoruz
-                    response = model.generate_content(prompt, stream=True)
+                    response = traced_generate(model, prompt, stream=True)
                     
                     full_text = ""
                     for chunk in response:
@@ -1250,21 +1321,6 @@ def render_limitations_heatmap(api_key):
     
     st.info("🔥 **Zamanaşımı Isı Haritası:** Dava türüne ve tarihlere göre her bir alacak kaleminin risk durumunu analiz eder. Islah ve hak düşürücü süreleri 'Borsa Ekranı' gibi takip eder.")
 
-    # --- 0. OTOMATİK MODEL SEÇİCİ ---
-    def get_best_model():
-        try:
-            available_models = []
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    available_models.append(m.name)
-            for m in available_models:
-                if 'flash' in m: return m
-            for m in available_models:
-                if 'pro' in m: return m
-            return available_models[0] if available_models else "models/gemini-pro"
-        except:
-            return "models/gemini-pro"
-
     # --- 1. GİRİŞ PANELİ ---
     col_input, col_dashboard = st.columns([1, 2])
 
@@ -1366,9 +1422,8 @@ def render_limitations_heatmap(api_key):
                 output_box.info("Veriler analiz ediliyor...")
                 
                 try:
-                    genai.configure(api_key=api_key)
-                    active_model = get_best_model()
-                    model = genai.GenerativeModel(active_model)
+                    active_model = pick_best_model(api_key)
+                    model = gemini_model(api_key, active_model)
                     
                     # Tarihleri stringe çevirerek JSON hatasını önle
                     prompt = f"""
@@ -1387,7 +1442,7 @@ def render_limitations_heatmap(api_key):
                     4. Faiz başlangıç tarihleri için stratejik bir öneri ver.
                     """
                     
-                    response = model.generate_content(prompt, stream=True)
+                    response = traced_generate(model, prompt, stream=True)
                     
                     full_text = ""
                     for chunk in response:
@@ -1405,16 +1460,6 @@ import matplotlib.pyplot as plt
 def render_conflict_scanner(api_key):
     st.info("🕸️ **Gizli Bağlantı (Conflict of Interest) Tarayıcısı:** Hakim, avukat ve tanıklar arasındaki görünmez ticari ve sosyal bağları ortaya çıkarır. NetworkX ile ağ analizi yapar.")
 
-    # --- 0. OTOMATİK MODEL SEÇİCİ ---
-    def get_best_model():
-        try:
-            available_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-            for m in available_models:
-                if 'flash' in m: return m
-            return available_models[0] if available_models else "models/gemini-pro"
-        except:
-            return "models/gemini-pro"
-
     col_input, col_graph = st.columns([1, 2])
 
     # --- 1. GİRDİ PANELİ ---
@@ -1499,9 +1544,8 @@ def render_conflict_scanner(api_key):
                     output_box.info("Açık kaynaklar ve haberler taranıyor...")
                     
                     try:
-                        genai.configure(api_key=api_key)
-                        active_model = get_best_model()
-                        model = genai.GenerativeModel(active_model)
+                        active_model = pick_best_model(api_key)
+                        model = gemini_model(api_key, active_model)
                         
                         # Prompt: AI'yı bir OSINT uzmanı gibi çalıştırıyoruz
                         prompt = f"""
@@ -1521,7 +1565,7 @@ def render_conflict_scanner(api_key):
                         4. Hukuki Tavsiye: Bu bağlantıyı mahkemede nasıl delillendiririm?
                         """
                         
-                        response = model.generate_content(prompt, stream=True)
+                        response = traced_generate(model, prompt, stream=True)
                         
                         full_text = ""
                         for chunk in response:
@@ -1535,16 +1579,6 @@ def render_conflict_scanner(api_key):
 def render_mediation_checker(api_key):
     st.info("🤝 **Arabuluculuk Kontrolcüsü:** Dava türünü girin, sistem bunun 'Dava Şartı (Zorunlu)' olup olmadığını, ilgili kanun maddesini ve başvuru süresini analiz etsin.")
 
-    # --- 0. MODEL SEÇİCİ ---
-    def get_best_model():
-        try:
-            available_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-            for m in available_models:
-                if 'flash' in m: return m
-            return available_models[0] if available_models else "models/gemini-pro"
-        except:
-            return "models/gemini-pro"
-
     col1, col2 = st.columns([1, 1])
 
     with col1:
@@ -1573,9 +1607,8 @@ def render_mediation_checker(api_key):
                 status_box.info("Mevzuat taranıyor (7036, 6102, 6325 Sayılı Kanunlar)...")
                 
                 try:
-                    genai.configure(api_key=api_key)
-                    active_model = get_best_model()
-                    model = genai.GenerativeModel(active_model)
+                    active_model = pick_best_model(api_key)
+                    model = gemini_model(api_key, active_model)
                     
                     prompt = f"""
                     GÖREV: Sen uzman bir Türk Hukuku avukatısın.
@@ -1598,7 +1631,7 @@ def render_mediation_checker(api_key):
                     **💡 Kısa Özet:** ...
                     """
                     
-                    response = model.generate_content(prompt, stream=True)
+                    response = traced_generate(model, prompt, stream=True)
                     
                     full_text = ""
                     for chunk in response:
@@ -1636,18 +1669,6 @@ def render_forensic_map(api_key):
     if "ai_map_result" not in st.session_state:
         st.session_state.ai_map_result = None
 
-    # --- 0. MODEL SEÇİCİ ---
-    def get_best_model():
-        try:
-            # Genai import kontrolü (Global scope'ta yoksa hata vermesin)
-            import google.generativeai as genai
-            available_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-            for m in available_models:
-                if 'flash' in m: return m
-            return available_models[0] if available_models else "models/gemini-pro"
-        except:
-            return "models/gemini-pro"
-
     col_input, col_map = st.columns([1, 2])
 
     # --- 1. GİRDİ PANELİ ---
@@ -1731,9 +1752,8 @@ def render_forensic_map(api_key):
                     
                     try:
                         import google.generativeai as genai
-                        genai.configure(api_key=api_key)
-                        active_model = get_best_model()
-                        model = genai.GenerativeModel(active_model)
+                        active_model = pick_best_model(api_key)
+                        model = gemini_model(api_key, active_model)
                         
                         prompt = f"""
                         GÖREV: Sen uzman bir İdare Hukuku avukatı ve Trafik Bilirkişisisin.
@@ -1749,7 +1769,7 @@ def render_forensic_map(api_key):
                         4. SONUÇ: "Bu kavşakta son 1 yılda çok kaza olduysa, kusur sürücüde değil yoldadır" tezini savunacak hukuki argümanlar yaz.
                         """
                         
-                        response = model.generate_content(prompt)
+                        response = traced_generate(model, prompt)
                         st.session_state.ai_map_result = response.text
                         status_box.empty() # Yükleniyor yazısını kaldır
                         
@@ -1771,16 +1791,6 @@ def render_temporal_law_machine(api_key):
     import datetime as dtss # Çakışmayı önlemek için güvenli import
     st.info("🕰️ **Mevzuat Zaman Makinesi:** Olayın yaşandığı tarihe geri döner. O gün yürürlükte olan (şu an mülga) kanunları, tüzükleri ve Yargıtay içtihatlarını bugünkülerle kıyaslar.")
 	
-    # --- 0. MODEL SEÇİCİ ---
-    def get_best_model():
-        try:
-            available_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-            for m in available_models:
-                if 'flash' in m: return m
-            return available_models[0] if available_models else "models/gemini-pro"
-        except:
-            return "models/gemini-pro"
-
     col_settings, col_result = st.columns([1, 2])
 
     # --- 1. ZAMAN AYARLARI ---
@@ -1830,9 +1840,8 @@ def render_temporal_law_machine(api_key):
                 progress_bar.progress(90)
                 
                 try:
-                    genai.configure(api_key=api_key)
-                    active_model = get_best_model()
-                    model = genai.GenerativeModel(active_model)
+                    active_model = pick_best_model(api_key)
+                    model = gemini_model(api_key, active_model)
                     
                     # Kritik Tarih Kontrolleri (Prompt'a ipucu vermek için)
                     era_context = ""
@@ -1866,7 +1875,7 @@ def render_temporal_law_machine(api_key):
                     - Davayı kazanmak için mahkemeye "Olay tarihindeki mevzuat uygulanmalıdır" itirazını nasıl sunmalıyım?
                     """
                     
-                    response = model.generate_content(prompt, stream=True)
+                    response = traced_generate(model, prompt, stream=True)
                     
                     full_text = ""
                     status_text.empty() # Yazıyı temizle
@@ -1947,21 +1956,18 @@ def render_expert_report_auditor(api_key):
                 
                 try:
                     import google.generativeai as genai
-                    genai.configure(api_key=api_key)
                     
                     # Model Seçimi
-                    model_name = "models/gemini-pro"
-                    for m in genai.list_models():
-                        if 'flash' in m.name: model_name = m.name; break
+                    model_name = pick_best_model(api_key)
                     
-                    model = genai.GenerativeModel(model_name)
+                    model = gemini_model(api_key, model_name)
                     
                     prompt = f"""
                     GÖREV: Sen titiz bir 'Bilirkişi Raporu Denetçisi' ve Yargıtay İçtihatları uzmanısın.
                     Aşağıdaki bilirkişi raporu metnini analiz et ve hataları bul.
                     
                     METİN:
-                    {report_text[:10000]} (Metin kısaltıldıysa devamını dikkate al)
+                    {pack_for_prompt(report_text, BUDGET_REPORT, query='kusur oranı hesaplama tazminat sonuç kanaat')} (Metin kısaltıldıysa devamını dikkate al)
                     
                     İSTENEN ANALİZ (Markdown Formatında):
                     
@@ -1982,7 +1988,7 @@ def render_expert_report_auditor(api_key):
                     - "Ek Rapor" veya "Yeni Bilirkişi Heyeti" talep etmek için gerekçe oluştur.
                     """
                     
-                    response = model.generate_content(prompt, stream=True)
+                    response = traced_generate(model, prompt, stream=True)
                     
                     full_text = ""
                     for chunk in response:
@@ -2013,50 +2019,6 @@ def render_corporate_memory(api_key):
     if "archive_df" not in st.session_state:
         st.session_state.archive_df = pd.DataFrame(columns=["Tarih", "Konu", "Özet", "Detay", "İlgili Kişi/Kurum", "Dosya Adı"])
 
-    # --- KRİTİK FONKSİYON: SAĞLAM MODEL BULUCU ---
-    def get_working_model(api_key_val):
-        """
-        API'den güncel listeyi çeker. Hata verirse manuel listeyi dener.
-        En garantili çalışan modeli döndürür.
-        """
-        genai.configure(api_key=api_key_val)
-        
-        # 1. YÖNTEM: API'den Canlı Liste İste
-        try:
-            available_models = []
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    available_models.append(m.name)
-            
-            # Öncelik Sıralaması (En iyiden en eskiye)
-            priorities = [
-                'models/gemini-1.5-flash',
-                'models/gemini-1.5-pro',
-                'models/gemini-1.5-flash-latest',
-                'models/gemini-1.0-pro',
-                'models/gemini-pro'
-            ]
-            
-            # Listede eşleşen en iyi modeli bul
-            for p in priorities:
-                if p in available_models:
-                    return p
-            
-            # Tam eşleşme yoksa, içinde 'flash' geçeni al
-            for m in available_models:
-                if 'flash' in m: return m
-                
-            # O da yoksa ilk bulduğunu al
-            if available_models:
-                return available_models[0]
-                
-        except Exception as e:
-            pass # Liste alınamazsa manuel listeye geç
-
-        # 2. YÖNTEM: Manuel Güvenli Liste (Fallback)
-        # API listeleme başarısız olsa bile bu isimler genellikle çalışır
-        return "models/gemini-1.5-flash"
-
     # --- SEKME YAPISI ---
     tab_upload, tab_query = st.tabs(["📂 Belge İşle & Arşivle", "🔍 Arşivde Sorgu Yap"])
 
@@ -2098,62 +2060,51 @@ def render_corporate_memory(api_key):
                     st.error("API Key gerekli.")
                 else:
                     # --- MODELİ BELİRLE ---
-                    active_model_name = get_working_model(api_key)
+                    active_model_name = pick_best_model(api_key)
                     st.toast(f"🤖 Aktif Model: {active_model_name}", icon="✅")
                     
-                    model = genai.GenerativeModel(active_model_name)
                     progress_bar = st.progress(0)
                     new_records = []
-                    
-                    for idx, file in enumerate(files):
+
+                    # Prompt Hazırla
+                    prompt = """
+                    Bu belgeden şu bilgileri JSON formatında çıkar:
+                    {"Tarih": "GG.AA.YYYY", "Konu": "...", "Ozet": "...", "Detay": "...", "Ilgili_Kisi": "..."}
+                    Sadece JSON ver.
+                    """
+
+                    def analyze_file(file):
+                        """Dosyayı okur ve AI'dan JSON özet ister (iş parçacığında çalışır, st.* çağırmaz)."""
+                        content = ""
+                        # Dosya Okuma
+                        if file.type == "application/pdf":
+                            reader = PdfReader(file)
+                            for page in reader.pages: content += page.extract_text() + "\n"
+                        elif "word" in file.type:
+                            doc = Document(file)
+                            for p in doc.paragraphs: content += p.text + "\n"
+                        elif "image" in file.type:
+                            # Görsel destekli modeller sırayla denenir
+                            return generate_text(prompt, api_key, attachments=[Image.open(file)], capability="vision")
+
+                        if len(content) <= 5: return None
+                        # Aktif model hata verirse Flash yedeğe düşülür
+                        # İş parçacığında st.* çağrılmaz; doğrudan paketleyici kullanılır
+                        content = pack_context(content, BUDGET_DOC_CHAT).text
+                        return generate_text(prompt + f"\n\nMETİN:\n{content}", api_key,
+                                             models=[active_model_name, "models/gemini-1.5-flash"])
+
+                    # API Çağrıları eşzamanlı (hız sınırı ve 429 geri çekilmesi ai_executor içinde)
+                    responses = run_parallel(analyze_file, files, st.session_state.get("ai_workers"),
+                                             lambda done, total: progress_bar.progress(done / total))
+
+                    for file, response_text in zip(files, responses):
                         try:
-                            content = ""
-                            image_data = None
-                            is_image = False
-                            
-                            # Dosya Okuma
-                            if file.type == "application/pdf":
-                                reader = PdfReader(file)
-                                for page in reader.pages: content += page.extract_text() + "\n"
-                            elif "word" in file.type:
-                                doc = Document(file)
-                                for p in doc.paragraphs: content += p.text + "\n"
-                            elif "image" in file.type:
-                                is_image = True
-                                image_data = Image.open(file)
-
-                            # Prompt Hazırla
-                            prompt = """
-                            Bu belgeden şu bilgileri JSON formatında çıkar:
-                            {"Tarih": "GG.AA.YYYY", "Konu": "...", "Ozet": "...", "Detay": "...", "Ilgili_Kisi": "..."}
-                            Sadece JSON ver.
-                            """
-                            
-                            # API Çağrısı (Retry Mekanizması ile)
-                            response = None
-                            try:
-                                if is_image:
-                                    # Eğer model vision desteklemiyorsa flash'a zorla
-                                    if "flash" not in active_model_name and "1.5" not in active_model_name:
-                                        model_vision = genai.GenerativeModel("models/gemini-1.5-flash")
-                                        response = model_vision.generate_content([prompt, image_data])
-                                    else:
-                                        response = model.generate_content([prompt, image_data])
-                                else:
-                                    if len(content) > 5:
-                                        response = model.generate_content(prompt + f"\n\nMETİN:\n{content[:20000]}")
-                            except Exception as api_err:
-                                st.warning(f"Model hatası ({active_model_name}), yedek model deneniyor...")
-                                # Hata verirse kesin çalışan Flash modelini dene
-                                backup_model = genai.GenerativeModel("models/gemini-1.5-flash")
-                                if is_image:
-                                    response = backup_model.generate_content([prompt, image_data])
-                                else:
-                                    response = backup_model.generate_content(prompt + f"\n\nMETİN:\n{content[:20000]}")
+                            if isinstance(response_text, Exception): raise response_text
 
                             # Sonucu İşle
-                            if response and response.text:
-                                clean_json = response.text.replace("```json", "").replace("```", "").strip()
+                            if response_text:
+                                clean_json = response_text.replace("```json", "").replace("```", "").strip()
                                 data = json.loads(clean_json)
                                 
                                 # Mükerrer Kontrolü
@@ -2177,8 +2128,6 @@ def render_corporate_memory(api_key):
                                     
                         except Exception as e:
                             st.error(f"Hata ({file.name}): {e}")
-                        
-                        progress_bar.progress((idx + 1) / len(files))
 
                     # Kaydet
                     if new_records:
@@ -2198,11 +2147,11 @@ def render_corporate_memory(api_key):
             if st.button("🔍 Ara"):
                 with st.spinner("Aranıyor..."):
                     try:
-                        active_model = get_working_model(api_key)
-                        model = genai.GenerativeModel(active_model)
+                        active_model = pick_best_model(api_key)
+                        model = gemini_model(api_key, active_model)
                         context = st.session_state.archive_df.to_json(orient="records", force_ascii=False)
                         prompt = f"VERİTABANI:\n{context}\n\nSORU: {query}\n\nBu veritabanına göre cevapla:"
-                        st.markdown(model.generate_content(prompt).text)
+                        st.markdown(traced_generate(model, prompt).text)
                     except Exception as e:
                         st.error(f"Hata: {e}")
 
@@ -2784,8 +2733,7 @@ def render_circular_cross_check_module(api_key):
     
     # RAG Kontrolü
     try:
-        from sklearn.feature_extraction.text import TfidfVectorizer
-        from sklearn.metrics.pairwise import cosine_similarity
+        from tfidf_index import tfidf_cache
         rag_available = True
     except ImportError:
         rag_available = False
@@ -2826,13 +2774,10 @@ def render_circular_cross_check_module(api_key):
         return chunks
 
     def find_relevant_chunks(question, chunks, top_k=3):
+        """Belge matrisi içerik özetiyle bir kez eğitilir; her soruda yalnızca soru dönüştürülür."""
         if not chunks: return []
-        vectorizer = TfidfVectorizer()
         try:
-            tfidf_matrix = vectorizer.fit_transform(chunks + [question])
-            similarities = cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1]).flatten()
-            related_indices = similarities.argsort()[-top_k:][::-1]
-            return [chunks[i] for i in related_indices]
+            return tfidf_cache.get(chunks).relevant_chunks(question, top_k)
         except:
             return chunks[:1]
 
@@ -3301,12 +3246,18 @@ def main():
     if "last_file_id" not in st.session_state: st.session_state.last_file_id = None
     if "messages" not in st.session_state: st.session_state.messages = []
     if "mevzuat_sonuc" not in st.session_state: st.session_state.mevzuat_sonuc = ""
+    if "mevzuat_kaynak" not in st.session_state: st.session_state.mevzuat_kaynak = ""
+    if "mevzuat_yerel" not in st.session_state: st.session_state.mevzuat_yerel = False
+    if "mevzuat_yorum" not in st.session_state: st.session_state.mevzuat_yorum = ""
     if "ictihat_sonuc" not in st.session_state: st.session_state.ictihat_sonuc = ""
     if "dilekce_taslak" not in st.session_state: st.session_state.dilekce_taslak = ""
     if "soru_cevap" not in st.session_state: st.session_state.soru_cevap = ""
+    if "soru_cevap_onbellek" not in st.session_state: st.session_state.soru_cevap_onbellek = ""
+    if "ictihat_onbellek" not in st.session_state: st.session_state.ictihat_onbellek = ""
     if "ses_metni" not in st.session_state: st.session_state.ses_metni = ""
     if "ocr_metni" not in st.session_state: st.session_state.ocr_metni = ""
-    if "dalgic_context" not in st.session_state: st.session_state.dalgic_context = ""
+    if "dalgic_belgeler" not in st.session_state: st.session_state.dalgic_belgeler = []
+    if "dalgic_notlar" not in st.session_state: st.session_state.dalgic_notlar = None
     if "dalgic_sonuc" not in st.session_state: st.session_state.dalgic_sonuc = ""
     if "buyur_abi_context" not in st.session_state: st.session_state.buyur_abi_context = ""
     if "buyur_abi_response" not in st.session_state: st.session_state.buyur_abi_response = ""
@@ -3334,6 +3285,9 @@ def main():
         st.header("⚙️ Ayarlar")
         api_key = st.text_input("Google Gemini API Key", type="password")
         st.caption(f"Kütüphane Sürümü: {lib_ver}")
+        st.slider("⚡ Paralel AI İsteği", 1, 16, DEFAULT_WORKERS, key="ai_workers",
+                  help="Toplu işlemlerde (UYAP, Kurumsal Hafıza, OCR) aynı anda gönderilecek istek sayısı.")
+        render_ai_diagnostics()
         
         st.divider()
         st.header("📁 Dosya Bilgileri")
@@ -3389,8 +3343,8 @@ def main():
 
     # 4. SATIR: oyun değiştirici hamle menüsü (15 Sekme)
     st.markdown("### 🛠️ Temel Araçlar & Strateji")
-    tabx1, tabx2, tabx3, tabx4, tabx5, tabx6, tabx7, tabx8, tabx9, tabx10 = st.tabs([
-        "🗺️ Adli Harita", "🕰️ Mevzuat Makinesi", "🧐 Rapor Denetçisi", "🏛️ Kurumsal Hafıza", "💰 Dava Maliyeti", "🗺️ Adli Olay Yeri", "🕵️ Visual Forensics", "🌲 Özel Mevzuat (Orman/Tarım)" ,"🌐 Bakanlık Veri Tabanı", "⏳ İdari Kronoloji"
+    tabx1, tabx2, tabx3, tabx4, tabx5, tabx6, tabx7, tabx8, tabx9, tabx10, tabx11 = st.tabs([
+        "🗺️ Adli Harita", "🕰️ Mevzuat Makinesi", "🧐 Rapor Denetçisi", "🏛️ Kurumsal Hafıza", "💰 Dava Maliyeti", "🗺️ Adli Olay Yeri", "🕵️ Visual Forensics", "🌲 Özel Mevzuat (Orman/Tarım)" ,"🌐 Bakanlık Veri Tabanı", "⏳ İdari Kronoloji", "📈 AI Telemetri"
     ])
 
 
@@ -3399,42 +3353,43 @@ def main():
     # NOT: tab1, tab2 vb. eski içeriklerinizi buraya yerleştirmelisiniz.
     # Örnek olarak yeni eklenenleri bağlıyorum:
     
-    with tab_checkup:
+    with tab_checkup, llm_module("Kurumsal Check-up"):
         render_checkup_module(api_key)
         
-    with tab_timemachine:
+    with tab_timemachine, llm_module("Zaman Makinesi"):
         render_time_machine(api_key)
 
     # (Buradan sonra eski kodunuzdaki 'with tab1:', 'with tab2:' blokları gelmeli...)
 
-    with tab_aym:  # <--- YENİ EKLENEN KISIM
+    with tab_aym, llm_module("AYM & AİHM Testi"):  # <--- YENİ EKLENEN KISIM
         render_aym_aihm_module(api_key)
 
-    with tab_deepfake:  # <--- YENİ EKLENEN KISIM
+    with tab_deepfake, llm_module("Deepfake Kontrol"):  # <--- YENİ EKLENEN KISIM
         render_deepfake_module(api_key)
 
-    with tab_osyn:
+    with tab_osyn, llm_module("OSINT (İstihbarat)"):
         render_osint_module(api_key) # <--- YENİ FONKSİYON ÇAĞRISI
 
-    with tab_sxx: render_precedent_alert_module(api_key)
-    with tab_sah: render_owner_mode(api_key)
-    with tab_soy: render_property_genealogy(api_key)
-    with tab_isx: render_limitations_heatmap(api_key)
-    with tab_golx: render_conflict_scanner(api_key)
-    with tab_arx: render_mediation_checker(api_key)
-    with tabx1: render_forensic_map(api_key)
-    with tabx2: render_temporal_law_machine(api_key)
-    with tabx3: render_expert_report_auditor(api_key)
-    with tabx4: render_corporate_memory(api_key)
-    with tabx5: render_cost_calculator_module(api_key)
-    with tabx6: render_forensic_map_module(api_key)
-    with tabx7: render_visual_forensics_module(api_key)
-    with tabx8: render_special_legislation_module(api_key)
-    with tabx9: render_circular_cross_check_module(api_key)
-    with tabx10: render_defense_chronology_module(api_key)
+    with tab_sxx, llm_module("Emsal Alarm"): render_precedent_alert_module(api_key)
+    with tab_sah, llm_module("Sahip Modu"): render_owner_mode(api_key)
+    with tab_soy, llm_module("Soyağacı"): render_property_genealogy(api_key)
+    with tab_isx, llm_module("Isı Haritası"): render_limitations_heatmap(api_key)
+    with tab_golx, llm_module("Gizli Bağlantı"): render_conflict_scanner(api_key)
+    with tab_arx, llm_module("Arabuluculuk"): render_mediation_checker(api_key)
+    with tabx1, llm_module("Adli Harita"): render_forensic_map(api_key)
+    with tabx2, llm_module("Mevzuat Makinesi"): render_temporal_law_machine(api_key)
+    with tabx3, llm_module("Rapor Denetçisi"): render_expert_report_auditor(api_key)
+    with tabx4, llm_module("Kurumsal Hafıza"): render_corporate_memory(api_key)
+    with tabx5, llm_module("Dava Maliyeti"): render_cost_calculator_module(api_key)
+    with tabx6, llm_module("Adli Olay Yeri"): render_forensic_map_module(api_key)
+    with tabx7, llm_module("Visual Forensics"): render_visual_forensics_module(api_key)
+    with tabx8, llm_module("Özel Mevzuat (Orman/Tarım)"): render_special_legislation_module(api_key)
+    with tabx9, llm_module("Bakanlık Veri Tabanı"): render_circular_cross_check_module(api_key)
+    with tabx10, llm_module("İdari Kronoloji"): render_defense_chronology_module(api_key)
+    with tabx11: render_ai_telemetry_dashboard()
     # --- TAB İÇERİKLERİ ---
 
-    with tab1:
+    with tab1, llm_module("Analiz"):
         col1, col2 = st.columns(2)
         with col1:
             st.write(f"**Mahkeme:** {input_mahkeme or auto_data['mahkeme']}")
@@ -3444,7 +3399,7 @@ def main():
             st.write(f"**Davalı:** {input_davali or '-'}")
         st.text_area("Metin Önizleme", st.session_state.doc_text, height=150)
 
-    with tab2:
+    with tab2, llm_module("Sohbet"):
         for msg in st.session_state.messages:
             with st.chat_message(msg["role"]): st.markdown(msg["content"])
         if prompt := st.chat_input("Soru sor..."):
@@ -3452,32 +3407,74 @@ def main():
             with st.chat_message("user"): st.markdown(prompt)
             with st.chat_message("assistant"):
                 with st.spinner("AI Yanıtlıyor..."):
-                    context = f"BELGE: {st.session_state.doc_text[:20000]}\nSORU: {prompt}"
-                    reply = get_ai_response(f"Sen bir avukatsın. Şuna cevap ver: {context}", api_key)
+                    reply = ask_with_context(f"SORU: {prompt}", f"BELGE: {st.session_state.doc_text}", api_key,
+                                             BUDGET_DOC_CHAT, system_instruction="Sen bir avukatsın. Belgeye göre soruya cevap ver.")
                     st.markdown(reply)
                     st.session_state.messages.append({"role": "assistant", "content": reply})
 
-    with tab3:
+    with tab3, llm_module("Mevzuat"):
         c1, c2 = st.columns([3,1])
-        q = c1.text_input("Kanun Madde No", key="mq")
+        q = c1.text_input("Kanun Madde No", key="mq", placeholder="Örn: 5996 m.41, TMK m.166/1, 6098 sayılı Kanunun 344. maddesi")
         if c2.button("Getir", key="mb") and q:
-            with st.spinner("Aranıyor..."):
-                res = get_ai_response(f"GÖREV: '{q}' maddesini tam metin yaz.", api_key)
-                st.session_state.mevzuat_sonuc = res
+            st.session_state.mevzuat_yorum = ""
+            # Önce yerel madde dizini: atıf çözülürse metin AI'a sorulmadan gelir
+            atif = parse_reference(q)
+            yerel_metin = statute_index.lookup(atif) if atif else None
+            if yerel_metin:
+                st.session_state.mevzuat_sonuc = yerel_metin
+                st.session_state.mevzuat_kaynak = f"📚 Yerel mevzuat dizini: {atif} {statute_index.title(atif.law_no)}"
+                st.session_state.mevzuat_yerel = True
+            else:
+                with st.spinner("Aranıyor..."):
+                    res = get_ai_response(f"GÖREV: '{q}' maddesini tam metin yaz.", api_key)
+                    st.session_state.mevzuat_sonuc = res
+                st.session_state.mevzuat_kaynak = ("⚠️ Madde yerel dizinde yok; metin AI tarafından yazıldı, resmi kaynaktan doğrulayın. "
+                                                   "Kanun PDF'ini aşağıdan dizine ekleyebilirsiniz.")
+                st.session_state.mevzuat_yerel = False
         if st.session_state.mevzuat_sonuc:
-            st.markdown(f"<div class='kanun-kutusu'>{st.session_state.mevzuat_sonuc}</div>", unsafe_allow_html=True)
-
-    with tab4:
+            if st.session_state.mevzuat_kaynak: st.caption(st.session_state.mevzuat_kaynak)
+            mevzuat_html = st.session_state.mevzuat_sonuc.replace("\n", "<br>") if st.session_state.mevzuat_yerel else st.session_state.mevzuat_sonuc
+            st.markdown(f"<div class='kanun-kutusu'>{mevzuat_html}</div>", unsafe_allow_html=True)
+            # AI yalnızca yerel metnin yorumu için
+            if st.session_state.mevzuat_yerel and st.button("🧠 AI Yorumu", key="mevzuat_yorum_btn"):
+                with st.spinner("Yorumlanıyor..."):
+                    st.session_state.mevzuat_yorum = get_ai_response(
+                        f"GÖREV: Aşağıdaki kanun maddesini bir avukat gözüyle açıkla, uygulamadaki önemini ve dikkat edilecek noktaları yorumla. "
+                        f"Madde metnini yeniden yazma.\nMADDE ({q}):\n{st.session_state.mevzuat_sonuc}", api_key)
+            if st.session_state.mevzuat_yorum:
+                st.markdown(st.session_state.mevzuat_yorum)
+
+        with st.expander("📥 Mevzuat PDF'i Ekle (Madde Dizini)"):
+            mevzuat_pdf = st.file_uploader("Kanun PDF'i (mevzuat.gov.tr)", type="pdf", key="statute_pdf")
+            kanun_no_girdi = st.text_input("Kanun Numarası", key="statute_law_no",
+                                           placeholder="Boş bırakılırsa künyeden okunur (Kanun Numarası : 5996)")
+            if mevzuat_pdf and st.button("Dizine Ekle", key="statute_ingest"):
+                kanun_metni = parse_pdf(BytesIO(mevzuat_pdf.getvalue()))
+                kanun_no = kanun_no_girdi.strip() or detect_law_number(kanun_metni)
+                if not kanun_metni: st.error("PDF'ten metin çıkarılamadı.")
+                elif not kanun_no or not kanun_no.isdigit(): st.error("Kanun numarası bulunamadı; lütfen elle girin.")
+                else:
+                    madde_sayisi = statute_index.ingest(kanun_metni, kanun_no, detect_title(kanun_metni), mevzuat_pdf.name)
+                    if madde_sayisi:
+                        atif_sayisi = citation_graph.ingest_law(kanun_no)
+                        st.success(f"✅ {kanun_no} sayılı kanunun {madde_sayisi} maddesi ve {atif_sayisi} atfı dizine eklendi.")
+                    else: st.warning("Metinde madde başlığı (MADDE 1 – ...) bulunamadı.")
+            kayitli_kanunlar = statute_index.laws()
+            if kayitli_kanunlar: st.dataframe(pd.DataFrame(kayitli_kanunlar), use_container_width=True, hide_index=True)
+
+    with tab4, llm_module("İçtihat"):
         c3, c4 = st.columns([3,1])
         iq = c3.text_input("İçtihat Konusu", key="iq")
         if c4.button("Ara", key="ib") and iq:
             with st.spinner("Taranıyor..."):
-                res = get_ai_response(f"GÖREV: '{iq}' hakkında Yargıtay kararlarını özetle.", api_key)
+                res, not_ = ask_semantic("ictihat", iq, f"GÖREV: '{iq}' hakkında Yargıtay kararlarını özetle.", api_key)
                 st.session_state.ictihat_sonuc = res
+                st.session_state.ictihat_onbellek = not_
         if st.session_state.ictihat_sonuc:
+            if st.session_state.ictihat_onbellek: st.caption(st.session_state.ictihat_onbellek)
             st.markdown(f"<div class='ictihat-kutusu'>{st.session_state.ictihat_sonuc}</div>", unsafe_allow_html=True)
 
-    with tab5:
+    with tab5, llm_module("Dilekçe Yaz"):
         st.subheader("✍️ Otomatik Savunma/Cevap Dilekçesi")
         if not st.session_state.doc_text or st.session_state.doc_text.startswith(("HATA", "UYARI")):
             st.info("Dilekçe oluşturmak için önce sol menüden bir dosya yükleyin.")
@@ -3489,22 +3486,22 @@ def main():
             with col_d2:
                 st.write("")
                 st.write("")
-                if st.button("Dilekçeyi Yaz (AI)", type="primary"):
-                    if not api_key: st.error("API Key gerekli!")
-                    else:
-                        with st.spinner("Dilekçe yazılıyor..."):
-                            mahkeme = input_mahkeme or auto_data['mahkeme']
-                            dosya = input_dosya_no or auto_data['esas']
-                            davaci = input_davaci or "Davacı"
-                            davali = input_davali or "Davalı"
-                            prompt = f"""
-                            GÖREV: Aşağıdaki metne dayanarak profesyonel bir {dilekce_turu} yaz.
-                            BİLGİLER: Mahkeme: {mahkeme}, Dosya: {dosya}, Davacı: {davaci}, Davalı: {davali}, Ek Talimat: {ozel_talimat}
-                            KARŞI TARAFIN DİLEKÇESİ (ÖZET): {st.session_state.doc_text[:20000]}
-                            KURALLAR: Resmi Türk hukuk dilekçesi formatında olsun.
-                            """
-                            res = get_ai_response(prompt, api_key)
-                            st.session_state.dilekce_taslak = res
+                dilekce_yaz = st.button("Dilekçeyi Yaz (AI)", type="primary")
+            if dilekce_yaz:
+                if not api_key: st.error("API Key gerekli!")
+                else:
+                    mahkeme = input_mahkeme or auto_data['mahkeme']
+                    dosya = input_dosya_no or auto_data['esas']
+                    davaci = input_davaci or "Davacı"
+                    davali = input_davali or "Davalı"
+                    prompt = f"""
+                    GÖREV: Aşağıdaki metne dayanarak profesyonel bir {dilekce_turu} yaz.
+                    BİLGİLER: Mahkeme: {mahkeme}, Dosya: {dosya}, Davacı: {davaci}, Davalı: {davali}, Ek Talimat: {ozel_talimat}
+                    KARŞI TARAFIN DİLEKÇESİ (ÖZET): {pack_for_prompt(st.session_state.doc_text, BUDGET_DOC_CHAT, query=f'{dilekce_turu} {ozel_talimat}')}
+                    KURALLAR: Resmi Türk hukuk dilekçesi formatında olsun.
+                    """
+                    # Dilekçe yazılırken parça parça ekrana gelir
+                    st.session_state.dilekce_taslak = stream_ai_response(prompt, api_key)
             if st.session_state.dilekce_taslak:
                 st.divider()
                 st.subheader("📄 Dilekçe Taslağı")
@@ -3517,7 +3514,7 @@ def main():
                     st.download_button("💾 UDF Olarak İndir (.udf)", udf_file, "Dilekce.udf", "application/zip")
                 st.text_area("Dilekçe Metni", st.session_state.dilekce_taslak, height=500)
 
-    with tab6:
+    with tab6, llm_module("Bana Sor"):
         st.subheader("❓ Hukuki Soru & WhatsApp Paylaşımı")
         col_s1, col_s2 = st.columns([3, 1])
         with col_s1:
@@ -3534,10 +3531,12 @@ def main():
                         SORU: {kullanici_sorusu}
                         KURALLAR: 1. İlgili KANUN MADDELERİNİ belirt. 2. YARGITAY İÇTİHATLARINDAN örnek ver. 3. Net hukuki görüş bildir.
                         """
-                        res = get_ai_response(prompt, api_key)
+                        res, not_ = ask_semantic("bana_sor", kullanici_sorusu, prompt, api_key)
                         st.session_state.soru_cevap = res
+                        st.session_state.soru_cevap_onbellek = not_
         if st.session_state.soru_cevap:
             st.divider()
+            if st.session_state.soru_cevap_onbellek: st.caption(st.session_state.soru_cevap_onbellek)
             st.markdown(f"<div class='ictihat-kutusu'><b>💡 Hukuki Görüş:</b><br>{st.session_state.soru_cevap}</div>", unsafe_allow_html=True)
             pdf_data = create_pdf_file(st.session_state.soru_cevap)
             encoded_text = urllib.parse.quote(f"*Hukuki Soru:* {kullanici_sorusu}\n\n*Cevap:*\n{st.session_state.soru_cevap}")
@@ -3548,7 +3547,7 @@ def main():
                 if telefon_no: st.link_button("📲 Cevabı WhatsApp ile Gönder", wa_link)
                 else: st.warning("WhatsApp butonu için telefon no giriniz.")
 
-    with tab7:
+    with tab7, llm_module("Ses"):
         st.subheader("🎙️ Sesli Asistan")
         col_audio1, col_audio2 = st.columns(2)
         with col_audio1:
@@ -3571,7 +3570,7 @@ def main():
                 st.success("Sonuç:")
                 st.text_area("", st.session_state.ses_metni, height=150)
 
-    with tab8:
+    with tab8, llm_module("OCR"):
         st.subheader("👁️ OCR (Resim/PDF -> Metin)")
         ocr_file = st.file_uploader("Dosya Yükle", type=['png', 'jpg', 'jpeg', 'pdf', 'docx', 'tif', 'tiff'])
         if ocr_file and st.button("🔍 Metni Ayıkla (OCR)", type="primary"):
@@ -3590,7 +3589,7 @@ def main():
             word_ocr = create_word_file(st.session_state.ocr_metni)
             st.download_button("💾 Word İndir", word_ocr, "ocr.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
 
-    with tab9:
+    with tab9, llm_module("Dalgıç"):
         st.subheader("🤿 Dalgıç Modu (Çoklu Dosya Analizi)")
         st.info("Birden fazla dosyayı aynı anda yükleyin. Sistem hepsini okuyup, birleştirip sorularınızı yanıtlar.")
         dalgic_files = st.file_uploader("Dosyaları Sürükleyin (Max 30 Dosya)", type=['udf', 'pdf', 'docx', 'doc', 'txt', 'png', 'jpg', 'jpeg', 'mp4', 'tif', 'tiff'], accept_multiple_files=True)
@@ -3598,7 +3597,7 @@ def main():
             if st.button("🚀 Dosyaları İşle ve Hafızaya Al", type="primary"):
                 if not api_key: st.error("API Key giriniz.")
                 else:
-                    full_context = ""
+                    belgeler = []
                     progress_bar = st.progress(0)
                     for i, file in enumerate(dalgic_files):
                         file_bytes = BytesIO(file.read())
@@ -3622,30 +3621,65 @@ def main():
                             elif ext == 'mp4':
                                 extracted_text = perform_ocr_gemini(file_bytes, "video/mp4", api_key, "Video içeriğini özetle.")
                             
-                            full_context += f"\n\n--- DOSYA: {file.name} ---\n{extracted_text}"
+                            belgeler.append((file.name, extracted_text or ""))
                         except Exception as e:
-                            full_context += f"\nHATA ({file.name}): {str(e)}"
+                            st.warning(f"HATA ({file.name}): {str(e)}")
                         
                         progress_bar.progress((i + 1) / len(dalgic_files))
-                    st.session_state.dalgic_context = full_context
-                    st.success(f"Veriler hafızaya alındı! ({len(full_context)} karakter)")
-        if st.session_state.dalgic_context:
+                    st.session_state.dalgic_belgeler = belgeler
+                    # Yeni dosyalar: önceki bulgular geçersiz
+                    st.session_state.dalgic_notlar = None
+                    st.success(f"Veriler hafızaya alındı! ({len(belgeler)} dosya, {sum(len(t) for _, t in belgeler)} karakter)")
+        if st.session_state.dalgic_belgeler:
             st.divider()
             dalgic_soru = st.text_area("Dosyalar Hakkında Soru Sorun:", placeholder="Örn: Bu dosyalardaki tüm tanık ifadelerindeki çelişkileri listele.")
             if st.button("Analiz Et ve Yanıtla"):
                 if not dalgic_soru: st.warning("Soru yazın.")
+                elif not api_key: st.error("API Key giriniz.")
+                elif fits_single_prompt(st.session_state.dalgic_belgeler):
+                    # Küçük dosya seti tek prompt'a sığar
+                    icerik = "\n\n".join(f"--- DOSYA: {ad} ---\n{metin}" for ad, metin in st.session_state.dalgic_belgeler)
+                    prompt = f"GÖREV: Aşağıdaki dosya içeriklerine göre cevapla.\nSORU: {dalgic_soru}\nİÇERİK: {icerik}"
+                    st.session_state.dalgic_sonuc = stream_ai_response(prompt, api_key)
                 else:
-                    with st.spinner("Dalgıç derinlere iniyor..."):
-                        prompt = f"GÖREV: Aşağıdaki dosya içeriklerine göre cevapla.\nSORU: {dalgic_soru}\nİÇERİK: {st.session_state.dalgic_context[:500000]}"
-                        res = get_ai_response(prompt, api_key)
-                        st.session_state.dalgic_sonuc = res
+                    # MAP: dosya / bölüm başına bulgular (bir kez çıkarılır, sonraki sorular yeniden kullanır)
+                    notlar = st.session_state.dalgic_notlar
+                    if notlar is None or not all(n.ok for n in notlar):
+                        gorevler = split_documents(st.session_state.dalgic_belgeler)
+                        bolum_sayisi = Counter(g.file_no for g in gorevler)
+                        biten = Counter()
+                        ilerleme_alani = st.container()
+                        with ilerleme_alani:
+                            st.caption(f"🤿 {len(gorevler)} bölüm eşzamanlı inceleniyor...")
+                            dosya_cubuklari = {no: st.progress(0.0, text=f"{st.session_state.dalgic_belgeler[no][0]}: 0/{adet} bölüm")
+                                               for no, adet in bolum_sayisi.items()}
+                        def bolum_bitti(sira, sonuc):
+                            no = sonuc.task.file_no
+                            biten[no] += 1
+                            durum = "" if sonuc.ok else " ⚠️"
+                            dosya_cubuklari[no].progress(biten[no] / bolum_sayisi[no],
+                                                         text=f"{sonuc.task.file}: {biten[no]}/{bolum_sayisi[no]} bölüm{durum}")
+                        notlar = run_map(gorevler, api_key, st.session_state.get("ai_workers"), on_result=bolum_bitti)
+                        st.session_state.dalgic_notlar = notlar
+                    butce_hatasi = next((n.error for n in notlar if isinstance(n.error, QuotaBudgetExceeded)), None)
+                    if butce_hatasi is not None:
+                        st.session_state.dalgic_sonuc = budget_message(butce_hatasi)
+                    elif not any(n.ok for n in notlar):
+                        st.session_state.dalgic_sonuc = "Hata: Dosyalardan bulgu çıkarılamadı."
+                    else:
+                        # REDUCE: bulgular kaynak atıflarıyla tek cevapta birleştirilir
+                        prompt, paket = reduce_prompt(dalgic_soru, notlar, BUDGET_CORPUS)
+                        if paket.truncated: st.caption(f"✂️ {paket.summary()}")
+                        eksik = [n.task.label for n in notlar if not n.ok]
+                        if eksik: st.warning(f"Okunamayan bölümler: {', '.join(eksik)}")
+                        st.session_state.dalgic_sonuc = stream_ai_response(prompt, api_key)
             if st.session_state.dalgic_sonuc:
                 st.markdown(f"<div class='kanun-kutusu'>{st.session_state.dalgic_sonuc}</div>", unsafe_allow_html=True)
                 col_d1, col_d2 = st.columns(2)
                 with col_d1: st.download_button("📕 PDF İndir", create_pdf_file(st.session_state.dalgic_sonuc), "Dalgic.pdf", "application/pdf")
                 with col_d2: st.download_button("📘 Word İndir", create_word_file(st.session_state.dalgic_sonuc), "Dalgic.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
 
-    with tab10:
+    with tab10, llm_module("Buyur Abi"):
         st.subheader("🙋 Buyur Abi (Genel Asistan & Çoklu Format)")
         st.info("Hukuk, kodlama, yemek tarifi veya günlük sohbet... Ne istersen sor. Ayrıca Excel, Ses, Video dahil her türlü dosyayı yükleyip analiz ettirebilirsin.")
         col_ba1, col_ba2 = st.columns([1, 2])
@@ -3694,17 +3728,15 @@ def main():
                                 except Exception as e: context_data += f"\n⚠️ {file.name} okunurken hata: {str(e)}"
                     if not user_text_input and not voice_text and not context_data: st.warning("Abi boş gönderdin.")
                     else:
-                        final_prompt = f"GÖREV: Yardımsever asistan ol.\nSORU: {user_text_input}\nSESLİ SORU: {voice_text}\nDOSYALAR: {context_data[:100000]}"
-                        with st.spinner("Hazırlıyorum abi..."):
-                            resp = get_ai_response(final_prompt, api_key)
-                            st.session_state.buyur_abi_response = resp
+                        final_prompt = f"GÖREV: Yardımsever asistan ol.\nSORU: {user_text_input}\nSESLİ SORU: {voice_text}\nDOSYALAR: {pack_for_prompt(context_data, BUDGET_ASSISTANT, query=f'{user_text_input} {voice_text}')}"
+                        st.session_state.buyur_abi_response = stream_ai_response(final_prompt, api_key)
             if st.session_state.buyur_abi_response:
                 st.markdown(f"<div class='buyur-abi-kutusu'>{st.session_state.buyur_abi_response}</div>", unsafe_allow_html=True)
                 b_col1, b_col2 = st.columns(2)
                 with b_col1: st.download_button("📄 PDF Olarak Al", create_pdf_file(st.session_state.buyur_abi_response), "Cevap.pdf", "application/pdf")
                 with b_col2: st.download_button("📝 Word Olarak Al", create_word_file(st.session_state.buyur_abi_response), "Cevap.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
 
-    with tab11:
+    with tab11, llm_module("Hatırlatıcı"):
         st.subheader("⏰ Duruşma Hatırlatıcı & Takvim")
         st.info("UYAP'tan aldığınız .ics (Takvim) dosyalarını buraya yükleyin. Yaklaşan duruşmaları otomatik listeler ve 24 saat kalanlar için ALARM verir.")
         col_h1, col_h2 = st.columns([1, 3])
@@ -3750,7 +3782,7 @@ def main():
                     else:
                         st.markdown(f"""<div class="normal-durusma">📅 <b>{tarih_str}</b> (Kalan: {diff.days} gün)<br>⚖️ {evt.get('summary', 'Başlıksız')}<br>📍 {evt.get('location', '-')}</div>""", unsafe_allow_html=True)
 
-    with tab12:
+    with tab12, llm_module("Arşiv"):
         st.subheader("🗄️ Doküman Yönetimi ve Arşivleme")
         st.info(f"Verileriniz bilgisayarınızda '{ROOT_DIR}' klasöründe saklanır. TIF, PDF, Resim dahil tüm dosyaları okur.")
 
@@ -3832,8 +3864,8 @@ def main():
                         if not api_key: st.error("API Key gerekli.")
                         else:
                             with st.spinner("Sadece bu dosyadaki evraklar analiz ediliyor..."):
-                                prompt = f"GÖREV: Bu dava dosyasının içeriğini özetle, hukuki durumu analiz et.\nİÇERİK: {st.session_state.arsiv_context[:500000]}"
-                                res = get_ai_response(prompt, api_key)
+                                res = ask_with_context("GÖREV: Bu dava dosyasının içeriğini özetle, hukuki durumu analiz et.",
+                                                       f"DOSYA İÇERİĞİ:\n{st.session_state.arsiv_context}", api_key, BUDGET_CORPUS)
                                 st.session_state.arsiv_genel_ozet = res
                     
                     if st.session_state.arsiv_genel_ozet:
@@ -3854,13 +3886,9 @@ def main():
                         elif not arsiv_soru: st.warning("Soru yazın.")
                         else:
                             with st.spinner("Bu dosyadaki belgeler taranıyor..."):
-                                prompt = f"""
-                                GÖREV: Aşağıdaki dosya içeriğine göre soruyu cevapla.
-                                SORU: {arsiv_soru}
-                                DOSYA İÇERİĞİ:
-                                {st.session_state.arsiv_context[:500000]}
-                                """
-                                res = get_ai_response(prompt, api_key)
+                                # Analiz ile aynı bağlam tanıtıcısını paylaşır (tekrar yükleme yok)
+                                res = ask_with_context(f"GÖREV: Dosya içeriğine göre soruyu cevapla.\nSORU: {arsiv_soru}",
+                                                       f"DOSYA İÇERİĞİ:\n{st.session_state.arsiv_context}", api_key, BUDGET_CORPUS)
                                 st.session_state.arsiv_soru_cevap = res
                     
                     if st.session_state.arsiv_soru_cevap:
@@ -3930,7 +3958,7 @@ def main():
                                             st.session_state.aktif_dosya_yolu = sonuc['yol']
                                             st.rerun()
 
-    with tab13:
+    with tab13, llm_module("UYAP Analiz"):
         st.subheader("🏛️ UYAP Toplu Dosya Analizi")
         st.info("UYAP'tan indirdiğiniz ZIP dosyalarını yükleyin. Sistem son 5 evrağı analiz eder.")
         uyap_zips = st.file_uploader("UYAP Dosyalarını Yükle (ZIP)", type=['zip'], accept_multiple_files=True)
@@ -3938,11 +3966,11 @@ def main():
         if uyap_zips and st.button("🚀 Dosyaları Analiz Et", type="primary"):
             if not api_key: st.error("API Key gerekli.")
             else:
-                progress_bar = st.progress(0)
-                for idx, zip_file in enumerate(uyap_zips):
-                    dosya_adi = zip_file.name
-                    st.markdown(f"### 📂 {dosya_adi}")
-                    with st.spinner(f"{dosya_adi} inceleniyor..."):
+                # 1. ADIM: ZIP'leri yerelde oku ve her dosya için prompt hazırla
+                uyap_isler = []
+                with st.spinner("ZIP dosyaları açılıyor..."):
+                    for zip_file in uyap_zips:
+                        dosya_adi = zip_file.name
                         try:
                             with zipfile.ZipFile(zip_file) as z:
                                 files_info = []
@@ -3965,45 +3993,62 @@ def main():
                                             elif ext in ['docx', 'doc']: content = extract_text_from_docx(file_bytes)
                                             elif ext == 'txt': content = file_bytes.read().decode('utf-8', errors='ignore')
                                         except: content = "Okunamadı"
-                                        file_context += f"\n--- {fname} ({fdate}) ---\n{content[:5000]}"
+                                        file_context += f"\n--- {fname} ({fdate}) ---\n{content}"
                                 
+                                # Beş evrak tek bütçeyi paylaşır; her evrağın en az bir parçası korunur
+                                file_context = pack_context(file_context, BUDGET_UYAP_DOSYA).text
                                 prompt = f"GÖREV: Bu dava dosyasının SON 5 evrağına göre durumu özetle.\nEVRAKLAR:\n{file_context}"
-                                analiz_sonucu = get_ai_response(prompt, api_key)
-                                st.markdown(f"<div class='uyap-kutusu'>{analiz_sonucu}</div>", unsafe_allow_html=True)
-                        except Exception as e: st.error(f"Hata: {str(e)}")
-                    progress_bar.progress((idx + 1) / len(uyap_zips))
-
+                                uyap_isler.append({"ad": dosya_adi, "prompt": prompt, "hata": None})
+                        except Exception as e:
+                            uyap_isler.append({"ad": dosya_adi, "prompt": None, "hata": str(e)})
 
-    with tab16:
+                # 2. ADIM: Özetleri eşzamanlı iste (sonuçlar yükleme sırasıyla gelir)
+                progress_bar = st.progress(0)
+                durum = st.empty()
+                def uyap_ozetle(kayit):
+                    if kayit["hata"]: return None
+                    return get_ai_response(kayit["prompt"], api_key)
+                def ilerleme(tamam, toplam):
+                    progress_bar.progress(tamam / toplam)
+                    durum.caption(f"{tamam}/{toplam} dosya özetlendi")
+                sonuclar = run_parallel(uyap_ozetle, uyap_isler, st.session_state.get("ai_workers"), ilerleme)
+
+                for kayit, analiz_sonucu in zip(uyap_isler, sonuclar):
+                    st.markdown(f"### 📂 {kayit['ad']}")
+                    if kayit["hata"]: st.error(f"Hata: {kayit['hata']}")
+                    elif isinstance(analiz_sonucu, Exception): st.error(f"Hata: {str(analiz_sonucu)}")
+                    else: st.markdown(f"<div class='uyap-kutusu'>{analiz_sonucu}</div>", unsafe_allow_html=True)
+
+
+    with tab16, llm_module("İlişki Ağı"):
         st.subheader("🕸️ Dosya İlişki Ağı")
         if st.button("İlişki Ağını Çiz", type="primary"):
             if not api_key or not st.session_state.doc_text: st.error("Dosya ve API Key gerekli.")
             else:
                 with st.spinner("Analiz ediliyor..."):
-                    prompt = f"GÖREV: Bu metindeki kişileri ve rollerini Graphviz DOT formatında ver.\nMETİN: {st.session_state.doc_text[:50000]}"
+                    prompt = f"GÖREV: Bu metindeki kişileri ve rollerini Graphviz DOT formatında ver.\nMETİN: {pack_for_prompt(st.session_state.doc_text, BUDGET_LONG_DOC, query='taraf davacı davalı vekil tanık bilirkişi mahkeme')}"
                     dot_code = get_ai_response(prompt, api_key).replace("```dot", "").replace("```", "").strip()
                     try: st.graphviz_chart(dot_code)
                     except: st.code(dot_code)
 
-    with tab17:
+    with tab17, llm_module("Sözleşme Analiz"):
         st.subheader("📝 Sözleşme Risk Analizi")
         sozlesme_file = st.file_uploader("Sözleşme Yükle", type=['pdf', 'docx'], key="soz_up")
         if sozlesme_file and st.button("Sözleşmeyi İncele"):
             if not api_key: st.error("API Key gerekli.")
             else:
-                with st.spinner("İnceleniyor..."):
-                    s_bytes = BytesIO(sozlesme_file.getvalue())
-                    s_ext = sozlesme_file.name.split('.')[-1].lower()
-                    s_text = extract_text_from_docx(s_bytes) if s_ext == 'docx' else parse_pdf(s_bytes)
-                    prompt = f"GÖREV: Bu sözleşmeyi risk analizi yap (Riskler, Eksikler, Öneriler).\nMETİN: {s_text[:50000]}"
-                    st.session_state.sozlesme_analiz = get_ai_response(prompt, api_key)
+                s_bytes = BytesIO(sozlesme_file.getvalue())
+                s_ext = sozlesme_file.name.split('.')[-1].lower()
+                s_text = extract_text_from_docx(s_bytes) if s_ext == 'docx' else parse_pdf(s_bytes)
+                prompt = f"GÖREV: Bu sözleşmeyi risk analizi yap (Riskler, Eksikler, Öneriler).\nMETİN: {pack_for_prompt(s_text, BUDGET_LONG_DOC)}"
+                st.session_state.sozlesme_analiz = stream_ai_response(prompt, api_key)
         if st.session_state.sozlesme_analiz:
             st.markdown(st.session_state.sozlesme_analiz)
 
 
     # --- YENİ MODÜLLER (TAB 19-23) ---
 
-    with tab19:
+    with tab19, llm_module("KVKK Temizle"):
         st.subheader("🕵️‍♂️ KVKK / Anonimleştirme")
         st.info("Metindeki T.C. Kimlik, Telefon ve İsimleri gizler.")
         kvkk_input = st.text_area("Metni Buraya Yapıştırın", height=200)
@@ -4029,7 +4074,7 @@ def main():
 
 
 
-    with tab21: # Belge Kıyasla & Mevzuat Diff Motoru (Gelişmiş)
+    with tab21, llm_module("Belge Kıyasla"): # Belge Kıyasla & Mevzuat Diff Motoru (Gelişmiş)
         st.subheader("⚖️ Mevzuat ve Sözleşme Diff Motoru (Git-Style)")
         st.info("Eski ve yeni versiyonları karşılaştırın. İster metin yapıştırın, ister PDF/Word/Resim dosyası yükleyin. Sistem OCR desteklidir.")
 
@@ -4201,7 +4246,7 @@ def main():
                     st.warning("Detaylı etki analizi için API Key gereklidir.")
 
 
-    with tab22:
+    with tab22, llm_module("Sanal Duruşma"):
         st.subheader("🎭 Sanal Duruşma Simülasyonu")
         st.info("AI Hakim karşısında savunma pratiği yapın.")
         
@@ -4244,7 +4289,7 @@ def main():
                             st.session_state.mock_messages.append({"role": "assistant", "content": ai_reply})
                             st.rerun()
 
-    with tab23:
+    with tab23, llm_module("Görev Çıkarıcı"):
         st.subheader("✅ Akıllı Görev")
         st.info("Mahkeme kararından yapılacak işleri listeler.")
         
@@ -4267,7 +4312,7 @@ def main():
                 st.toast("Görev listesi kopyalandı!")
 
 
-    with tab31: # Şeytanın Avukatı (Devil's Advocate)
+    with tab31, llm_module("Şeytanın Avukatı"): # Şeytanın Avukatı (Devil's Advocate)
         st.subheader("😈 Şeytanın Avukatı (AI Adversary)")
         st.info("Dilekçenizi buraya yapıştırın. Yapay zeka 'Karşı Tarafın Avukatı' rolüne girsin ve dilekçenizi acımasızca eleştirsin.")
         
@@ -4298,7 +4343,7 @@ def main():
                     st.markdown(elestiri)
                     st.success("💡 İpucu: Yukarıdaki eleştirilere göre dilekçenizi revize ederseniz kazanma şansınız artar.")
 
-    with tab32: # Canlı Duruşma Asistanı (Live Fact-Check)
+    with tab32, llm_module("Canlı Asistan"): # Canlı Duruşma Asistanı (Live Fact-Check)
         st.subheader("⚡ Canlı Duruşma Asistanı (Live Fact-Check)")
         st.info("Duruşma sırasında karşı tarafın söylediği iddialı cümleyi veya kanun maddesini girin. Sistem anında doğruluk kontrolü yapsın.")
         
@@ -4343,7 +4388,7 @@ def main():
                         """, unsafe_allow_html=True)
 
 
-    with tab26: # Hukuki Çeviri Modülü
+    with tab26, llm_module("Çeviri"): # Hukuki Çeviri Modülü
         st.subheader("🌍 Hukuki Terminoloji Çevirmeni")
         st.info("Yapay zeka, kelimeleri 'hukuki bağlamda' değerlendirerek çevirir. (Örn: Bar -> Baro, Execution -> İcra)")
         
@@ -4377,7 +4422,7 @@ def main():
                         {ceviri_sonuc}
                     </div>
                     """, unsafe_allow_html=True)
-    with tab29: # Tez Çürütücü Modülü
+    with tab29, llm_module("Çürüt"): # Tez Çürütücü Modülü
         st.subheader("🛡️ Karşı Taraf Tez Çürütücü")
         st.info("Karşı tarafın iddiasını girin, yapay zeka bu iddiayı çürütmek için hukuki argümanlar üretsin.")
         
@@ -4414,7 +4459,7 @@ def main():
                     </div>
                     """, unsafe_allow_html=True)
 
-    with tab30: # Çapraz Sorgu Hazırlayıcı
+    with tab30, llm_module("Sorgu"): # Çapraz Sorgu Hazırlayıcı
         st.subheader("🕵️‍♂️ Çapraz Sorgu Hazırlayıcı (Cross-Examination)")
         st.info("Tanık veya sanık ifadesini girin. Yapay zeka, çelişkileri bulsun ve köşeye sıkıştıran sorular hazırlasın.")
         
@@ -4450,7 +4495,7 @@ def main():
                         {sorgu_sonuc}
                     </div>
                     """, unsafe_allow_html=True)
-    with tab33: # Mevzuat Etki Analizi (Impact Analysis)
+    with tab33, llm_module("Etki Analizi"): # Mevzuat Etki Analizi (Impact Analysis)
         st.subheader("📡 Akıllı Mevzuat Radarı & Etki Analizi")
         st.info("Bu modül, Resmi Gazete'yi günlük olarak tarar ve SADECE sizin takip listenizdeki dosyaları etkileyen değişiklikleri raporlar.")
 
@@ -4558,6 +4603,11 @@ def main():
 
                         # --- 2. İÇERİKLERİ TARA VE EŞLEŞTİR ---
                         total_docs = len(target_links)
+                        # Takip listesi tek otomatta derlenir (liste değişmedikçe yeniden kurulmaz)
+                        takip_kurallari = {}
+                        for item in st.session_state.mevzuat_takip_listesi:
+                            takip_kurallari.setdefault(item['konu'], []).append(item)
+                        takip_eslestirici = get_matcher(takip_kurallari)
                         
                         for i, doc in enumerate(target_links):
                             progress_bar.progress((i + 1) / total_docs)
@@ -4581,18 +4631,20 @@ def main():
                             except:
                                 doc_text = doc['title']
 
-                            # Takip Listesiyle Karşılaştır
-                            for item in st.session_state.mevzuat_takip_listesi:
-                                keyword = item['konu']
-                                # Basit eşleşme kontrolü
-                                if keyword.lower() in doc_text.lower() or (not canli_veri_cekildi and i == 0): 
-                                    # Not: Simülasyonda en az 1 tane çıksın diye 'i==0' hilesi yaptık
-                                    found_matches.append({
-                                        "doc_title": doc['title'],
-                                        "doc_link": doc['link'],
-                                        "matched_item": item,
-                                        "context": doc_text[:500]
-                                    })
+                            # Takip Listesiyle Karşılaştır (belge tek geçişte taranır)
+                            if not canli_veri_cekildi and i == 0:
+                                # Not: Simülasyonda en az 1 tane çıksın diye 'i==0' hilesi yaptık
+                                eslesen_kurallar = st.session_state.mevzuat_takip_listesi
+                            else:
+                                eslesen_kurallar = [item for konu in takip_eslestirici.matches(doc_text)
+                                                    for item in takip_kurallari[konu]]
+                            for item in eslesen_kurallar:
+                                found_matches.append({
+                                    "doc_title": doc['title'],
+                                    "doc_link": doc['link'],
+                                    "matched_item": item,
+                                    "context": doc_text[:500]
+                                })
 
                         progress_bar.empty()
                         
@@ -4646,7 +4698,7 @@ def main():
                         st.success("Analiz Tamamlandı")
                         st.write(res)
 
-    with tab34: # Semantik Arşiv Sorgulama (RAG) - OCR Destekli (Düzeltilmiş)
+    with tab34, llm_module("Semantik"): # Semantik Arşiv Sorgulama (RAG) - OCR Destekli (Düzeltilmiş)
         st.subheader("🧠 Semantik Arşiv (OCR & Çoklu Format)")
         st.info("PDF, Word, UDF, TXT ve Resim (JPG, PNG) dosyalarını yükleyin. Sistem görselleri okur (OCR), metinleri tarar ve sorunuzun cevabını dosya adıyla birlikte verir.")
         
@@ -4659,117 +4711,156 @@ def main():
             key="rag_file_uploader_final"
         )
         
-        # Oturum bazlı hafıza
-        if 'archive_memory' not in st.session_state:
-            st.session_state.archive_memory = ""
+        # Oturum bazlı hafıza: parçalı arşiv dizini (diskte kalıcı)
+        if 'archive_index' not in st.session_state:
+            st.session_state.archive_index = None
+
+        # Bu anahtarla daha önce işlenmiş arşivler OCR yapılmadan açılabilir
+        kayitli_arsivler = saved_archives(api_key)
+        if kayitli_arsivler:
+            arsiv_secenekleri = {f"{m['kaynak_adi']} ({len(m['dosyalar'])} dosya, {m['parca_sayisi']} parça)": m["dizin_id"]
+                                 for m in kayitli_arsivler}
+            col_arsiv1, col_arsiv2 = st.columns([3, 1])
+            with col_arsiv1:
+                arsiv_secim = st.selectbox("💾 Kayıtlı Arşivler", ["—"] + list(arsiv_secenekleri), key="rag_saved_archive")
+            with col_arsiv2:
+                if st.button("📂 Arşivi Aç", key="rag_open_archive") and arsiv_secim != "—":
+                    st.session_state.archive_index = open_saved_archive(arsiv_secenekleri[arsiv_secim], api_key)
+
+        if st.session_state.archive_index is not None:
+            acik_arsiv = st.session_state.archive_index.manifest
+            st.caption(f"🗂️ Açık arşiv: {len(acik_arsiv['dosyalar'])} dosya, {acik_arsiv['parca_sayisi']} parça "
+                       f"({', '.join(acik_arsiv['dosyalar'][:5])}{' ...' if len(acik_arsiv['dosyalar']) > 5 else ''})")
             
         if uploaded_archive:
             if st.button("📂 Dosyaları Tara, OCR Yap ve Hafızaya Al", key="rag_process_btn_final"):
-                # Gerekli kütüphaneleri güvenli şekilde çağırıyoruz
-                import io
+                arsiv_ozeti = archive_digest([(f.name, f.getvalue()) for f in uploaded_archive])
+                hazir_arsiv = open_archive(arsiv_ozeti, api_key)
+                if hazir_arsiv is not None:
+                    # Aynı dosyalar daha önce işlenmiş: OCR / okuma tekrarlanmaz
+                    st.session_state.archive_index = hazir_arsiv
+                    st.success(f"✅ Bu dosyalar daha önce işlenmiş; kayıtlı arşiv açıldı ({len(hazir_arsiv)} parça).")
+                else:
+                    # Gerekli kütüphaneleri güvenli şekilde çağırıyoruz
+                    import io
                 
-                # Kütüphane kontrolü (Yüklü değilse kodun patlamaması için)
-                try:
-                    import PyPDF2
-                except ImportError:
-                    PyPDF2 = None
+                    # Kütüphane kontrolü (Yüklü değilse kodun patlamaması için)
+                    try:
+                        import PyPDF2
+                    except ImportError:
+                        PyPDF2 = None
                 
-                try:
-                    from docx import Document
-                except ImportError:
-                    Document = None
+                    try:
+                        from docx import Document
+                    except ImportError:
+                        Document = None
                     
-                try:
-                    from PIL import Image
-                    import pytesseract
-                except ImportError:
-                    Image = None
-                    pytesseract = None
-
-                tum_metin = ""
-                basarili_dosya = 0
-                progress_bar = st.progress(0)
+                    try:
+                        from PIL import Image
+                        import pytesseract
+                    except ImportError:
+                        Image = None
+                        pytesseract = None
+
+                    belgeler = []
+                    basarili_dosya = 0
+                    progress_bar = st.progress(0)
                 
-                st.toast("Dosyalar işleniyor, lütfen bekleyin...", icon="⏳")
+                    st.toast("Dosyalar işleniyor, lütfen bekleyin...", icon="⏳")
 
-                for i, file in enumerate(uploaded_archive):
-                    file_name = file.name
-                    file_ext = file_name.split('.')[-1].lower()
-                    file_content = ""
+                    for i, file in enumerate(uploaded_archive):
+                        file_name = file.name
+                        file_ext = file_name.split('.')[-1].lower()
+                        file_content = ""
                     
-                    try:
-                        # 1. PDF OKUMA
-                        if file_ext == 'pdf':
-                            if PyPDF2:
-                                try:
-                                    pdf_reader = PyPDF2.PdfReader(file)
-                                    for page in pdf_reader.pages:
-                                        text = page.extract_text()
-                                        if text: file_content += text + "\n"
-                                except:
-                                    file_content = "[Bu PDF okunamadı veya şifreli]"
-                            else:
-                                file_content = "[PyPDF2 kütüphanesi eksik]"
+                        try:
+                            # 1. PDF OKUMA
+                            if file_ext == 'pdf':
+                                if PyPDF2:
+                                    try:
+                                        pdf_reader = PyPDF2.PdfReader(file)
+                                        for page in pdf_reader.pages:
+                                            text = page.extract_text()
+                                            if text: file_content += text + "\n"
+                                    except:
+                                        file_content = "[Bu PDF okunamadı veya şifreli]"
+                                else:
+                                    file_content = "[PyPDF2 kütüphanesi eksik]"
 
-                        # 2. WORD (DOCX) OKUMA
-                        elif file_ext == 'docx':
-                            if Document:
-                                try:
-                                    doc = Document(file)
-                                    for para in doc.paragraphs:
-                                        file_content += para.text + "\n"
-                                except:
-                                    file_content = "[DOCX formatı okunamadı]"
-                            else:
-                                file_content = "[python-docx kütüphanesi eksik]"
-                        
-                        # 3. RESİM DOSYALARI (OCR İŞLEMİ)
-                        elif file_ext in ['png', 'jpg', 'jpeg', 'tiff', 'bmp']:
-                            if Image and pytesseract:
-                                try:
-                                    image = Image.open(file)
-                                    # OCR işlemi (Varsayılan dil)
+                            # 2. WORD (DOCX) OKUMA
+                            elif file_ext == 'docx':
+                                if Document:
                                     try:
-                                        file_content = pytesseract.image_to_string(image, lang='tur')
+                                        doc = Document(file)
+                                        for para in doc.paragraphs:
+                                            file_content += para.text + "\n"
                                     except:
-                                        file_content = pytesseract.image_to_string(image)
+                                        file_content = "[DOCX formatı okunamadı]"
+                                else:
+                                    file_content = "[python-docx kütüphanesi eksik]"
+                        
+                            # 3. RESİM DOSYALARI (OCR İŞLEMİ)
+                            elif file_ext in ['png', 'jpg', 'jpeg', 'tiff', 'bmp']:
+                                if Image and pytesseract:
+                                    try:
+                                        image = Image.open(file)
+                                        # OCR işlemi (Varsayılan dil)
+                                        try:
+                                            file_content = pytesseract.image_to_string(image, lang='tur')
+                                        except:
+                                            file_content = pytesseract.image_to_string(image)
                                         
-                                    if not file_content.strip(): 
-                                        file_content = "[Resimde okunabilir metin bulunamadı]"
-                                except Exception as e_ocr:
-                                    file_content = f"[OCR Hatası: {str(e_ocr)}]"
-                            else:
-                                file_content = "[OCR kütüphaneleri (Pillow/Tesseract) eksik]"
+                                        if not file_content.strip(): 
+                                            file_content = "[Resimde okunabilir metin bulunamadı]"
+                                    except Exception as e_ocr:
+                                        file_content = f"[OCR Hatası: {str(e_ocr)}]"
+                                else:
+                                    file_content = "[OCR kütüphaneleri (Pillow/Tesseract) eksik]"
 
-                        # 4. UDF (UYAP) ve TXT OKUMA
-                        elif file_ext in ['txt', 'udf', 'xml']:
-                            try:
-                                stringio = io.StringIO(file.getvalue().decode("utf-8", errors='ignore'))
-                                file_content = stringio.read()
-                            except:
-                                file_content = "[Metin dosyası okunamadı]"
+                            # 4. UDF (UYAP) ve TXT OKUMA
+                            elif file_ext in ['txt', 'udf', 'xml']:
+                                try:
+                                    stringio = io.StringIO(file.getvalue().decode("utf-8", errors='ignore'))
+                                    file_content = stringio.read()
+                                except:
+                                    file_content = "[Metin dosyası okunamadı]"
                         
-                        # 5. ESKİ WORD (DOC)
-                        elif file_ext == 'doc':
-                             file_content = "[.doc formatı binary olduğu için tam desteklenmiyor, lütfen .docx'e çevirip yükleyin.]"
-
-                        # Metni Hafızaya Ekle
-                        if len(file_content) > 5: 
-                            tum_metin += f"\n{'='*20}\n📂 DOSYA ADI: {file_name}\n{'='*20}\n{file_content}\n"
-                            basarili_dosya += 1
+                            # 5. ESKİ WORD (DOC)
+                            elif file_ext == 'doc':
+                                 file_content = "[.doc formatı binary olduğu için tam desteklenmiyor, lütfen .docx'e çevirip yükleyin.]"
+
+                            # Metni Hafızaya Ekle
+                            if len(file_content) > 5: 
+                                belgeler.append((file_name, file_content))
+                                basarili_dosya += 1
                         
-                    except Exception as e:
-                        st.error(f"Hata ({file_name}): {e}")
+                        except Exception as e:
+                            st.error(f"Hata ({file_name}): {e}")
                     
-                    # İlerleme çubuğunu güncelle
-                    progress_bar.progress((i + 1) / len(uploaded_archive))
+                        # İlerleme çubuğunu güncelle
+                        progress_bar.progress((i + 1) / len(uploaded_archive))
                 
-                st.session_state.archive_memory = tum_metin
-                
-                if basarili_dosya > 0:
-                    st.success(f"✅ {basarili_dosya} dosya başarıyla işlendi ve hafızaya alındı!")
-                else:
-                    st.warning("Dosyalar yüklendi ancak içerik okunamadı (Kütüphane eksikliği veya dosya formatı sorunu).")
+                    if basarili_dosya > 0:
+                        if not api_key:
+                            st.error("Arşiv dizini için API Key gerekli.")
+                        else:
+                            # Parçalara böl, vektörleştir ve diske yaz (soru başına yalnızca ilgili parçalar kullanılır)
+                            with st.spinner("Arşiv dizini oluşturuluyor..."):
+                                embed_bar = st.progress(0.0)
+                                yeni_arsiv = None
+                                try:
+                                    yeni_arsiv = build_archive(
+                                        arsiv_ozeti, belgeler, api_key,
+                                        on_progress=lambda done, total: embed_bar.progress(done / total))
+                                except Exception as e:
+                                    st.error(f"Arşiv dizini oluşturulamadı: {e}")
+                                embed_bar.empty()
+                            if yeni_arsiv is not None:
+                                st.session_state.archive_index = yeni_arsiv
+                                st.success(f"✅ {basarili_dosya} dosya başarıyla işlendi ve hafızaya alındı "
+                                           f"({len(yeni_arsiv)} parça)!")
+                    else:
+                        st.warning("Dosyalar yüklendi ancak içerik okunamadı (Kütüphane eksikliği veya dosya formatı sorunu).")
 
         st.divider()
         
@@ -4782,16 +4873,19 @@ def main():
             
         if rag_btn:
             if not api_key: st.error("API Key gerekli.")
-            elif not st.session_state.archive_memory: st.warning("Önce dosya yükleyip işleyin.")
+            elif st.session_state.archive_index is None: st.warning("Önce dosya yükleyip işleyin.")
             elif not rag_soru: st.warning("Soru girmediniz.")
             else:
                 with st.spinner("Dosyalar taranıyor, anlam analizi yapılıyor..."):
+                    # Tüm arşiv yerine yalnızca soruya en ilgili parçalar
+                    arsiv = st.session_state.archive_index
+                    arsiv_sonuclari = search_archive(arsiv, rag_soru, api_key)
                     prompt = f"""
                     GÖREV: Sen uzman bir Hukuk Arşiv Asistanısın.
                     
                     BAĞLAM (ARCHIVE):
-                    Aşağıda kullanıcının yüklediği dosyaların içerikleri var (OCR ile okunmuş metinler dahil):
-                    {st.session_state.archive_memory}
+                    Aşağıda kullanıcının yüklediği dosyalardan soruyla en ilgili bölümler var (OCR ile okunmuş metinler dahil):
+                    {format_context(arsiv, arsiv_sonuclari, query=rag_soru)}
                     
                     SORU: {rag_soru}
                     
@@ -4813,9 +4907,13 @@ def main():
                         {rag_cevap}
                     </div>
                     """, unsafe_allow_html=True)
+                    for ad, sebep in arsiv_sonuclari.skipped.items():
+                        st.caption(f"⚠️ {ad} araması atlandı: {sebep}")
+                    if arsiv_sonuclari:
+                        st.caption("📂 Taranan kaynak dosyalar: " + ", ".join(hit_sources(arsiv, arsiv_sonuclari)))
 
 
-    with tab35: # Sesli Duruşma Analizi & Çelişki Alarmı
+    with tab35, llm_module("Canlı Duruşma"): # Sesli Duruşma Analizi & Çelişki Alarmı
         st.subheader("🎙️ Duruşma Asistanı: Canlı Çelişki Yakalayıcı")
         st.info("Tanığın önceki ifadesini (Referans Metin) girin ve duruşma ses kaydını yükleyin. Sistem, söylenenleri metne çevirir ve eski ifadeyle çelişen noktaları 'Kırmızı Alarm' olarak bildirir.")
 
@@ -4924,7 +5022,7 @@ def main():
                 elif not api_key:
                     st.error("Analiz için API Key gereklidir.")
 
-    with tab36: # Dijital Otopsi & Metadata Analizi
+    with tab36, llm_module("Dijital Otp"): # Dijital Otopsi & Metadata Analizi
         st.subheader("🕵️ Dijital Otopsi ve Metadata Dedektifi")
         st.info("Bir dosyanın (PDF veya Resim) 'perde arkasındaki' verilerini (Metadata/EXIF) analiz eder. Dosyanın ne zaman, kim tarafından, hangi yazılımla oluşturulduğunu ve değiştirildiğini ortaya çıkarır.")
 
@@ -5053,7 +5151,7 @@ def main():
                     else:
                         st.info("Detaylı sahtecilik analizi için API Key gereklidir.")
 
-    with tab37: # 3. SATIR: Mevzuat Kelebek Etkisi Simülatörü
+    with tab37, llm_module("Kelebek"): # 3. SATIR: Mevzuat Kelebek Etkisi Simülatörü
         st.subheader("🦋 Mevzuat Kelebek Etkisi Simülatörü (Graph Analizi)")
         st.info("Hukuk bir ağdır. Bir kanun maddesindeki tek bir kelime değişikliğinin, en uçtaki yönetmelik, tebliğ ve ruhsatları nasıl etkilediğini haritalandırır.")
 
@@ -5071,10 +5169,55 @@ def main():
             sector = st.selectbox("Etki Analizi Odak Alanı:", 
                                   ["Genel Bakış", "İnşaat & Emlak", "Vergi & Finans", "İş Hukuku & IK", "Sağlık & İlaç"])
 
+            st.markdown("### 📌 Değişen Madde (Yerel Atıf Grafiği)")
+            degisen_madde = st.text_input("Atıf:", placeholder="Örn: 5996 m.41 (boşsa değişiklik metnindeki atıf kullanılır)")
+            etki_adim = st.slider("Etki derinliği (adım)", 1, 5, 3)
+            ai_yorum_iste = st.checkbox("AI risk yorumu ekle", value=False)
+
             analyze_btn = st.button("🕸️ Etki Ağını Haritalandır", use_container_width=True)
+            atif_istatistik = citation_graph.stats()
+            st.caption(f"Yerel atıf grafiği: {atif_istatistik['dugum']} madde, {atif_istatistik['atif']} atıf")
+            if st.button("🔄 Atıf Grafiğini Yeniden Kur", use_container_width=True):
+                with st.spinner("Madde dizinindeki kanunlar taranıyor..."):
+                    st.success(f"{citation_graph.rebuild()} atıf çıkarıldı.")
+
+        # Değişen madde yerel derlemdeyse etki kümesi atıf grafiğinden (AI'sız, her seferinde aynı) çıkarılır
+        kelebek_atif = parse_reference(degisen_madde) if degisen_madde else None
+        if kelebek_atif is None and law_change:
+            # "5996 sayılı Kanunun 41 inci maddesinde ..." gibi bir cümleden ilk atıf
+            kelebek_atif = next((ArticleRef(law, kind, no) for law, kind, no in extract_citations("", law_change) if law and kind), None)
+        kelebek_yerel = kelebek_atif is not None and statute_index.lookup(ArticleRef(kelebek_atif.law_no, kelebek_atif.kind, kelebek_atif.no)) is not None
 
         with col_graph2:
-            if analyze_btn and law_change:
+            if analyze_btn and kelebek_yerel:
+                kelebek_dugum = (kelebek_atif.law_no, kelebek_atif.kind, kelebek_atif.no)
+                etkilenenler = citation_graph.impact(kelebek_dugum, etki_adim)
+                st.caption(f"📚 Yerel atıf grafiği: {node_label(kelebek_dugum)} {statute_index.title(kelebek_atif.law_no)}")
+                if not etkilenenler:
+                    st.info("Yerel derlemde bu maddeye atıf yapan bir madde bulunamadı.")
+                else:
+                    try:
+                        st.graphviz_chart(impact_dot(kelebek_dugum, etkilenenler))
+                    except Exception as e:
+                        st.error(f"Haritalama hatası: {e}")
+                    st.dataframe(pd.DataFrame([{"adım": adim, "etkilenen": node_label(hedef), "kanun": statute_index.title(hedef[0]),
+                                                "üzerinden": node_label(kaynak)} for hedef, adim, kaynak in etkilenenler]),
+                                 use_container_width=True, hide_index=True)
+                    if ai_yorum_iste and api_key:
+                        etki_listesi = ", ".join(f"{node_label(hedef)} ({adim}. adım)" for hedef, adim, _ in etkilenenler[:40])
+                        explanation = get_ai_response(
+                            f"'{node_label(kelebek_dugum)}' maddesinde şu değişiklik yapıldı: '{law_change}'. "
+                            f"Atıf zincirleriyle etkilenen maddeler: {etki_listesi}. En tehlikeli 'Kelebek Etkisi' hangisidir ve neden? Tek paragraf açıkla.",
+                            api_key)
+                        st.markdown(f"""
+                        <div style="border: 1px solid #ffcc00; background-color: #fffbea; padding: 15px; border-radius: 8px;">
+                            <strong>⚠️ Gizli Tehlike (Kelebek Etkisi):</strong><br>
+                            {explanation}
+                        </div>
+                        """, unsafe_allow_html=True)
+
+            elif analyze_btn and law_change:
+                st.caption("⚠️ Değişen madde yerel madde dizininde yok; ağ AI tarafından tahmin ediliyor (çalıştırmalar arasında farklı olabilir).")
                 if not api_key:
                     st.warning("Bu simülasyon için API Key gereklidir.")
                 else:
@@ -0,0 +1,343 @@
+"""
+Paralel AI İş Yürütücüsü
+
+Birbirinden bağımsız Gemini isteklerini (UYAP toplu özet, kurumsal hafıza,
+resim OCR vb.) sınırlı sayıda iş parçacığıyla eşzamanlı çalıştırır.
+- API anahtarı başına token-bucket hız sınırlayıcı ve öncelik kuyruğu:
+  etkileşimli çağrılar kuyruktaki toplu işlerin önüne geçer
+- Anahtar başına günlük istek bütçesi (toplu işlere yalnızca bir pay ayrılır)
+- 429 / 5xx hatalarında üstel geri çekilme (exponential backoff)
+- Sonuçlar gönderim sırasıyla döner
+"""
+
+import contextvars
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+from typing import Callable, Dict, List, Optional
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    RETRYABLE_EXCEPTIONS = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        google_exceptions.InternalServerError,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+    )
+except ImportError:
+    RETRYABLE_EXCEPTIONS = ()
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+DEFAULT_WORKERS = int(os.environ.get("AI_MAX_WORKERS", "4"))
+DEFAULT_RPM = int(os.environ.get("AI_REQUESTS_PER_MINUTE", "60"))   # Anahtar başına dakikalık istek
+DEFAULT_BURST = int(os.environ.get("AI_BURST", "8"))                # Anlık izin verilen patlama
+DAILY_REQUEST_BUDGET = int(os.environ.get("AI_DAILY_REQUEST_BUDGET", "0"))      # 0 = sınırsız
+BATCH_BUDGET_SHARE = float(os.environ.get("AI_BATCH_BUDGET_SHARE", "0.7"))   # Toplu işlerin bütçe payı
+WAIT_SAMPLES = 500      # Bekleme süresi istatistiği için tutulan son örnek sayısı
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0      # sn
+BACKOFF_MAX = 30.0      # sn
+
+RETRYABLE_CODES = (429, 500, 502, 503, 504)
+# Kod / tür bilgisi olmayan hatalar için yalnızca açık ifadeler (sayı ya da "quota" tek başına yetmez)
+RETRYABLE_MARKERS = ("resource has been exhausted", "too many requests", "rate limit",
+                     "service unavailable", "temporarily unavailable", "deadline exceeded")
+# Günlük / faturalama kotası dolduysa beklemek işe yaramaz
+PERMANENT_QUOTA_MARKERS = ("per day", "perday", "daily", "billing")
+
+
+# ============================================================================
+# ÖNCELİKLİ ZAMANLAYICI
+# ============================================================================
+
+INTERACTIVE = "interactive"     # Kullanıcının beklediği sohbet / tek soru çağrıları
+BATCH = "batch"                 # Toplu özet, OCR, embedding gibi arka plan işleri
+PRIORITIES = (INTERACTIVE, BATCH)
+
+_priority: ContextVar[str] = ContextVar("ai_priority", default=INTERACTIVE)
+
+
+class QuotaBudgetExceeded(RuntimeError):
+    """Anahtarın günlük istek bütçesi (ya da toplu işlere ayrılan payı) doldu."""
+
+    def __init__(self, priority: str, used: int, limit: int):
+        self.priority = priority
+        self.used = used
+        self.limit = limit
+        scope = "toplu işler için ayrılan" if priority == BATCH else "günlük"
+        super().__init__(f"API anahtarının {scope} istek bütçesi doldu ({used}/{limit}).")
+
+
+@contextmanager
+def ai_priority(priority: str):
+    """Bu blok içindeki AI çağrıları verilen öncelik sınıfıyla sıraya girer."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+class KeyScheduler:
+    """
+    Bir API anahtarının hız sınırı ve öncelik kuyruğu. Jetonlar saniyede
+    `rate` hızla en fazla `capacity` kadar dolar; jeton sırası gelen
+    bekleyene verilir. Etkileşimli kuyrukta bekleyen varken toplu işlere
+    jeton verilmez, böylece kullanıcı sorusu kuyruktaki toplu işlerin önüne
+    geçer (çalışmakta olan çağrılar kesilmez).
+    """
+
+    def __init__(self, rate: float, capacity: int, daily_budget: int = DAILY_REQUEST_BUDGET,
+                 batch_share: float = BATCH_BUDGET_SHARE):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.daily_budget = daily_budget
+        self.batch_share = batch_share
+        self._cond = threading.Condition()
+        self._queues: Dict[str, deque] = {p: deque() for p in PRIORITIES}
+        self._waits: Dict[str, deque] = {p: deque(maxlen=WAIT_SAMPLES) for p in PRIORITIES}
+        self.granted: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self.rejected: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self.used: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self.budget_day = date.today()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _limit(self, priority: str) -> int:
+        if priority == BATCH:
+            return int(self.daily_budget * self.batch_share)
+        return self.daily_budget
+
+    def _check_budget(self, priority: str):
+        """Bütçe doluysa QuotaBudgetExceeded yükseltir (kilit altında çağrılır)."""
+        today = date.today()
+        if today != self.budget_day:
+            self.budget_day = today
+            self.used = {p: 0 for p in PRIORITIES}
+        if self.daily_budget <= 0:
+            return
+        used, limit = sum(self.used.values()), self._limit(priority)
+        if used >= limit:
+            self.rejected[priority] += 1
+            raise QuotaBudgetExceeded(priority, used, limit)
+
+    def acquire(self, priority: str = INTERACTIVE):
+        """Sıra ve jeton gelene kadar bekler; bütçe doluysa hemen hata verir."""
+        if priority not in self._queues:
+            priority = INTERACTIVE
+        start = time.monotonic()
+        ticket = object()
+        with self._cond:
+            self._check_budget(priority)
+            queue = self._queues[priority]
+            queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    turn = queue[0] is ticket and (priority == INTERACTIVE or not self._queues[INTERACTIVE])
+                    if turn and self.tokens >= 1.0:
+                        self._check_budget(priority)
+                        self.tokens -= 1.0
+                        break
+                    # Sıra bizdeyse jeton dolana kadar, değilse bir sonraki verilişe kadar bekle
+                    self._cond.wait((1.0 - self.tokens) / self.rate if turn else None)
+            finally:
+                queue.remove(ticket)
+                self._cond.notify_all()
+            self.used[priority] += 1
+            self.granted[priority] += 1
+            self._waits[priority].append(time.monotonic() - start)
+
+    def stats(self) -> List[Dict]:
+        """Öncelik sınıfı başına kuyruk derinliği, bekleme süresi ve bütçe kullanımı"""
+        rows = []
+        with self._cond:
+            for p in PRIORITIES:
+                waits = sorted(self._waits[p])
+                limit = self._limit(p)
+                rows.append({
+                    "oncelik": p,
+                    "kuyruk": len(self._queues[p]),
+                    "verilen": self.granted[p],
+                    "reddedilen": self.rejected[p],
+                    "ort_bekleme_sn": round(sum(waits) / len(waits), 2) if waits else 0.0,
+                    "p95_bekleme_sn": round(waits[min(len(waits) - 1, int(round(0.95 * (len(waits) - 1))))], 2)
+                    if waits else 0.0,
+                    "bugun_kullanilan": self.used[p],
+                    # Sınır, iki sınıfın toplam kullanımına uygulanır
+                    "toplam_sinir": limit if self.daily_budget > 0 else "∞",
+                })
+        return rows
+
+
+_schedulers: Dict[str, KeyScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def _key_id(api_key: str) -> str:
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def get_scheduler(api_key: str, rpm: int = DEFAULT_RPM, burst: int = DEFAULT_BURST) -> KeyScheduler:
+    """API anahtarına ait (süreç genelinde tek) zamanlayıcıyı döndürür."""
+    kid = _key_id(api_key)
+    with _schedulers_lock:
+        scheduler = _schedulers.get(kid)
+        if scheduler is None:
+            scheduler = KeyScheduler(rpm / 60.0, burst)
+            _schedulers[kid] = scheduler
+        return scheduler
+
+
+def set_scheduler(api_key: str, scheduler: KeyScheduler):
+    """Anahtarın zamanlayıcısını değiştirir (ör. kıyaslamada sınırsız zamanlayıcı)."""
+    with _schedulers_lock:
+        _schedulers[_key_id(api_key)] = scheduler
+
+
+def scheduler_stats() -> List[Dict]:
+    """Teşhis paneli için tüm anahtarların kuyruk / bekleme / bütçe özeti"""
+    with _schedulers_lock:
+        items = list(_schedulers.items())
+    rows = []
+    for kid, scheduler in items:
+        for row in scheduler.stats():
+            rows.append({"anahtar": kid[:8], **row})
+    return rows
+
+
+# ============================================================================
+# GERİ ÇEKİLMELİ ÇAĞRI
+# ============================================================================
+
+def is_retryable(exc: Exception) -> bool:
+    """Hata geçici mi (kota / sunucu hatası)?"""
+    if isinstance(exc, QuotaBudgetExceeded):
+        return False
+    message = str(exc).lower()
+    if any(marker in message for marker in PERMANENT_QUOTA_MARKERS):
+        return False
+    if RETRYABLE_EXCEPTIONS and isinstance(exc, RETRYABLE_EXCEPTIONS):
+        return True
+    code = getattr(exc, "code", None)
+    if callable(code):
+        code = None
+    code = code if isinstance(code, int) else getattr(exc, "status_code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_CODES
+    return any(marker in message for marker in RETRYABLE_MARKERS)
+
+
+def call_with_backoff(api_key: str, fn: Callable, *args,
+                      retries: int = MAX_RETRIES, base_delay: float = BACKOFF_BASE,
+                      max_delay: float = BACKOFF_MAX,
+                      on_retry: Optional[Callable[[int, Exception], None]] = None, **kwargs):
+    """
+    Her denemeden önce anahtarın zamanlayıcısından (etkin öncelik sınıfıyla)
+    jeton alır; 429/5xx hatalarında
+    üstel + rastgele gecikmeyle tekrar dener. Kalıcı hatalar hemen yükselir.
+    on_retry(deneme, hata) her tekrar öncesi çağrılır (telemetri için).
+    """
+    scheduler = get_scheduler(api_key)
+    priority = current_priority()
+    attempt = 0
+    while True:
+        scheduler.acquire(priority)
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+            if on_retry:
+                on_retry(attempt + 1, e)
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            time.sleep(delay * (0.5 + random.random() / 2))
+            attempt += 1
+
+
+# ============================================================================
+# YÜRÜTÜCÜ
+# ============================================================================
+
+class AIExecutor:
+    """Sınırlı iş parçacıklı, sıralı sonuç döndüren yürütücü"""
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai-worker")
+
+    def map_ordered(self, fn: Callable, items: List,
+                    on_progress: Optional[Callable[[int, int], None]] = None,
+                    priority: str = BATCH,
+                    on_result: Optional[Callable[[int, object], None]] = None) -> List:
+        """
+        fn(item) çağrılarını eşzamanlı çalıştırır, sonuçları gönderim sırasıyla döndürür.
+        Hata veren öğenin sonucu yakalanan istisna nesnesidir.
+        on_progress(tamamlanan, toplam) ve on_result(sıra, sonuç) çağıran iş
+        parçacığında, her öğe bittiğinde çağrılır (Streamlit için güvenli).
+        İşler varsayılan olarak toplu (BATCH) öncelikle sıraya girer.
+        """
+        items = list(items)
+        results: List = [None] * len(items)
+        # Her iş çağıranın bağlam değişkenlerini (ör. telemetri modül adı) kopyasıyla çalışır
+        futures = {}
+        for idx, item in enumerate(items):
+            ctx = contextvars.copy_context()
+            ctx.run(_priority.set, priority)
+            futures[self._pool.submit(ctx.run, fn, item)] = idx
+        done = 0
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                results[idx] = future.result()
+            except Exception as e:
+                results[idx] = e
+            done += 1
+            if on_result:
+                on_result(idx, results[idx])
+            if on_progress:
+                on_progress(done, len(items))
+        return results
+
+
+_executors: Dict[int, AIExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(max_workers: Optional[int] = None) -> AIExecutor:
+    """Verilen işçi sayısı için süreç genelinde paylaşılan yürütücüyü döndürür."""
+    workers = max(1, int(max_workers or DEFAULT_WORKERS))
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = AIExecutor(workers)
+            _executors[workers] = executor
+        return executor
+
+
+def run_parallel(fn: Callable, items: List, max_workers: Optional[int] = None,
+                 on_progress: Optional[Callable[[int, int], None]] = None,
+                 priority: str = BATCH,
+                 on_result: Optional[Callable[[int, object], None]] = None) -> List:
+    """Kısayol: paylaşılan yürütücüyle fn'i öğeler üzerinde eşzamanlı çalıştırır."""
+    return get_executor(max_workers).map_ordered(fn, items, on_progress, priority, on_result)
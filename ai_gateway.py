@@ -0,0 +1,370 @@
+"""
+Merkezi AI Geçidi
+
+Uygulamadaki tüm Gemini metin üretimi buradan geçer:
+- Aday modeller (sabit liste + önbellekli kayıt defteri) sırayla denenir
+- Başarılı yanıtlar kalıcı içerik adresli önbelleğe yazılır
+- Aynı model + prompt + ek dosyalar için önbellekten anında dönülür
+- Aynı istek zaten sürüyorsa yenisi atılmaz, süren isteğin sonucu beklenir
+- Uzun yanıtlar için akışlı (stream) üretim ve ilk-parça süresi (TTFT) ölçümü
+- Her ağ çağrısı anahtar başına hız sınırına ve 429/5xx geri çekilmesine tabidir
+- Etkileşimli çağrılar toplu işlerin önüne geçer; günlük bütçe dolunca
+  QuotaBudgetExceeded yükselir (model hatası sayılmaz, yedek modele geçilmez)
+- Devre kesici: hata veren modeller bekleme süresince atlanır, son çalışan model başa alınır
+- Çağrılar anahtara özel istemciyle yapılır (global genai.configure yok)
+- Çok turlu sohbetlerde büyük bağlam bir kez yüklenir (bağlam önbelleği tanıtıcısı)
+- Her çağrı telemetriye yazılır (modül, model, bayt, token, gecikme, TTFT, tekrar, önbellek)
+"""
+
+import hashlib
+import time
+from itertools import chain
+from typing import Iterator, List, Optional
+
+from ai_executor import QuotaBudgetExceeded, call_with_backoff
+from context_cache import ContextHandle, context_cache
+from gemini_client import get_client
+from gemini_standin import install_from_env
+from model_health import model_health
+from model_registry import model_candidates, registry
+from response_cache import make_cache_key, response_cache
+from single_flight import single_flight
+from telemetry import CallTrace
+
+# GEMINI_STANDIN tanımlıysa ağ yerine yerel taklitçi kullanılır (çevrimdışı test / kıyaslama)
+install_from_env()
+
+# Eski sürümlerden gelen sabit deneme sırası (metin için)
+DEFAULT_TEXT_MODELS = ['gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-1.0-pro', 'gemini-pro']
+
+
+def _key_id(api_key: str) -> str:
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _normalize(model_name: str) -> str:
+    return model_name if model_name.startswith("models/") else f"models/{model_name}"
+
+
+def candidate_models(api_key: str, capability: str = "text", models: Optional[List[str]] = None) -> List[str]:
+    """Denenecek modelleri tekrarsız döndürür; sıra sağlık hafızasına göre düzenlenir."""
+    if models:
+        names = list(models)
+    else:
+        listed = model_candidates(api_key, capability)
+        defaults = DEFAULT_TEXT_MODELS if capability == "text" else []
+        if registry.has_live_list(api_key):
+            # Hesapta artık listelenmeyen (emekli) sabit modeller hiç denenmez
+            defaults = [d for d in defaults if _normalize(d) in listed]
+        names = defaults + listed
+        if not names:
+            names = ['models/gemini-1.5-flash', 'models/gemini-1.5-pro']
+    ordered, seen = [], set()
+    for name in names:
+        full = _normalize(name)
+        if full not in seen:
+            seen.add(full)
+            ordered.append(full)
+    return model_health.order(api_key, ordered)
+
+
+def _attempt_order(api_key: str, candidates: List[str]) -> Iterator[str]:
+    """
+    Devresi açık modelleri atlar (kontrol, sıra o modele gelince yapılır).
+    Hiçbiri denenemediyse en yakında açılacak olanı yine de dener.
+    """
+    tried = False
+    for name in candidates:
+        if model_health.allow(api_key, name):
+            tried = True
+            yield name
+    if not tried and candidates:
+        yield model_health.soonest(api_key, candidates)
+
+
+def flight_key(api_key: str, prompt, attachments: Optional[List] = None, capability: str = "text",
+               models: Optional[List[str]] = None) -> str:
+    """
+    Eşzamanlı istek birleştirme anahtarı (aday sırası anlık değişebileceğinden
+    model listesi değil istek tanımı). Anahtara özeldir: kota, devre ve model
+    listesi anahtara bağlı olduğundan başka anahtarın sonucu paylaşılmaz.
+    """
+    return make_cache_key(f"{_key_id(api_key)}:{capability}:{','.join(models or [])}", prompt, attachments)
+
+
+def build_contents(prompt, attachments: Optional[List] = None):
+    """Prompt ve ekleri generate_content girdisine çevirir."""
+    if not attachments:
+        return prompt
+    parts = list(prompt) if isinstance(prompt, (list, tuple)) else [prompt]
+    return parts + list(attachments)
+
+
+def generate_text(prompt, api_key: str, attachments: Optional[List] = None,
+                  capability: str = "text", models: Optional[List[str]] = None,
+                  use_cache: bool = True, cache_ttl: Optional[int] = None) -> Optional[str]:
+    """
+    Aday modelleri sırayla dener, ilk başarılı yanıt metnini döndürür.
+    Hiçbir model yanıt veremezse None döner; istek bütçesi dolduysa
+    QuotaBudgetExceeded yükselir.
+    """
+    trace = CallTrace("generate", prompt=prompt, attachments=attachments)
+    candidates = candidate_models(api_key, capability, models)
+
+    if use_cache:
+        cached = response_cache.lookup([make_cache_key(m, prompt, attachments) for m in candidates])
+        if cached is not None:
+            trace.finish(model="önbellek", text=cached, cache_hit=True)
+            return cached
+
+        # Aynı istek sürüyorsa onun sonucunu bekle
+        try:
+            text, shared = single_flight.do(flight_key(api_key, prompt, attachments, capability, models), _generate,
+                                            prompt, api_key, attachments, candidates, trace, use_cache, cache_ttl)
+        except Exception as e:
+            trace.finish(error=e)
+            raise
+        if shared:
+            trace.finish(model="birleştirildi", text=text, cache_hit=True,
+                         error=None if text is not None else Exception("Birleştirilen istek yanıtsız kaldı"))
+        return text
+    return _generate(prompt, api_key, attachments, candidates, trace, use_cache, cache_ttl)
+
+
+def _generate(prompt, api_key: str, attachments: Optional[List], candidates: List[str],
+              trace: CallTrace, use_cache: bool, cache_ttl: Optional[int]) -> Optional[str]:
+    """generate_text'in ağ kısmı: aday modelleri sırayla dener."""
+    client = get_client(api_key)
+    contents = build_contents(prompt, attachments)
+    last_error = None
+    for attempt, model_name in enumerate(_attempt_order(api_key, candidates)):
+        trace.fallbacks = attempt
+        try:
+            model = client.model(model_name)
+            response = call_with_backoff(api_key, model.generate_content, contents, on_retry=trace.retry)
+            text = response.text
+        except QuotaBudgetExceeded as e:
+            # Model denenmedi: yarı-açık devrenin deneme hakkı geri verilir
+            model_health.release_trial(api_key, model_name)
+            trace.finish(error=e)
+            raise
+        except Exception as e:
+            last_error = e
+            model_health.record_failure(api_key, model_name, e)
+            continue
+        model_health.record_success(api_key, model_name)
+        trace.finish(model=model_name, response=response, text=text)
+        if use_cache:
+            response_cache.put(make_cache_key(model_name, prompt, attachments), model_name, text, cache_ttl)
+        return text
+    trace.finish(error=last_error or Exception("Denenecek model yok"))
+    return None
+
+
+# ============================================================================
+# AKIŞLI (STREAMING) ÜRETİM
+# ============================================================================
+
+def _open_stream(model, contents):
+    """Akışı başlatır ve ilk parçayı bekler (hatalar burada ortaya çıkar)."""
+    iterator = iter(model.generate_content(contents, stream=True))
+    return next(iterator), iterator
+
+
+def _chunk_text(chunk) -> str:
+    """Akış parçasının metnini güvenle alır (güvenlik filtresine takılan parça boş döner)."""
+    try:
+        return chunk.text or ""
+    except Exception:
+        return ""
+
+
+class TextStream:
+    """
+    Parça parça üretilen yanıt. Üzerinde dönüldükçe metin parçaları gelir;
+    iterasyon bitince `text`, `model`, `ttft` (ilk parçaya kadar geçen sn),
+    `total_time`, `cached` ve `error` alanları dolar.
+    """
+
+    def __init__(self, prompt, api_key: str, attachments: Optional[List] = None,
+                 capability: str = "text", models: Optional[List[str]] = None,
+                 use_cache: bool = True, cache_ttl: Optional[int] = None):
+        self.prompt = prompt
+        self.api_key = api_key
+        self.attachments = attachments
+        self.capability = capability
+        self.models = models
+        self.use_cache = use_cache
+        self.cache_ttl = cache_ttl
+
+        self.text = ""
+        self.model = None
+        self.ttft = None
+        self.total_time = None
+        self.cached = False
+        self.error = None
+
+    def __iter__(self) -> Iterator[str]:
+        start = time.time()
+        trace = CallTrace("stream", prompt=self.prompt, attachments=self.attachments)
+        candidates = candidate_models(self.api_key, self.capability, self.models)
+
+        if self.use_cache:
+            keys = [make_cache_key(m, self.prompt, self.attachments) for m in candidates]
+            cached = response_cache.lookup(keys)
+            if cached is not None:
+                self.cached = True
+                self.text = cached
+                self.ttft = self.total_time = time.time() - start
+                trace.first_token()
+                trace.finish(model="önbellek", text=cached, cache_hit=True)
+                yield cached
+                return
+
+            # Aynı istek sürüyorsa yeni akış açılmaz; lider bitince tam metin tek parça gelir
+            key = flight_key(self.api_key, self.prompt, self.attachments, self.capability, self.models)
+            future, leader = single_flight.join(key)
+            if not leader:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    text, self.error = None, e
+                self.ttft = self.total_time = time.time() - start
+                if text:
+                    self.cached = True
+                    self.text = text
+                    trace.first_token()
+                    trace.finish(model="birleştirildi", text=text, cache_hit=True)
+                    yield text
+                else:
+                    trace.finish(error=self.error or Exception("Birleştirilen istek yanıtsız kaldı"))
+                return
+            completed = False
+            try:
+                yield from self._generate(start, trace, candidates)
+                completed = True
+            finally:
+                # Yarıda bırakılan ya da hata veren akış bekleyenlere metin olarak verilmez
+                if isinstance(self.error, QuotaBudgetExceeded):
+                    single_flight.finish(key, future, error=self.error)
+                else:
+                    single_flight.finish(key, future, self.text if completed and not self.error else None)
+            return
+
+        yield from self._generate(start, trace, candidates)
+
+    def _generate(self, start: float, trace: CallTrace, candidates: List[str]) -> Iterator[str]:
+        """Aday modellerle akışı açar ve parçaları iletir."""
+        client = get_client(self.api_key)
+        contents = build_contents(self.prompt, self.attachments)
+        for attempt, model_name in enumerate(_attempt_order(self.api_key, candidates)):
+            trace.fallbacks = attempt
+            # Model hataları (404, yetki, kota) genelde ilk parçada ortaya çıkar;
+            # o ana kadar bir sonraki modele geçmek güvenlidir.
+            try:
+                model = client.model(model_name)
+                first, iterator = call_with_backoff(self.api_key, _open_stream, model, contents,
+                                                    on_retry=trace.retry)
+            except StopIteration:
+                model_health.record_failure(self.api_key, model_name, Exception("Boş yanıt akışı"))
+                continue
+            except QuotaBudgetExceeded as e:
+                # Bütçe anahtara aittir; başka modele geçmek işe yaramaz
+                model_health.release_trial(self.api_key, model_name)
+                self.error = e
+                break
+            except Exception as e:
+                self.error = e
+                model_health.record_failure(self.api_key, model_name, e)
+                continue
+
+            model_health.record_success(self.api_key, model_name)
+            self.model = model_name
+            self.error = None
+            self.ttft = time.time() - start
+            trace.first_token()
+            last = first
+            try:
+                for chunk in chain([first], iterator):
+                    last = chunk
+                    piece = _chunk_text(chunk)
+                    if piece:
+                        self.text += piece
+                        yield piece
+            except Exception as e:
+                # Yarıda kesilen yanıt önbelleğe yazılmaz
+                self.error = e
+                self.total_time = time.time() - start
+                trace.finish(model=model_name, response=last, text=self.text, error=e)
+                return
+
+            self.total_time = time.time() - start
+            trace.finish(model=model_name, response=last, text=self.text)
+            if self.use_cache and self.text:
+                response_cache.put(make_cache_key(model_name, self.prompt, self.attachments),
+                                   model_name, self.text, self.cache_ttl)
+            return
+
+        self.total_time = time.time() - start
+        trace.finish(error=self.error or Exception("Denenecek model yok"))
+
+
+def stream_text(prompt, api_key: str, attachments: Optional[List] = None,
+                capability: str = "text", models: Optional[List[str]] = None,
+                use_cache: bool = True, cache_ttl: Optional[int] = None) -> TextStream:
+    """generate_text'in akışlı sürümü; yedek model mantığı aynıdır."""
+    return TextStream(prompt, api_key, attachments, capability, models, use_cache, cache_ttl)
+
+
+# ============================================================================
+# BAĞLAM ÖNBELLEKLİ SOHBET
+# ============================================================================
+
+def open_context(api_key: str, text: str, system_instruction: Optional[str] = None) -> ContextHandle:
+    """
+    Büyük belge bağlamı için tanıtıcı açar (aynı bağlam için hep aynı tanıtıcı döner).
+    Bağlam önbelleğini destekleyen sağlıklı bir model varsa bağlam sunucuya bir kez yüklenir.
+    """
+    cache_models = model_health.order(api_key, model_candidates(api_key, "cache"))
+    return context_cache.open(api_key, text, cache_models, system_instruction)
+
+
+def generate_with_context(prompt: str, handle: ContextHandle, api_key: str,
+                          inline_budget: Optional[int] = None,
+                          use_cache: bool = True, cache_ttl: Optional[int] = None) -> Optional[str]:
+    """
+    Tanıtıcıdaki bağlama göre soruyu yanıtlar. Sunucu önbelleği varsa yalnızca
+    soru gönderilir; yoksa (veya hata verirse) bağlam prompt'a eklenerek
+    generate_text'e düşülür (inline_budget verilirse soruya göre paketlenir).
+    """
+    handle.uses += 1
+    if handle.remote:
+        model_name = handle.model_name
+        trace = CallTrace("context", model_name, prompt)
+        cache_key = make_cache_key(model_name, [f"context:{handle.digest}", prompt])
+        if use_cache:
+            cached = response_cache.lookup([cache_key])
+            if cached is not None:
+                trace.finish(text=cached, cache_hit=True)
+                return cached
+        if model_health.allow(api_key, model_name):
+            try:
+                model = get_client(api_key).model_from_cached(handle.cached_content)
+                response = call_with_backoff(api_key, model.generate_content, prompt, on_retry=trace.retry)
+                text = response.text
+            except QuotaBudgetExceeded as e:
+                model_health.release_trial(api_key, model_name)
+                trace.finish(error=e)
+                raise
+            except Exception as e:
+                trace.finish(error=e)
+                model_health.record_failure(api_key, model_name, e)
+                context_cache.drop_remote(handle)
+            else:
+                trace.finish(response=response, text=text)
+                model_health.record_success(api_key, model_name)
+                if use_cache:
+                    response_cache.put(cache_key, model_name, text, cache_ttl)
+                return text
+    return generate_text(handle.inline_prompt(prompt, inline_budget), api_key,
+                         use_cache=use_cache, cache_ttl=cache_ttl)
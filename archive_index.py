@@ -0,0 +1,155 @@
+"""
+Semantik Arşiv Dizini
+
+Semantik Arşiv sekmesi yüklenen tüm dosyaları tek metinde birleştirip her
+soruda bu metnin tamamını prompt'a koyuyordu; gerçek bir arşivde bağlam
+penceresi taşıyor, her soru tüm arşiv kadar token harcıyordu. Burada:
+- Dosyalar işlenirken parçalara bölünür; her parça hangi dosyadan
+  geldiğini (dosya adı) taşır
+- Parçalar embedding'e çevrilip kalıcı vektör dizinine yazılır
+  (vector_index); aynı dosyalar yeniden yüklenince OCR / okuma yapılmadan
+  diskteki dizin açılır, kayıtlı arşivler listeden de açılabilir
+- Her soruda yalnızca en ilgili k parça (sözcük + vektör, hibrit arama)
+  dosya adlarıyla birlikte prompt'a girer
+- Arşivler onları kuran API anahtarına aittir (manifestte anahtarın özeti);
+  başka anahtar listede göremez, açamaz
+"""
+
+import hashlib
+import os
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from context_packer import CHUNK_TOKENS, chunk_section, pack_context
+from embedding_service import EMBED_MODEL, embed_query, embed_texts
+from hybrid_retrieval import LEXICAL, VECTOR, HybridResult, hybrid_search, prepared_retriever
+from vector_index import (INDEX_KIND, PersistentIndex, build_faiss_index, index_store,
+                          make_index_id, tune_search)
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+# Bölme kuralı değişirse artırılmalı: eski diskteki arşiv dizinleri geçersiz sayılır
+ARCHIVE_CHUNKER_VERSION = "arsiv-2"
+ARCHIVE_KIND = "arsiv"                  # Manifestte arşiv dizinlerini ayırt eden tür
+ARCHIVE_TOP_K = int(os.environ.get("AI_ARCHIVE_TOP_K", "6"))
+ARCHIVE_CONTEXT_TOKENS = int(os.environ.get("AI_ARCHIVE_CONTEXT_TOKENS", "4000"))   # Prompt'a giren bağlam sınırı
+
+
+def archive_digest(files: Sequence[Tuple[str, bytes]]) -> str:
+    """Dosya adları + içeriklerinin özeti (yükleme sırasından bağımsız)"""
+    h = hashlib.sha256()
+    for name, data in sorted(files, key=lambda f: f[0]):
+        h.update(name.encode("utf-8"))
+        h.update(b"\x00")
+        h.update(hashlib.sha256(data).digest())
+    return h.hexdigest()
+
+
+def _key_id(api_key: str) -> str:
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def archive_index_id(digest: str, api_key: str, kind: str = INDEX_KIND) -> str:
+    """Dizin kimliği sahibine özeldir: aynı dosyaları yükleyen başka anahtar kendi dizinini kurar."""
+    return make_index_id(f"{digest}:{_key_id(api_key)}", ARCHIVE_CHUNKER_VERSION, EMBED_MODEL, kind)
+
+
+def chunk_documents(documents: Sequence[Tuple[str, str]]) -> Tuple[List[str], List[int]]:
+    """
+    (dosya adı, metin) listesini parçalar; her parça için dosya sıra numarası da döner.
+    Hiçbir parça CHUNK_TOKENS'ı aşmaz (Excel / OCR / UDF metni de bölünür).
+    """
+    chunks, owners = [], []
+    for file_no, (_, text) in enumerate(documents):
+        for chunk in chunk_section(text, CHUNK_TOKENS):
+            chunks.append(chunk)
+            owners.append(file_no)
+    return chunks, owners
+
+
+# ============================================================================
+# KURULUM
+# ============================================================================
+
+def open_archive(digest: str, api_key: str, kind: str = INDEX_KIND) -> Optional[PersistentIndex]:
+    """Aynı dosyalardan bu anahtarla daha önce kurulmuş dizin varsa açar (OCR gerekmez)."""
+    return open_saved_archive(archive_index_id(digest, api_key, kind), api_key)
+
+
+def open_saved_archive(index_id: str, api_key: str) -> Optional[PersistentIndex]:
+    """Kayıtlı arşivi açar; arşiv bu anahtara ait değilse None."""
+    if not api_key:
+        return None
+    archive = index_store.load(index_id)
+    if archive is None or archive.manifest.get("sahip") != _key_id(api_key):
+        return None
+    return archive
+
+
+def build_archive(digest: str, documents: Sequence[Tuple[str, str]], api_key: str,
+                  kind: str = INDEX_KIND,
+                  on_progress: Optional[Callable[[int, int], None]] = None) -> Optional[PersistentIndex]:
+    """Okunmuş dosyalardan arşiv dizinini kurar ve diske yazar; parça yoksa None."""
+    chunks, owners = chunk_documents(documents)
+    if not chunks:
+        return None
+    embeddings = embed_texts(chunks, api_key, task_type="retrieval_document", on_progress=on_progress)
+    index, params = build_faiss_index(embeddings, kind)
+    params["arama"] = tune_search(index, embeddings, params["dizin_tipi"])
+    names = [name for name, _ in documents]
+    label = ", ".join(names[:3]) + (f" (+{len(names) - 3})" if len(names) > 3 else "")
+    manifest = {"tur": ARCHIVE_KIND, "sahip": _key_id(api_key), "kaynak_adi": label, "kaynak_sha256": digest,
+                "parcalayici": ARCHIVE_CHUNKER_VERSION, "embedding_modeli": EMBED_MODEL,
+                "dosyalar": names, "parca_dosya": owners, **params}
+    return index_store.save(archive_index_id(digest, api_key, kind), index, chunks, manifest)
+
+
+def saved_archives(api_key: str) -> List[dict]:
+    """Bu anahtarın diskteki arşiv dizinlerinin manifestleri (yeniden eskiye)"""
+    if not api_key:
+        return []
+    owner = _key_id(api_key)
+    return [m for m in index_store.list() if m.get("tur") == ARCHIVE_KIND and m.get("sahip") == owner
+            and m.get("parcalayici") == ARCHIVE_CHUNKER_VERSION
+            and m.get("embedding_modeli") == EMBED_MODEL]
+
+
+# ============================================================================
+# ARAMA
+# ============================================================================
+
+def chunk_source(archive: PersistentIndex, chunk_id: int) -> str:
+    """Parçanın geldiği dosyanın adı"""
+    return archive.manifest["dosyalar"][archive.manifest["parca_dosya"][chunk_id]]
+
+
+def search_archive(archive: PersistentIndex, question: str, api_key: str,
+                   k: int = ARCHIVE_TOP_K) -> HybridResult:
+    """Soruya en ilgili k parça (hibrit arama; anahtar parça sıra numarasıdır)."""
+
+    def vector(query_vector, depth):
+        D, I = archive.search(query_vector, k=depth)
+        return [(int(i), archive.chunks[int(i)], float(d)) for d, i in zip(D[0], I[0]) if i >= 0]
+
+    def lexical(query, depth):
+        return [(i, archive.chunks[i], score) for i, score in archive.lexical().search(query, depth)]
+
+    # Soru embedding'i (ağ çağrısı) arama bütçesinden önce alınır
+    embedded = prepared_retriever(lambda: np.asarray(embed_query(question, api_key), dtype=np.float32), vector)
+    return hybrid_search(question, {LEXICAL: lexical, VECTOR: embedded}, k=k)
+
+
+def format_context(archive: PersistentIndex, hits: HybridResult, budget: int = ARCHIVE_CONTEXT_TOKENS,
+                   query: Optional[str] = None) -> str:
+    """Bulunan parçaları dosya adlarıyla prompt bağlamına çevirir (token bütçesine sığdırılır)."""
+    sections = [{"title": chunk_source(archive, hit.key), "header": f"📂 DOSYA ADI: {chunk_source(archive, hit.key)}",
+                 "text": hit.text} for hit in hits]
+    return pack_context(sections, budget, query=query).text
+
+
+def hit_sources(archive: PersistentIndex, hits: HybridResult) -> List[str]:
+    """Bulunan parçaların dosya adları (tekrarsız, sıra korunur)"""
+    return list(dict.fromkeys(chunk_source(archive, hit.key) for hit in hits))
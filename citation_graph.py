@@ -0,0 +1,299 @@
+"""
+Mevzuat Atıf Grafiği
+
+Kelebek Etkisi sekmesi etki ağını her seferinde yapay zekaya tek
+cümleden uydurtuyordu; her çalıştırmada farklı bir çıktı geliyordu.
+Burada madde dizinindeki (statute_index) kanun metinleri taranır ve
+maddeler arası atıflar çıkarılır:
+
+    "5996 sayılı Kanunun 41 inci maddesi"   → 5996 / Madde 41
+    "bu Yönetmeliğin 15 inci maddesi"       → aynı metin / Madde 15
+    "geçici 3 üncü madde" (başka atıf yok)   → aynı metin / Geçici Madde 3
+    "5996 sayılı Kanun" (madde belirtilmeden) → 5996 (tüm kanun)
+    "Türk Ceza Kanununun 85 inci maddesi"     → 5237 / Madde 85 (bilinen adlar)
+    "bu Kanunun 5 ila 8 inci maddeleri"        → aynı metin / Madde 5, 6, 7, 8
+
+Numara yalnızca "madde" kelimesinin hemen önündeki sıra sayılarından
+("41 inci ve 42 nci maddeleri") alınır; adı bilinmeyen başka bir kanuna
+yapılan atıf aynı metne bağlanmaz, atlanır.
+
+Atıflar SQLite'ta tutulur, bellekte ters komşuluk listesi olarak yüklenir.
+Bir maddedeki değişikliğin etkilediği maddeler (ona atıf yapanlar, onlara
+atıf yapanlar ...) k adımlık genişlik öncelikli dolaşmayla milisaniyeler
+içinde ve her seferinde aynı sonuçla bulunur.
+"""
+
+import os
+import re
+from bisect import bisect_right
+import sqlite3
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+from statute_index import ADDITIONAL, ARTICLE, KIND_LABELS, LAW_ALIASES, LAW_NAMES, TEMPORARY, statute_index
+from turkish_text import fold
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+CACHE_DIR = os.environ.get("HUKUK_CACHE_DIR", "Hukuk_Onbellek")
+CITATION_GRAPH_FILE = os.path.join(CACHE_DIR, "atif_grafi.sqlite")
+ANCHOR_WINDOW = 250         # Bir kanun atfından sonra madde numarası aranacak en fazla karakter
+BARE_LOOKBACK = 80          # Yalın "15 inci madde" atfında numara için geriye bakılacak karakter
+MAX_RANGE = 100             # "5 ila 8 inci maddeleri" aralığında açılacak en fazla madde
+
+# (kanun no, tür, madde no); tüm kanuna atıfta tür ve madde no boştur
+Node = Tuple[str, str, str]
+
+_LAW_WORDS = r"(?:kanun|yonetmelik|teblig|kararname|khk|tuzuk)"
+# Kanun atfı: "5996 sayılı", "bu Kanunun", bilinen ad ya da kısaltma ("Türk Ceza Kanununun", "TCK'nın")
+_NAMED_LAWS = {**{alias: no for alias, no in LAW_ALIASES.items() if len(alias) > 2}, **LAW_NAMES}
+_ANCHOR_RE = re.compile(
+    r"\b(\d{3,5})\s+sayili\b|\bbu\s+" + _LAW_WORDS + r"\w*"
+    r"|\b(" + "|".join(sorted(map(re.escape, _NAMED_LAWS), key=len, reverse=True)) + r")(?:\w|['’]\w+)*")
+_NUMBER = r"(?:(?:gecici|ek)\s+)?\b\d+(?:/[a-z])?"
+_SUFFIX = r"\s*['’]?\s*(?:inci|nci|uncu|ncu)\b"
+_SEPARATOR = r"\s*(?:,|ve|ila|ile)\s*"
+# "madde" kelimesinin hemen önündeki numara listesi: "41 inci, 42 nci ve 45 inci", "5 ila 8 inci";
+# sıra eki son numarada şarttır (kanun atfından sonra "41." biçimi de kabul edilir)
+_BARE_LIST_RE = re.compile(rf"(?:{_NUMBER}(?:{_SUFFIX})?{_SEPARATOR})*{_NUMBER}{_SUFFIX}\s*$")
+_ANCHORED_LIST_RE = re.compile(rf"(?:{_NUMBER}(?:{_SUFFIX}|\.)?{_SEPARATOR})*{_NUMBER}(?:{_SUFFIX}|\.)\s*$")
+_LIST_ITEM_RE = re.compile(r"(?:\b(gecici|ek)\s+)?\b(\d+)(/[a-z])?|\b(ila)\b")
+_OTHER_LAW_RE = re.compile(r"\b\w+\s+" + _LAW_WORDS + r"\w*")
+_MADDE_RE = re.compile(r"\bmadde\w*")
+_BOUNDARY_RE = re.compile(r"(?<!\d)[.;](?=\s|$)")
+
+
+def law_node(law_no: str) -> Node:
+    return (law_no, "", "")
+
+
+def node_label(node: Node) -> str:
+    """Ör. '5996 m.41', '5996 Geçici Madde 3', '5996 (tüm kanun)'"""
+    law_no, kind, no = node
+    if not kind:
+        return f"{law_no} (tüm kanun)"
+    if kind == ARTICLE:
+        return f"{law_no} m.{no.upper()}"
+    return f"{law_no} {KIND_LABELS[kind]} {no.upper()}"
+
+
+def _kind(word: Optional[str]) -> str:
+    return {"gecici": TEMPORARY, "ek": ADDITIONAL}.get(word, ARTICLE)
+
+
+# ============================================================================
+# ATIF ÇIKARIMI
+# ============================================================================
+
+def _numbers_before(text: str, begin: int, end: int, pattern) -> List[Tuple[str, str]]:
+    """"madde" kelimesinin (end) hemen önündeki numara listesi: [(tür, no)]"""
+    listed = pattern.search(text, begin, end)
+    if not listed:
+        return []
+    numbers: List[Tuple[str, str]] = []
+    kind, in_range = ARTICLE, False
+    for m in _LIST_ITEM_RE.finditer(text, listed.start(), end):
+        if m.group(4):
+            in_range = bool(numbers)
+            continue
+        # Türü yazılmayan numara listedeki öncekinin türünü alır ("geçici 1 ve 2 nci maddeler")
+        kind = _kind(m.group(1)) if m.group(1) else kind
+        no = m.group(2) + (m.group(3) or "")
+        if in_range and no.isdigit() and numbers[-1][1].isdigit():
+            first = int(numbers[-1][1])
+            if 0 < int(no) - first <= MAX_RANGE:
+                numbers.extend((kind, str(n)) for n in range(first + 1, int(no)))
+        numbers.append((kind, no))
+        in_range = False
+    return numbers
+
+
+def extract_citations(law_no: str, text: str) -> List[Node]:
+    """Madde metnindeki atıfların hedefleri (tekrarsız, metindeki sırayla)."""
+    t = fold(text or "")
+    targets: List[Node] = []
+    covered: List[Tuple[int, int]] = []
+    # Kanun atıfları: (başlangıç, bitiş, kanun no, açıkça anılmış mı)
+    anchors: List[Tuple[int, int, str, bool]] = []
+    for anchor in _ANCHOR_RE.finditer(t):
+        if (anchor.group(2) and anchors and anchors[-1][3]
+                and not t[anchors[-1][1]:anchor.start()].strip()):
+            # "5237 sayılı Türk Ceza Kanununun": numara ve ad tek atıftır, numara esas alınır
+            start, _, target_law, _ = anchors.pop()
+            anchors.append((start, anchor.end(), target_law, True))
+            continue
+        explicit = bool(anchor.group(1) or anchor.group(2))
+        anchors.append((anchor.start(), anchor.end(), anchor.group(1) or _NAMED_LAWS.get(anchor.group(2)) or law_no,
+                        explicit))
+    for i, (anchor_start, anchor_end, target_law, explicit) in enumerate(anchors):
+        end = min(anchors[i + 1][0] if i + 1 < len(anchors) else len(t), anchor_end + ANCHOR_WINDOW)
+        boundary = _BOUNDARY_RE.search(t, anchor_end, end)
+        if boundary:
+            end = boundary.start()
+        # Her "madde" kelimesinin önündeki sıra sayıları bu kanuna aittir ("41 inci ve 42 nci maddeleri")
+        found, last = [], None
+        for madde in _MADDE_RE.finditer(t, anchor_end, end):
+            numbers = _numbers_before(t, anchor_end, madde.start(), _ANCHORED_LIST_RE)
+            if numbers:
+                found.extend(numbers)
+                last = madde
+        if found:
+            targets.extend((target_law,) + number for number in found)
+            covered.append((anchor_start, last.end()))
+        elif explicit:
+            targets.append(law_node(target_law))
+            covered.append((anchor_start, anchor_end))
+
+    # Kanun adı geçmeyen "15 inci maddesi" atıfları aynı metne aittir
+    starts = [start for start, _ in covered]
+    for madde in _MADDE_RE.finditer(t):
+        # Kapsanan aralıklar sıralı ve ayrıktır: önceki aralık ikili aramayla bulunur
+        prev = bisect_right(starts, madde.start()) - 1
+        if prev >= 0 and madde.start() < covered[prev][1]:
+            continue
+        begin = max(madde.start() - BARE_LOOKBACK, covered[prev][1] if prev >= 0 else 0)
+        boundary = None
+        for boundary in _BOUNDARY_RE.finditer(t, begin, madde.start()):
+            pass
+        if boundary:
+            begin = boundary.end()
+        # "Vergi Usul Kanununun 85 inci maddesi": adı bilinmeyen başka kanun, aynı metne bağlanmaz
+        if _OTHER_LAW_RE.search(t, begin, madde.start()):
+            continue
+        targets.extend((law_no,) + number for number in _numbers_before(t, begin, madde.start(), _BARE_LIST_RE))
+    return list(dict.fromkeys(targets))
+
+
+# ============================================================================
+# GRAF
+# ============================================================================
+
+class CitationGraph:
+    """Atıfların kalıcı kaydı + bellekte ters komşuluk (kime atıf yapılıyor → atıf yapanlar)"""
+
+    def __init__(self, path: str = CITATION_GRAPH_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._ids: Optional[Dict[Node, int]] = None
+        self._nodes: List[Node] = []
+        self._citers: Dict[int, Set[int]] = {}
+        self._cites: Dict[int, Set[int]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS citations (
+                    src_law TEXT, src_kind TEXT, src_no TEXT,
+                    dst_law TEXT, dst_kind TEXT, dst_no TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_citations_src ON citations(src_law)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _intern(self, node: Node) -> int:
+        node_id = self._ids.get(node)
+        if node_id is None:
+            node_id = self._ids[node] = len(self._nodes)
+            self._nodes.append(node)
+        return node_id
+
+    def _load(self):
+        """Komşuluk listelerini diskten kurar; kilit altında çağrılır."""
+        if self._ids is not None:
+            return
+        self._ids, self._nodes, self._citers, self._cites = {}, [], {}, {}
+        for row in self._connect().execute("SELECT * FROM citations"):
+            src = self._intern((row[0], row[1], row[2]))
+            dst = self._intern((row[3], row[4], row[5]))
+            self._citers.setdefault(dst, set()).add(src)
+            self._cites.setdefault(src, set()).add(dst)
+
+    def ingest_law(self, law_no: str) -> int:
+        """Kanunun maddelerindeki atıfları (madde dizininden) çıkarıp yazar; atıf sayısı döner."""
+        rows = []
+        for kind, no, text in statute_index.articles(law_no):
+            for target in extract_citations(law_no, text):
+                if target != (law_no, kind, no):
+                    rows.append((law_no, kind, no) + target)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM citations WHERE src_law = ?", (law_no,))
+            conn.executemany("INSERT INTO citations VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.commit()
+            self._ids = None
+        return len(rows)
+
+    def rebuild(self) -> int:
+        """Madde dizinindeki tüm kanunları yeniden tarar."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM citations")
+            conn.commit()
+            self._ids = None
+        return sum(self.ingest_law(law["kanun_no"]) for law in statute_index.laws())
+
+    def impact(self, node: Node, hops: int = 3) -> List[Tuple[Node, int, Node]]:
+        """
+        Değişen maddeden etkilenenler: (madde, adım, üzerinden geldiği madde).
+        Maddeye atıf yapanlar 1. adım, onlara atıf yapanlar 2. adım ...;
+        kanunun tamamına yapılan atıflar da 1. adımda sayılır.
+        """
+        with self._lock:
+            self._load()
+            start = self._ids.get(node)
+            whole_law = self._ids.get(law_node(node[0])) if node[1] else None
+            seen = {i for i in (start, whole_law) if i is not None}
+            frontier = deque((i, 0) for i in seen)
+            found = []
+            while frontier:
+                current, depth = frontier.popleft()
+                if depth >= hops:
+                    continue
+                for citer in sorted(self._citers.get(current, ())):
+                    if citer in seen:
+                        continue
+                    seen.add(citer)
+                    # Kanun düğümü üzerinden gelenler doğrudan değişen maddeye bağlanır
+                    via = start if current == whole_law and start is not None else current
+                    found.append((self._nodes[citer], depth + 1, self._nodes[via] if via is not None else node))
+                    frontier.append((citer, depth + 1))
+            return found
+
+    def references(self, node: Node) -> List[Node]:
+        """Maddenin atıf yaptığı maddeler"""
+        with self._lock:
+            self._load()
+            node_id = self._ids.get(node)
+            return sorted(self._nodes[i] for i in self._cites.get(node_id, ()))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._load()
+            return {"dugum": len(self._nodes), "atif": sum(len(s) for s in self._cites.values())}
+
+
+def impact_dot(node: Node, impacted: List[Tuple[Node, int, Node]], max_nodes: int = 80) -> str:
+    """Etki kümesinin Graphviz (DOT) çizimi; adım sayısına göre renklenir."""
+    colors = {1: "lightblue", 2: "gold", 3: "darkorange"}
+    lines = ["digraph etki {", "  rankdir=LR;", "  node [shape=box, style=filled, fontname=Helvetica];",
+             f'  "{node_label(node)}" [fillcolor=red, fontcolor=white];']
+    for target, hop, via in impacted[:max_nodes]:
+        lines.append(f'  "{node_label(target)}" [fillcolor={colors.get(hop, "gray40")}{", fontcolor=white" if hop > 3 else ""}];')
+        lines.append(f'  "{node_label(via)}" -> "{node_label(target)}";')
+    lines.append("}")
+    return "\n".join(lines)
+
+
+# Süreç genelinde paylaşılan atıf grafiği
+citation_graph = CitationGraph()
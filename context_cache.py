@@ -0,0 +1,215 @@
+"""
+Oturumluk Bağlam Önbelleği
+
+Çok turlu sohbetlerde (belge sohbeti, patron modu, arşiv soru-cevap) aynı
+büyük belge bağlamı her turda yeniden gönderiliyordu. Burada bağlam bir kez
+paketlenir ve bir "tanıtıcı" (handle) ile temsil edilir:
+- Bağlam yeterince büyükse ve model destekliyorsa Gemini sunucu tarafı
+  bağlam önbelleğine (CachedContent) bir kez yüklenir; sonraki turlarda
+  yalnızca soru gönderilir
+- Aksi halde yerel yedek kullanılır: paketlenmiş bağlam ve özeti bellekte
+  tutulur, her turda soruya göre bütçeye sığdırılarak prompt'a eklenir
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from ai_executor import QuotaBudgetExceeded, call_with_backoff
+from context_packer import pack_context
+from gemini_client import get_client
+
+try:
+    from google.generativeai import caching as genai_caching
+except ImportError:
+    genai_caching = None
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+# Sunucu önbelleği için asgari bağlam büyüklüğü (Gemini 1.5 sınırı 32.768 token)
+MIN_REMOTE_TOKENS = int(os.environ.get("AI_CONTEXT_CACHE_MIN_TOKENS", "32768"))
+CONTEXT_MAX_TOKENS = 150000     # Tanıtıcıya alınacak en büyük bağlam
+CONTEXT_TTL = 3600              # Sunucu önbelleğinin ömrü (sn)
+EXPIRY_MARGIN = 60              # Süresi dolmak üzere olan önbellek kullanılmaz
+REMOTE_RETRY_AFTER = 600        # Yükleme başarısızsa tekrar denemeden önce beklenecek süre
+MAX_HANDLES = 32                # Bellekte tutulan en fazla tanıtıcı (LRU)
+
+
+def _key_id(api_key: str) -> str:
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def context_digest(text: str, system_instruction: Optional[str] = None) -> str:
+    """Bağlam + sistem talimatının içerik özeti"""
+    h = hashlib.sha256()
+    h.update((system_instruction or "").encode("utf-8"))
+    h.update(b"\x00")
+    h.update((text or "").encode("utf-8"))
+    return h.hexdigest()
+
+
+# ============================================================================
+# TANITICI
+# ============================================================================
+
+class ContextHandle:
+    """Bir kez paketlenip turlar boyunca yeniden kullanılan belge bağlamı"""
+
+    def __init__(self, digest: str, text: str, tokens: int,
+                 system_instruction: Optional[str] = None, note: str = ""):
+        self.digest = digest
+        self.text = text
+        self.tokens = tokens
+        self.system_instruction = system_instruction
+        self.note = note                # Paketlemede kırpılan kısım varsa açıklaması
+        self.model_name: Optional[str] = None
+        self.cached_content = None
+        self.client = None              # Önbelleği oluşturan anahtarın istemcisi (silme için)
+        self.expires_at = 0.0
+        self.retry_at = 0.0
+        self.uses = 0
+
+    @property
+    def remote(self) -> bool:
+        """Sunucu tarafı önbellek kullanılabilir durumda mı?"""
+        return self.cached_content is not None and time.time() < self.expires_at - EXPIRY_MARGIN
+
+    def inline_prompt(self, prompt: str, budget_tokens: Optional[int] = None) -> str:
+        """Yerel yedek: bağlamı (gerekirse soruya göre paketleyerek) prompt'a ekler."""
+        context = self.text
+        if budget_tokens and self.tokens > budget_tokens:
+            context = pack_context(context, budget_tokens, query=prompt).text
+        return "\n\n".join(p for p in (self.system_instruction, context, prompt) if p)
+
+
+# ============================================================================
+# ÖNBELLEK
+# ============================================================================
+
+class ContextCache:
+    """API anahtarı + bağlam özeti başına tanıtıcıları tutan süreç geneli önbellek"""
+
+    def __init__(self, min_remote_tokens: int = MIN_REMOTE_TOKENS, ttl: int = CONTEXT_TTL,
+                 max_handles: int = MAX_HANDLES):
+        self.min_remote_tokens = min_remote_tokens
+        self.ttl = ttl
+        self.max_handles = max_handles
+        self._handles: "OrderedDict[tuple, ContextHandle]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[tuple, threading.Lock] = {}
+        self.uploads = 0
+        self.upload_failures = 0
+
+    def open(self, api_key: str, text: str, candidates: List[str],
+             system_instruction: Optional[str] = None,
+             max_tokens: int = CONTEXT_MAX_TOKENS) -> ContextHandle:
+        """
+        Bağlamın tanıtıcısını döndürür; ilk çağrıda paketler ve mümkünse
+        `candidates` içindeki ilk uygun modele sunucu önbelleği olarak yükler.
+        """
+        key = (_key_id(api_key), context_digest(text, system_instruction))
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Aynı bağlam için eşzamanlı istekler tek yüklemeyi bekler
+        with key_lock:
+            with self._lock:
+                handle = self._handles.get(key)
+                if handle is not None:
+                    self._handles.move_to_end(key)
+            if handle is None:
+                packed = pack_context(text or "", max_tokens)
+                handle = ContextHandle(key[1], packed.text, packed.used_tokens, system_instruction,
+                                       packed.summary() if packed.truncated else "")
+                self._store(key, handle)
+            if not handle.remote and time.time() >= handle.retry_at:
+                self._upload(api_key, handle, candidates)
+            return handle
+
+    def _store(self, key: tuple, handle: ContextHandle):
+        with self._lock:
+            self._handles[key] = handle
+            evicted = []
+            while len(self._handles) > self.max_handles:
+                old_key, old = self._handles.popitem(last=False)
+                self._key_locks.pop(old_key, None)
+                evicted.append(old)
+        for old in evicted:
+            self._delete_remote(old)
+
+    def _upload(self, api_key: str, handle: ContextHandle, candidates: List[str]):
+        """Bağlamı sunucu önbelleğine yükler; olmazsa tanıtıcı yerel modda kalır."""
+        handle.cached_content = None
+        if genai_caching is None or handle.tokens < self.min_remote_tokens or not candidates:
+            return
+        client = get_client(api_key)
+        for model_name in candidates:
+            try:
+                cached = call_with_backoff(
+                    api_key, client.create_cached_content,
+                    model=model_name,
+                    display_name=f"hukuk-{handle.digest[:12]}",
+                    system_instruction=handle.system_instruction,
+                    contents=[handle.text],
+                    ttl=timedelta(seconds=self.ttl),
+                )
+            except QuotaBudgetExceeded:
+                self.upload_failures += 1
+                break
+            except Exception:
+                self.upload_failures += 1
+                continue
+            handle.cached_content = cached
+            handle.client = client
+            handle.model_name = model_name
+            handle.expires_at = time.time() + self.ttl
+            self.uploads += 1
+            return
+        handle.retry_at = time.time() + REMOTE_RETRY_AFTER
+
+    def _delete_remote(self, handle: ContextHandle):
+        if handle.cached_content is not None:
+            try:
+                handle.client.delete_cached_content(handle.cached_content)
+            except Exception:
+                pass
+        handle.cached_content = None
+
+    def drop_remote(self, handle: ContextHandle):
+        """
+        Sunucu önbelleği hata verdiyse yerel moda düşer. Sunucudaki kopya da
+        silinir (TTL dolana kadar depolama ücreti işlemesin); zaten silinmişse
+        hata yok sayılır.
+        """
+        self._delete_remote(handle)
+        handle.retry_at = time.time() + REMOTE_RETRY_AFTER
+
+    def clear(self):
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+            self._key_locks.clear()
+        for handle in handles:
+            self._delete_remote(handle)
+
+    def stats(self) -> Dict:
+        """Teşhis paneli için özet"""
+        with self._lock:
+            handles = list(self._handles.values())
+        return {
+            "tanitici": len(handles),
+            "sunucuda": sum(1 for h in handles if h.remote),
+            "yukleme": self.uploads,
+            "yukleme_hatasi": self.upload_failures,
+            "kullanim": sum(h.uses for h in handles),
+        }
+
+
+# Süreç genelinde paylaşılan bağlam önbelleği
+context_cache = ContextCache()
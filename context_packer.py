@@ -0,0 +1,296 @@
+"""
+Token Bütçeli Bağlam Paketleyici
+
+Prompt'a eklenecek belge metinlerini sabit karakter kesimi (`metin[:20000]`)
+yerine token bütçesine göre doldurur:
+- Token sayısı yerel, kalibre edilebilir bir tahminciyle hesaplanır
+- Metin dosya başlıklarına ve paragraflara bölünür; parçalar soruyla
+  ilgisine göre önceliklendirilir
+- Dosya başlıkları ve atıflar (paragraf içi) bölünmeden korunur
+- Hangi dosyadan ne kadarının dışarıda kaldığı raporlanır
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Union
+
+from turkish_text import analyze
+
+# ============================================================================
+# TOKEN TAHMİNİ
+# ============================================================================
+
+CHARS_PER_TOKEN = 3.6       # Türkçe hukuk metni için ortalama (kelime içi)
+CHUNK_TOKENS = 350          # Paragraf birleştirme hedefi
+GAP_MARKER = "[...]"
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+class TokenEstimator:
+    """
+    Kelime ve noktalama bazlı yerel token tahmincisi.
+    `calibrate` ile gerçek sayımlara (ör. model.count_tokens) göre düzeltilir.
+    """
+
+    def __init__(self, chars_per_token: float = CHARS_PER_TOKEN):
+        self.chars_per_token = chars_per_token
+        self.factor = 1.0
+        self._lock = threading.Lock()
+
+    def raw(self, text: str) -> int:
+        count = 0
+        for piece in _PIECE_RE.findall(text):
+            if piece[0].isalnum() or piece[0] == "_":
+                count += max(1, math.ceil(len(piece) / self.chars_per_token))
+            else:
+                count += 1
+        return count
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return int(math.ceil(self.raw(text) * self.factor))
+
+    def calibrate(self, text: str, actual_tokens: int, weight: float = 0.3):
+        """Gerçek token sayısıyla düzeltme katsayısını günceller (hareketli ortalama)."""
+        raw = self.raw(text)
+        if raw <= 0 or actual_tokens <= 0:
+            return
+        with self._lock:
+            self.factor = (1 - weight) * self.factor + weight * (actual_tokens / raw)
+
+
+estimator = TokenEstimator()
+
+
+def count_tokens(text: str) -> int:
+    """Paylaşılan tahminciyle token sayısı"""
+    return estimator.count(text)
+
+
+# ============================================================================
+# BÖLÜMLEME
+# ============================================================================
+
+# "--- DOSYA: x ---", "=== DOSYA: x ===", "--- x.pdf (01.01.2024) ---", "--- EXCEL (x) ---"
+HEADER_RE = re.compile(r"^[ \t]*(?:---|===)[ \t]*(.+?)[ \t]*(?:---|===)[ \t]*$", re.MULTILINE)
+
+
+def split_sections(text: str, default_title: str = "BELGE") -> List[Dict]:
+    """Birleştirilmiş bağlamı dosya başlıklarına göre bölümlere ayırır."""
+    sections = []
+    matches = list(HEADER_RE.finditer(text))
+    if not matches:
+        return [{"title": default_title, "header": "", "text": text}]
+    if text[:matches[0].start()].strip():
+        sections.append({"title": default_title, "header": "", "text": text[:matches[0].start()]})
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections.append({"title": m.group(1).strip(), "header": m.group(0).strip(), "text": text[m.end():end]})
+    return sections
+
+
+def _pack(units: List[str], max_tokens: int, joiner: str, split) -> List[str]:
+    """Birimleri max_tokens'ı aşmayacak parçalarda birleştirir; tek başına aşan birim split ile bölünür."""
+    pieces, current, current_tokens = [], [], 0
+    for unit in units:
+        tokens = count_tokens(unit)
+        if tokens > max_tokens:
+            if current:
+                pieces.append(joiner.join(current))
+                current, current_tokens = [], 0
+            pieces.extend(split(unit, max_tokens))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(joiner.join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += tokens
+    if current:
+        pieces.append(joiner.join(current))
+    return pieces
+
+
+def _split_chars(word: str, max_tokens: int) -> List[str]:
+    """Boşluksuz dev dizgeyi (base64, bozuk OCR) sabit uzunlukta keser."""
+    size = max(1, int(max_tokens * estimator.chars_per_token / max(estimator.factor, 1.0)) - 1)
+    pieces = [word[i:i + size] for i in range(0, len(word), size)]
+    while size > 1 and any(count_tokens(p) > max_tokens for p in pieces):
+        size //= 2
+        pieces = [word[i:i + size] for i in range(0, len(word), size)]
+    return pieces
+
+
+def _split_words(line: str, max_tokens: int) -> List[str]:
+    """Son çare: kelime sınırlarından sabit token pencerelerine böler."""
+    return _pack(line.split(), max_tokens, " ", _split_chars)
+
+
+def _split_lines(sentence: str, max_tokens: int) -> List[str]:
+    """Noktalamasız uzun metni (Excel, OCR, UDF/XML) satır sonlarından böler."""
+    lines = [line for line in sentence.split("\n") if line.strip()]
+    return _pack(lines, max_tokens, "\n", _split_words)
+
+
+def _split_long(paragraph: str, max_tokens: int) -> List[str]:
+    """
+    Çok uzun paragrafı cümle sınırlarından böler (atıf ortasından kesmez).
+    Cümle de sığmazsa satırlara, o da sığmazsa sabit token pencerelerine
+    bölünür; hiçbir parça max_tokens'ı aşmaz.
+    """
+    sentences = re.split(r"(?<=[.!?;:])\s+", paragraph)
+    return _pack(sentences, max_tokens, " ", _split_lines)
+
+
+def chunk_section(text: str, chunk_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """Bölümü paragraf sınırlarında en fazla chunk_tokens büyüklüğünde parçalara ayırır."""
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n|\n(?=\s*(?:MADDE|Madde|Geçici Madde|Ek Madde)\s)", text) if p.strip()]
+    return _pack(paragraphs, chunk_tokens, "\n", _split_long)
+
+
+# ============================================================================
+# PAKETLEME
+# ============================================================================
+
+class PackResult:
+    """Paketleme sonucu: prompt'a girecek metin ve dışarıda kalanların raporu"""
+
+    def __init__(self, text: str, used_tokens: int, budget: int, total_tokens: int,
+                 included: List[Dict], dropped: List[Dict]):
+        self.text = text
+        self.used_tokens = used_tokens
+        self.budget = budget
+        self.total_tokens = total_tokens
+        self.included = included
+        self.dropped = dropped
+
+    @property
+    def truncated(self) -> bool:
+        return bool(self.dropped)
+
+    def summary(self) -> str:
+        """Kullanıcıya gösterilecek kısa not"""
+        if not self.dropped:
+            return f"Bağlamın tamamı kullanıldı (~{self.used_tokens:,} token)."
+        dropped_tokens = sum(d["tokens"] for d in self.dropped)
+        files = ", ".join(f"{d['title']} ({d['chunks']} parça)" for d in self.dropped[:5])
+        more = f" ve {len(self.dropped) - 5} dosya daha" if len(self.dropped) > 5 else ""
+        return (f"~{self.used_tokens:,}/{self.budget:,} token kullanıldı; soruyla en az ilgili "
+                f"~{dropped_tokens:,} token dışarıda kaldı: {files}{more}.")
+
+    def __str__(self):
+        return self.text
+
+
+def _score_chunks(chunks: List[Dict], query: Optional[str]):
+    """Her parçaya soruyla ilgisine göre puan verir (TF-IDF benzeri, gövde eşleşmeli)."""
+    terms = analyze(query) if query else []
+    if not terms:
+        # Soru yoksa metin sırası korunur: baştaki parçalar önce
+        for c in chunks:
+            c["score"] = 1.0 / (1 + c["order"])
+        return
+    doc_terms = [Counter(analyze(c["text"])) for c in chunks]
+    n = len(chunks)
+    df = Counter()
+    for counts in doc_terms:
+        for term in set(terms):
+            if counts.get(term):
+                df[term] += 1
+    for c, counts in zip(chunks, doc_terms):
+        score = 0.0
+        for term in set(terms):
+            tf = counts.get(term, 0)
+            if tf:
+                score += math.log(1 + tf) * math.log(1 + n / df[term])
+        # Bölüm başındaki parça (taraflar, konu) hafif öncelikli
+        if c["index"] == 0:
+            score += 0.1
+        c["score"] = score
+
+
+def pack_context(source: Union[str, List[Dict]], budget_tokens: int, query: Optional[str] = None,
+                 chunk_tokens: int = CHUNK_TOKENS, default_title: str = "BELGE") -> PackResult:
+    """
+    Metni (veya [{"title", "text"}] bölümlerini) token bütçesine sığdırır.
+    Dosya başlıkları her zaman korunur; önce her dosyanın en ilgili parçası,
+    sonra kalan bütçe en yüksek puanlı parçalarla doldurulur. Seçilen parçalar
+    orijinal sıralarıyla, atlanan yerlere "[...]" konarak birleştirilir.
+    """
+    sections = split_sections(source, default_title) if isinstance(source, str) else [
+        {"title": s.get("title", default_title),
+         "header": s.get("header", f"--- {s.get('title', default_title)} ---"),
+         "text": s.get("text", "")}
+        for s in source
+    ]
+
+    total_tokens = sum(count_tokens(s["header"]) + count_tokens(s["text"]) for s in sections)
+    # Bütçe bir parçadan küçükse parçalar bütçeye göre küçültülür: bağlam tamamen
+    # düşmez, en ilgili parçanın sığan dilimi girer
+    room = budget_tokens - sum(count_tokens(s["header"]) for s in sections)
+    if 0 < room < chunk_tokens and total_tokens > budget_tokens:
+        chunk_tokens = room
+    chunks: List[Dict] = []
+    by_section: List[List[Dict]] = []
+    for si, section in enumerate(sections):
+        own = []
+        for ci, text in enumerate(chunk_section(section["text"], chunk_tokens)):
+            own.append({"section": si, "index": ci, "order": len(chunks) + len(own),
+                        "text": text, "tokens": count_tokens(text)})
+        chunks.extend(own)
+        by_section.append(own)
+
+    # Her şey sığıyorsa olduğu gibi döndür
+    if total_tokens <= budget_tokens:
+        text = source if isinstance(source, str) else "\n".join(
+            f"{s['header']}\n{s['text']}" if s["header"] else s["text"] for s in sections)
+        included = [{"title": s["title"], "chunks": len(own)} for s, own in zip(sections, by_section)]
+        return PackResult(text, total_tokens, budget_tokens, total_tokens, included, [])
+
+    _score_chunks(chunks, query)
+
+    used = sum(count_tokens(s["header"]) for s in sections)
+    selected = set()
+
+    # 1. tur: her dosyanın en ilgili parçası (tek dosya bütün bütçeyi yutmasın)
+    for own in by_section:
+        if not own:
+            continue
+        best = max(own, key=lambda c: c["score"])
+        if used + best["tokens"] <= budget_tokens:
+            selected.add(best["order"])
+            used += best["tokens"]
+
+    # 2. tur: kalan bütçe en yüksek puanlılarla
+    for c in sorted(chunks, key=lambda c: (-c["score"], c["order"])):
+        if c["order"] in selected:
+            continue
+        if used + c["tokens"] <= budget_tokens:
+            selected.add(c["order"])
+            used += c["tokens"]
+
+    # Orijinal sırayla birleştir
+    parts, included, dropped = [], [], []
+    for section, own in zip(sections, by_section):
+        kept = [c for c in own if c["order"] in selected]
+        if section["header"]:
+            parts.append(section["header"])
+        last_index = -1
+        for c in kept:
+            if c["index"] != last_index + 1:
+                parts.append(GAP_MARKER)
+            parts.append(c["text"])
+            last_index = c["index"]
+        if own and last_index != own[-1]["index"]:
+            parts.append(GAP_MARKER)
+        if kept:
+            included.append({"title": section["title"], "chunks": len(kept)})
+        lost = [c for c in own if c["order"] not in selected]
+        if lost:
+            dropped.append({"title": section["title"], "chunks": len(lost),
+                            "tokens": sum(c["tokens"] for c in lost)})
+
+    return PackResult("\n".join(parts), used, budget_tokens, total_tokens, included, dropped)
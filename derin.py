@@ -1,8 +1,8 @@
 import streamlit as st
 import google.generativeai as genai
 import re
-import difflib
 from PyPDF2 import PdfReader
+from lexical_index import BM25Index
 
 # Sayfa Ayarları
 st.set_page_config(page_title="Mevzuat Analiz Sistemi", layout="wide", page_icon="⚖️")
@@ -22,24 +22,24 @@ if 'uploader_key' not in st.session_state:
 # --- HAFIZAYI SİLME FONKSİYONU ---
 def hafizayi_temizle():
     st.session_state.mevzuat_verisi = BASE_DATA.copy()
+    st.session_state.mevzuat_dizini = None
+    st.session_state.yuklenen_dosyalar = set()
     st.session_state.uploader_key += 1  # File uploader'ı sıfırlamak için key değiştiriyoruz
     st.rerun()
 
 # --- ARAMA MOTORU ---
-def akilli_ara(sorgu, mevzuat_listesi, limit=5):
-    sorgu = sorgu.lower().strip()
-    sonuclar = []
-    for madde in mevzuat_listesi:
-        skor = 0
-        madde_lower = madde.lower()
-        if sorgu in madde_lower: skor += 100
-        sorgu_kelimeleri = sorgu.split()
-        eslesen_kelime_sayisi = sum(1 for k in sorgu_kelimeleri if k in madde_lower)
-        skor += (eslesen_kelime_sayisi * 20)
-        benzerlik = difflib.SequenceMatcher(None, sorgu, madde_lower[:200]).ratio()
-        skor += (benzerlik * 50)
-        if skor > 10: sonuclar.append((madde, skor))
-    return sorted(sonuclar, key=lambda x: x[1], reverse=True)[:limit]
+def akilli_ara(sorgu, dizin, limit=5):
+    """BM25 ters dizininde arar; (madde, skor) listesi döner.
+    Yalnızca sorgu terimlerinin geçtiği maddeler puanlanır (tüm liste gezilmez)."""
+    return dizin.search_texts(sorgu, limit)
+
+def arama_dizini():
+    """Oturumun sözcüksel dizini; madde listesiyle uyuşmuyorsa (ilk açılış, temizleme) yeniden kurulur."""
+    dizin = st.session_state.get("mevzuat_dizini")
+    if dizin is None or len(dizin.texts) != len(st.session_state.mevzuat_verisi):
+        dizin = BM25Index(st.session_state.mevzuat_verisi)
+        st.session_state.mevzuat_dizini = dizin
+    return dizin
 
 # --- SIDEBAR ---
 with st.sidebar:
@@ -57,12 +57,17 @@ with st.sidebar:
     # key={st.session_state.uploader_key} sayesinde hafıza silinince bu alan da temizlenir
     uploaded_file = st.file_uploader("PDF Yükle", type="pdf", key=f"pdf_up_{st.session_state.uploader_key}")
     
-    if uploaded_file:
+    # Aynı dosya her yeniden çizimde tekrar eklenmez
+    dosya_anahtari = f"{uploaded_file.name}:{uploaded_file.size}" if uploaded_file else None
+    if uploaded_file and dosya_anahtari not in st.session_state.setdefault("yuklenen_dosyalar", set()):
+        st.session_state.yuklenen_dosyalar.add(dosya_anahtari)
         reader = PdfReader(uploaded_file)
         yeni_metin = ""
         for page in reader.pages:
             yeni_metin += page.extract_text() + "\n"
         paragraflar = [p.strip() for p in yeni_metin.split('\n') if len(p.strip()) > 40]
+        # Dizin artımlı güncellenir: yalnızca yeni paragraflar çözümlenir
+        arama_dizini().add(paragraflar)
         st.session_state.mevzuat_verisi.extend(paragraflar)
         st.success(f"Hafızaya {len(paragraflar)} yeni madde eklendi!")
 
@@ -71,7 +76,7 @@ with st.sidebar:
     hizli_sorgu = st.text_input("Anahtar kelimeler", key=f"search_{st.session_state.uploader_key}")
     
     if hizli_sorgu:
-        bulunanlar = akilli_ara(hizli_sorgu, st.session_state.mevzuat_verisi)
+        bulunanlar = akilli_ara(hizli_sorgu, arama_dizini())
         for metin, skor in bulunanlar:
             vurgulu = metin
             for k in hizli_sorgu.split():
@@ -89,7 +94,7 @@ else:
     soru = st.text_area("Hukuki sorunuzu yazın:", placeholder="Hafızadaki belgelere göre analiz yapılır...")
     
     if st.button("Analiz Et"):
-        en_alakali = akilli_ara(soru, st.session_state.mevzuat_verisi, limit=10)
+        en_alakali = akilli_ara(soru, arama_dizini(), limit=10)
         baglam = "\n".join([m[0] for m in en_alakali])
         
         model = genai.GenerativeModel('gemini-2.5-flash')
@@ -4,20 +4,25 @@ import numpy as np
 import faiss
 import re
 from PyPDF2 import PdfReader
+from embedding_service import EMBED_MODEL, embed_texts, embed_query
+from gemini_client import gemini_model
+from hybrid_retrieval import LEXICAL, VECTOR, hybrid_search, prepared_retriever
+from citation_graph import citation_graph
+from statute_index import detect_law_number, detect_title, statute_index
+from vector_index import (INDEX_KIND, INDEX_KINDS, build_faiss_index, index_store,
+                          make_index_id, source_digest, tune_search)
 
 # Sayfa Ayarları
 st.set_page_config(page_title="Nokta Atışı Mevzuat", layout="wide")
 
 # --- FONKSİYONLAR ---
-def get_embeddings(texts, api_key):
-    """Metinleri yapay zeka vektörlerine dönüştürür (Anlamsal Hafıza)"""
-    genai.configure(api_key=api_key)
-    result = genai.embed_content(
-        model="models/embedding-001",
-        content=texts,
-        task_type="retrieval_document"
-    )
-    return result['embedding']
+def get_embeddings(texts, api_key, on_progress=None):
+    """Metinleri yapay zeka vektörlerine dönüştürür (Anlamsal Hafıza).
+    Partili + eşzamanlı gönderilir, diskte önbelleklenir; float32 matris döner."""
+    return embed_texts(texts, api_key, task_type="retrieval_document", on_progress=on_progress)
+
+# Bölme kuralı değişirse artırılmalı: eski diskteki dizinler geçersiz sayılır
+CHUNKER_VERSION = "madde-1"
 
 def chunk_legal_text(text):
     """Hukuki metni 'Madde' bazlı akıllıca böler"""
@@ -36,11 +41,51 @@ def chunk_legal_text(text):
         chunks = [p.strip() for p in text.split('\n\n') if len(p) > 50]
     return chunks
 
+def build_index(uploaded_file, api_key, kind=INDEX_KIND):
+    """PDF'in diskteki dizinini açar; yoksa endeksleyip diske yazar (tüm oturumlar paylaşır)."""
+    source_hash = source_digest(uploaded_file.getvalue())
+    index_id = make_index_id(source_hash, CHUNKER_VERSION, EMBED_MODEL, kind)
+    loaded = index_store.load(index_id)
+    if loaded is not None:
+        return loaded
+
+    reader = PdfReader(uploaded_file)
+    full_text = "\n".join([p.extract_text() for p in reader.pages])
+
+    # Künyesinde kanun numarası olan metin madde dizinine de yazılır ("5996 m.41" doğrudan çözülsün)
+    law_no = detect_law_number(full_text)
+    if law_no:
+        if statute_index.ingest(full_text, law_no, detect_title(full_text), uploaded_file.name):
+            citation_graph.ingest_law(law_no)
+
+    # 1. Akıllı Bölme
+    chunks = chunk_legal_text(full_text)
+
+    # 2. Vektörleştirme (AI Anlamlandırma)
+    # 100'lük partiler eşzamanlı gider; daha önce görülen maddeler diskten gelir
+    embed_bar = st.progress(0.0)
+    embeddings = get_embeddings(chunks, api_key,
+                                on_progress=lambda done, total: embed_bar.progress(done / total))
+
+    # 3. FAISS İndeksi Oluşturma (büyük derlemde eğitilen yaklaşık dizin)
+    index, params = build_faiss_index(embeddings, kind)
+    # Hedef recall'a ulaşan en küçük nprobe / efSearch varsayılan olur
+    params["arama"] = tune_search(index, embeddings, params["dizin_tipi"])
+
+    # 4. Diske yaz: sonraki oturumlar bellek eşlemeli olarak anında açar
+    manifest = {"kaynak_adi": uploaded_file.name, "kaynak_sha256": source_hash,
+                "parcalayici": CHUNKER_VERSION, "embedding_modeli": EMBED_MODEL, **params}
+    return index_store.save(index_id, index, chunks, manifest)
+
 # --- SESSION STATE ---
 if 'vector_index' not in st.session_state:
     st.session_state.vector_index = None
     st.session_state.chunks = []
 
+def use_index(loaded):
+    st.session_state.vector_index = loaded
+    st.session_state.chunks = loaded.chunks
+
 # --- SIDEBAR ---
 with st.sidebar:
     st.title("⚖️ Profesyonel Denetim")
@@ -52,28 +97,25 @@ with st.sidebar:
         st.rerun()
 
     st.divider()
+    # Daha önce endekslenmiş kanunlar PDF yüklemeden açılabilir
+    kayitli = [m for m in index_store.list() if m.get("parcalayici") == CHUNKER_VERSION
+               and m.get("embedding_modeli") == EMBED_MODEL]
+    if kayitli:
+        secenekler = {f"{m.get('kaynak_adi', m['dizin_id'])} ({m['parca_sayisi']} madde)": m["dizin_id"] for m in kayitli}
+        secim = st.selectbox("💾 Kayıtlı Dizinler", ["—"] + list(secenekler))
+        if secim != "—" and st.button("📂 Dizini Aç"):
+            use_index(index_store.load(secenekler[secim]))
+            st.rerun()
+
     uploaded_file = st.file_uploader("Mevzuat PDF Yükle", type="pdf")
+    dizin_tipi = st.selectbox("Dizin Tipi", ["auto"] + list(INDEX_KINDS),
+                              help="auto: küçük kanunlarda kesin arama (flat), büyük derlemlerde int8 sıkıştırmalı IVF")
     
     if uploaded_file and api_key and st.session_state.vector_index is None:
         with st.status("Mevzuat Endeksleniyor (Nokta Atışı Hazırlığı)..."):
-            reader = PdfReader(uploaded_file)
-            full_text = "\n".join([p.extract_text() for p in reader.pages])
-            
-            # 1. Akıllı Bölme
-            chunks = chunk_legal_text(full_text)
-            st.session_state.chunks = chunks
-            
-            # 2. Vektörleştirme (AI Anlamlandırma)
-            # Not: Çok büyük dosyalarda batch işlemi yapılır, burada hızlı örnek için:
-            embeddings = get_embeddings(chunks, api_key)
-            
-            # 3. FAISS İndeksi Oluşturma (Işık hızında arama için)
-            dim = len(embeddings[0])
-            index = faiss.IndexFlatL2(dim)
-            index.add(np.array(embeddings).astype('float32'))
-            
-            st.session_state.vector_index = index
-            st.success(f"{len(chunks)} madde hafızaya alındı.")
+            loaded = build_index(uploaded_file, api_key, dizin_tipi)
+            use_index(loaded)
+            st.success(f"{len(loaded)} madde hafızaya alındı.")
 
 # --- ANA EKRAN ---
 st.title("🔍 Nokta Atışı Mevzuat Tarama")
@@ -83,32 +125,56 @@ if not api_key:
 elif st.session_state.vector_index is None:
     st.info("Lütfen bir mevzuat PDF'i yükleyerek taramayı başlatın.")
 else:
+    dizin = st.session_state.vector_index
+    arama_ayari = {}
+    if dizin.kind != "flat":
+        varsayilan = dizin.manifest.get("arama", {})
+        with st.expander(f"⚙️ Arama Ayarı ({dizin.kind}, ölçülen recall: {varsayilan.get('olculen_recall', '-')})"):
+            if dizin.kind == "hnsw":
+                arama_ayari["ef_search"] = st.slider("efSearch (yüksek = daha isabetli, daha yavaş)", 16, 512,
+                                                     int(varsayilan.get("ef_search", 64)))
+            else:
+                arama_ayari["nprobe"] = st.slider("nprobe (taranacak küme sayısı)", 1, int(dizin.manifest.get("nlist", 256)),
+                                                  min(int(varsayilan.get("nprobe", 16)), int(dizin.manifest.get("nlist", 256))))
+
+    def vektor_ara(sorgu_vektoru, adet):
+        # Vektöre çevrilmiş sorguya en yakın maddeleri bul (Işık hızında)
+        D, I = dizin.search(sorgu_vektoru, k=adet, **arama_ayari)
+        return [(int(i), dizin.chunks[int(i)], float(d)) for d, i in zip(D[0], I[0]) if i >= 0]
+
+    def sozcuk_ara(sorgu, adet):
+        # "5996 m.41" gibi birebir atıflar için BM25
+        return [(i, dizin.chunks[i], puan) for i, puan in dizin.lexical().search(sorgu, adet)]
+
     query = st.text_input("🔎 Aramak istediğiniz kavram veya olay (Örn: gübre idari yaptırım yetkisi)", 
-                         placeholder="AI burada kelimeye değil, anlama bakar...")
+                         placeholder="Hem kelimeye hem anlama bakılır...")
 
     if query:
         with st.spinner("Mevzuat taranıyor..."):
-            # Sorguyu vektöre çevir
-            query_vec = np.array([get_embeddings([query], api_key)[0]]).astype('float32')
-            
-            # En yakın 5 maddeyi bul (Işık hızında)
-            D, I = st.session_state.vector_index.search(query_vec, k=5)
+            # İki dizin aynı anda sorgulanır, sıralar RRF ile birleştirilir;
+            # soru embedding'i (ağ çağrısı) arama bütçesinden önce alınır
+            vektor = prepared_retriever(lambda: embed_query(query, api_key), vektor_ara)
+            sonuclar = hybrid_search(query, {LEXICAL: sozcuk_ara, VECTOR: vektor}, k=5)
             
             st.subheader("📍 En Alakalı Mevzuat Maddeleri")
+            for ad, sebep in sonuclar.skipped.items():
+                st.caption(f"⚠️ {ad} araması atlandı: {sebep}")
+            if not sonuclar:
+                st.warning("Eşleşen madde bulunamadı.")
             
-            for i, idx in enumerate(I[0]):
-                score = D[0][i]
-                madde_metni = st.session_state.chunks[idx]
+            for hit in sonuclar:
+                idx = hit.key
+                madde_metni = hit.text
                 
                 with st.container():
                     st.markdown(f"""
                     <div style="background: white; padding: 15px; border-radius: 10px; border-left: 5px solid #28a745; margin-bottom: 10px; box-shadow: 2px 2px 5px rgba(0,0,0,0.1); color: black;">
-                        <small style="color: gray;">Eşleşme Kalitesi: {max(0, int(100 - score))}%</small><br>
+                        <small style="color: gray;">Bulunduğu dizin: {hit.provenance()}</small><br>
                         {madde_metni[:500]}...
                     </div>
                     """, unsafe_allow_html=True)
                     
                     if st.button(f"Bu Maddeyi AI ile Analiz Et", key=f"btn_{idx}"):
-                        model = genai.GenerativeModel('gemini-2.5-flash')
+                        model = gemini_model(api_key, 'gemini-2.5-flash')
                         response = model.generate_content(f"Şu maddeyi açıkla ve yaptırımını söyle: {madde_metni}")
                         st.info(response.text)
@@ -0,0 +1,227 @@
+"""
+Embedding Servisi
+
+Metinleri Gemini embedding modeliyle vektöre çevirir:
+- Girdiler API sınırına uygun partilere bölünür (tek çağrıda en fazla 100 metin)
+- Partiler paylaşılan yürütücüde eşzamanlı gönderilir (hız sınırı + geri çekilme)
+- Her vektör model + görev tipi + metin özetiyle diskte (SQLite) saklanır;
+  aynı Kanun'un yeniden endekslenmesi hiç API çağrısı yapmaz
+- Sonuç her zaman float32 NumPy matrisidir (satır sırası girdi sırasıdır)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from ai_executor import call_with_backoff, run_parallel
+from gemini_client import get_client
+from gemini_standin import install_from_env
+from telemetry import CallTrace
+
+# GEMINI_STANDIN tanımlıysa ağ yerine yerel taklitçi kullanılır
+install_from_env()
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+CACHE_DIR = os.environ.get("HUKUK_CACHE_DIR", "Hukuk_Onbellek")
+EMBEDDING_CACHE_FILE = os.path.join(CACHE_DIR, "embeddingler.sqlite")
+EMBED_MODEL = "models/embedding-001"
+EMBED_BATCH_SIZE = 100      # batchEmbedContents tek istekte en fazla 100 metin kabul eder
+EMBED_MAX_CHARS = 8000      # Çok uzun parçalar modele gönderilmeden önce kırpılır (~2048 token sınırı)
+
+
+def embedding_key(model_name: str, task_type: str, text: str) -> str:
+    """Model + görev tipi + metin özetinden önbellek anahtarı"""
+    payload = f"{model_name.replace('models/', '')}\x00{task_type}\x00{text}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ============================================================================
+# DİSK ÖNBELLEĞİ
+# ============================================================================
+
+class EmbeddingStore:
+    """Vektörleri float32 bayt dizisi olarak tutan SQLite deposu"""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    dim INTEGER,
+                    vector BLOB,
+                    created REAL
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Bulunan anahtarların vektörlerini döndürür."""
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            conn = self._connect()
+            # SQLite parametre sınırına takılmamak için 500'lük gruplar
+            for start in range(0, len(unique), 500):
+                group = unique[start:start + 500]
+                marks = ",".join("?" * len(group))
+                for key, vector in conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", group):
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, model_name: str, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, model_name, int(vec.shape[0]), vec.astype(np.float32).tobytes(), now)
+                for key, vec in items.items()]
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, created) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM embeddings")
+            conn.commit()
+
+
+# ============================================================================
+# SERVİS
+# ============================================================================
+
+class EmbeddingService:
+    """Partili, eşzamanlı ve disk önbellekli embedding üretici"""
+
+    def __init__(self, store: Optional[EmbeddingStore] = None, batch_size: int = EMBED_BATCH_SIZE):
+        self.store = store or EmbeddingStore()
+        self.batch_size = batch_size
+        self.cache_hits = 0
+        self.api_calls = 0
+        self.embedded = 0
+        self._lock = threading.Lock()
+
+    def _embed_batch(self, api_key: str, model_name: str, task_type: str, texts: List[str]) -> List[List[float]]:
+        content = [t[:EMBED_MAX_CHARS] for t in texts]
+        trace = CallTrace("embed", model_name, content)
+        try:
+            result = call_with_backoff(api_key, get_client(api_key).embed_content, model=model_name,
+                                       content=content, task_type=task_type, on_retry=trace.retry)
+        except Exception as e:
+            trace.finish(error=e)
+            raise
+        trace.finish(output_tokens=0)
+        with self._lock:
+            self.api_calls += 1
+        vectors = result["embedding"]
+        if len(texts) == 1 and vectors and not isinstance(vectors[0], (list, tuple)):
+            vectors = [vectors]
+        return vectors
+
+    def embed(self, texts: List[str], api_key: str, task_type: str = "retrieval_document",
+              model_name: str = EMBED_MODEL, max_workers: Optional[int] = None,
+              on_progress: Optional[Callable[[int, int], None]] = None) -> np.ndarray:
+        """
+        Metinleri (n, boyut) float32 matrisine çevirir. Önbellekte olmayan
+        metinler partiler halinde eşzamanlı gönderilir. Bir parti hata verirse
+        başarılı partiler yine de diske yazılır, sonra hata yükseltilir.
+        """
+        texts = [t or "" for t in texts]
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        keys = [embedding_key(model_name, task_type, t) for t in texts]
+        vectors = self.store.get_many(keys)
+        with self._lock:
+            self.cache_hits += sum(1 for k in keys if k in vectors)
+
+        # Aynı metin birden çok kez geçse de bir kez gönderilir
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        if missing:
+            pending = list(missing.items())
+            batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+            embed_batch = lambda batch: self._embed_batch(api_key, model_name, task_type, [t for _, t in batch])
+            if len(batches) == 1:
+                # Tek parti (ör. arama sorgusu) çağıranın önceliğiyle, havuza gitmeden gönderilir
+                try:
+                    results = [embed_batch(batches[0])]
+                except Exception as e:
+                    results = [e]
+                if on_progress:
+                    on_progress(1, 1)
+            else:
+                results = run_parallel(embed_batch, batches, max_workers, on_progress)
+            error = None
+            for batch, result in zip(batches, results):
+                if isinstance(result, Exception):
+                    error = error or result
+                    continue
+                fresh = {key: np.asarray(vec, dtype=np.float32) for (key, _), vec in zip(batch, result)}
+                self.store.put_many(model_name, fresh)
+                vectors.update(fresh)
+                with self._lock:
+                    self.embedded += len(fresh)
+            if error is not None:
+                raise error
+
+        return np.vstack([vectors[k] for k in keys]).astype(np.float32, copy=False)
+
+    def embed_query(self, text: str, api_key: str, model_name: str = EMBED_MODEL) -> np.ndarray:
+        """Arama sorgusu için (1, boyut) float32 matris"""
+        return self.embed([text], api_key, task_type="retrieval_query", model_name=model_name)
+
+    def stats(self) -> Dict:
+        return {
+            "onbellek_isabet": self.cache_hits,
+            "api_cagrisi": self.api_calls,
+            "yeni_vektor": self.embedded,
+            "diskteki_vektor": self.store.count(),
+        }
+
+
+# Süreç genelinde paylaşılan servis
+embedding_service = EmbeddingService()
+
+
+def embed_texts(texts: List[str], api_key: str, task_type: str = "retrieval_document",
+                model_name: str = EMBED_MODEL, on_progress: Optional[Callable[[int, int], None]] = None) -> np.ndarray:
+    """Kısayol: paylaşılan servisle metinleri vektöre çevirir."""
+    return embedding_service.embed(texts, api_key, task_type, model_name, on_progress=on_progress)
+
+
+def embed_query(text: str, api_key: str, model_name: str = EMBED_MODEL) -> np.ndarray:
+    """Kısayol: paylaşılan servisle sorgu vektörü"""
+    return embedding_service.embed_query(text, api_key, model_name)
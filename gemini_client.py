@@ -0,0 +1,154 @@
+"""
+API Anahtarına Özel Gemini İstemcisi
+
+`genai.configure(api_key=...)` süreç genelindeki tek istemciyi değiştirir;
+Streamlit her kullanıcı oturumunu aynı süreçte ayrı bir iş parçacığında
+çalıştırdığından bir kullanıcının isteği başka bir kullanıcının anahtarıyla
+gidebiliyordu. Buradaki istemci kendi kimlik bilgisini ve bağlantısını
+taşır; model, embedding, listeleme ve bağlam önbelleği çağrıları global
+duruma dokunmadan, kilitsiz ve eşzamanlı yapılabilir.
+"""
+
+import hashlib
+import threading
+from typing import Dict, Optional
+
+import google.generativeai as genai
+
+try:
+    from google.generativeai import client as genai_client
+except ImportError:
+    genai_client = None
+
+try:
+    from google.generativeai import caching as genai_caching
+except ImportError:
+    genai_caching = None
+
+# Anahtara özel istemci kurulamazsa (eski / farklı SDK) global yapılandırma
+# yalnızca bu kilit altında, çağrı süresince kullanılır.
+_CONFIGURE_LOCK = threading.Lock()
+
+
+def _key_id(api_key: str) -> str:
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+class GeminiClient:
+    """Tek bir API anahtarının servis istemcilerini (gRPC kanalları) tutar."""
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self._services: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._manager = None
+        if genai_client is not None and hasattr(genai_client, "_ClientManager"):
+            try:
+                manager = genai_client._ClientManager()
+                manager.configure(api_key=api_key)
+                self._manager = manager
+            except Exception:
+                self._manager = None
+
+    def service(self, name: str):
+        """'generative', 'model' veya 'cache' servis istemcisi (yoksa None)."""
+        if self._manager is None:
+            return None
+        with self._lock:
+            if name not in self._services:
+                try:
+                    self._services[name] = self._manager.make_client(name)
+                except Exception:
+                    self._services[name] = None
+            return self._services[name]
+
+    def _global_call(self, fn, *args, **kwargs):
+        """Yedek yol: global yapılandırmayı kilit altında bu anahtara çevirip çağırır."""
+        with _CONFIGURE_LOCK:
+            genai.configure(api_key=self.api_key)
+            return fn(*args, **kwargs)
+
+    # ------------------------------------------------------------ modeller
+    def _bind(self, model):
+        client = self.service("generative")
+        if client is not None:
+            model._client = client
+            return model
+        return _LockedModel(model, self)
+
+    def model(self, model_name: str, **kwargs):
+        """Bu anahtarla çalışan GenerativeModel"""
+        return self._bind(genai.GenerativeModel(model_name, **kwargs))
+
+    def model_from_cached(self, cached_content, **kwargs):
+        """Sunucu bağlam önbelleğine bağlı GenerativeModel"""
+        return self._bind(genai.GenerativeModel.from_cached_content(cached_content, **kwargs))
+
+    # ------------------------------------------------------------ diğer çağrılar
+    def list_models(self):
+        client = self.service("model")
+        if client is not None:
+            return list(genai.list_models(client=client))
+        return self._global_call(lambda: list(genai.list_models()))
+
+    def embed_content(self, **kwargs):
+        client = self.service("generative")
+        if client is not None:
+            return genai.embed_content(client=client, **kwargs)
+        return self._global_call(genai.embed_content, **kwargs)
+
+    def create_cached_content(self, **kwargs):
+        """caching.CachedContent.create'in anahtara özel sürümü"""
+        if genai_caching is None:
+            raise RuntimeError("Bağlam önbelleği bu SDK sürümünde yok")
+        cls = genai_caching.CachedContent
+        client = self.service("cache")
+        if client is not None and hasattr(cls, "_prepare_create_request") and hasattr(cls, "_from_obj"):
+            request = cls._prepare_create_request(**kwargs)
+            return cls._from_obj(client.create_cached_content(request))
+        return self._global_call(cls.create, **kwargs)
+
+    def delete_cached_content(self, cached_content):
+        client = self.service("cache")
+        name = getattr(cached_content, "name", None)
+        if client is not None and name:
+            client.delete_cached_content(name=name)
+        else:
+            self._global_call(cached_content.delete)
+
+
+class _LockedModel:
+    """Anahtara özel istemci yoksa generate_content'i global kilit altında çalıştırır."""
+
+    def __init__(self, model, owner: GeminiClient):
+        self._model = model
+        self._owner = owner
+
+    def generate_content(self, *args, **kwargs):
+        if kwargs.get("stream"):
+            # Akışın tamamı kilit altında tüketilir; yedek yolda eşzamanlılık yoktur
+            return iter(self._owner._global_call(lambda: list(self._model.generate_content(*args, **kwargs))))
+        return self._owner._global_call(self._model.generate_content, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+_clients: Dict[str, GeminiClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: str) -> GeminiClient:
+    """API anahtarına ait (süreç genelinde tek) istemciyi döndürür."""
+    kid = _key_id(api_key)
+    with _clients_lock:
+        client = _clients.get(kid)
+        if client is None:
+            client = GeminiClient(api_key)
+            _clients[kid] = client
+        return client
+
+
+def gemini_model(api_key: str, model_name: str, **kwargs):
+    """Kısayol: anahtara özel GenerativeModel (genai.configure gerekmez)"""
+    return get_client(api_key).model(model_name, **kwargs)
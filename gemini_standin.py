@@ -0,0 +1,560 @@
+"""
+Yerel Gemini Taklitçisi (Stand-in)
+
+Uygulamanın kullandığı `google.generativeai` yüzeyini ağ ve API anahtarı
+olmadan taklit eder: `configure`, `list_models`, `GenerativeModel`
+(`generate_content` akışlı / akışsız, `from_cached_content`), `embed_content`
+ve `caching.CachedContent`.
+- Ayarlanabilir gecikme, ilk parça süresi ve akış hızı (token/sn)
+- Hata enjeksiyonu (429 / 5xx / 404) ve dakikalık istek sınırı
+- Kayıt (record): gerçek API yanıtlarını fikstür dosyalarına yazar
+- Tekrar (replay): fikstürlerden yanıt verir, bulamazsa sentetik yanıt üretir
+  (strict=True ise hata verir)
+
+Kullanım:
+    GEMINI_STANDIN=mock|record|replay streamlit run 8.py
+    python gemini_standin.py --requests 40 --workers 4      # çevrimdışı kıyaslama
+"""
+
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+import google.generativeai as genai
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+MODES = ("mock", "record", "replay")
+CACHE_DIR = os.environ.get("HUKUK_CACHE_DIR", "Hukuk_Onbellek")
+FIXTURE_DIR = os.environ.get("GEMINI_FIXTURE_DIR", os.path.join(CACHE_DIR, "gemini_fixtures"))
+
+STANDIN_MODELS = [
+    {"name": "models/gemini-1.5-flash", "methods": ["generateContent", "countTokens", "createCachedContent"]},
+    {"name": "models/gemini-1.5-pro", "methods": ["generateContent", "countTokens", "createCachedContent"]},
+    {"name": "models/gemini-2.0-flash", "methods": ["generateContent", "countTokens", "createCachedContent"]},
+    {"name": "models/embedding-001", "methods": ["embedContent"]},
+    {"name": "models/text-embedding-004", "methods": ["embedContent"]},
+]
+
+
+class StandinConfig:
+    """Taklitçinin davranış ayarları (ortam değişkenlerinden de okunur)"""
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.05, first_token: float = 0.3,
+                 tokens_per_sec: float = 200.0, response_tokens: int = 120,
+                 error_rate: float = 0.0, error_kinds: Optional[Dict[str, float]] = None,
+                 rpm: int = 0, embed_dim: int = 768,
+                 unavailable_models: Optional[List[str]] = None, strict: bool = False,
+                 seed: Optional[int] = None):
+        self.latency = latency                  # Akışsız yanıt gecikmesi (sn)
+        self.jitter = jitter                    # Gecikmeye eklenen rastgele sapma (sn)
+        self.first_token = first_token          # Akışta ilk parçaya kadar geçen süre (sn)
+        self.tokens_per_sec = tokens_per_sec    # Akış hızı
+        self.response_tokens = response_tokens  # Sentetik yanıt uzunluğu
+        self.error_rate = error_rate            # Her çağrıda hata olasılığı (0-1)
+        self.error_kinds = error_kinds or {"quota": 0.6, "server": 0.4}
+        self.rpm = rpm                          # Dakikalık istek sınırı (0 = sınırsız), aşılınca 429
+        self.embed_dim = embed_dim
+        self.unavailable_models = unavailable_models or []   # Bu modeller 404 döner
+        self.strict = strict                    # replay'de fikstür yoksa hata ver
+        self.seed = seed
+
+    @classmethod
+    def from_env(cls) -> "StandinConfig":
+        env = os.environ.get
+        return cls(
+            latency=float(env("STANDIN_LATENCY", "0.2")),
+            jitter=float(env("STANDIN_JITTER", "0.05")),
+            first_token=float(env("STANDIN_FIRST_TOKEN", "0.3")),
+            tokens_per_sec=float(env("STANDIN_TOKENS_PER_SEC", "200")),
+            error_rate=float(env("STANDIN_ERROR_RATE", "0")),
+            rpm=int(env("STANDIN_RPM", "0")),
+            unavailable_models=[m for m in env("STANDIN_UNAVAILABLE_MODELS", "").split(",") if m],
+            strict=env("STANDIN_STRICT", "0") == "1",
+        )
+
+
+# ============================================================================
+# HATALAR
+# ============================================================================
+
+def _make_error(kind: str, message: str) -> Exception:
+    """google.api_core istisnası (varsa) ya da kodlu mesajlı istisna üretir."""
+    if google_exceptions is not None:
+        cls = {
+            "quota": google_exceptions.ResourceExhausted,
+            "server": google_exceptions.ServiceUnavailable,
+            "not_found": google_exceptions.NotFound,
+        }.get(kind, google_exceptions.InternalServerError)
+        return cls(message)
+    code = {"quota": 429, "server": 503, "not_found": 404}.get(kind, 500)
+    error = Exception(f"{code} {message}")
+    error.code = code
+    return error
+
+
+# ============================================================================
+# YANIT NESNELERİ
+# ============================================================================
+
+class StandinResponse:
+    """generate_content yanıtı / akış parçası (yalnızca `.text` kullanılıyor)"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __repr__(self):
+        return f"StandinResponse({self.text[:40]!r})"
+
+
+class StandinModelInfo:
+    """list_models öğesi"""
+
+    def __init__(self, name: str, methods: List[str]):
+        self.name = name
+        self.supported_generation_methods = methods
+
+
+class StandinCachedContent:
+    """caching.CachedContent taklidi"""
+
+    def __init__(self, model: str, contents, system_instruction: Optional[str] = None):
+        self.model = model
+        self.contents = contents
+        self.system_instruction = system_instruction
+        self.name = f"cachedContents/{_digest([model, system_instruction or ''] + list(contents or []))[:16]}"
+
+    def delete(self):
+        pass
+
+
+def _digest(parts) -> str:
+    # Geç içe aktarma: kıyaslama önbellek klasörünü içe aktarmadan önce ayarlayabilsin
+    from response_cache import digest_part
+    parts = parts if isinstance(parts, (list, tuple)) else [parts]
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(digest_part(part).encode("ascii"))
+    return h.hexdigest()
+
+
+# ============================================================================
+# TAKLİTÇİ
+# ============================================================================
+
+class GeminiStandin:
+    """genai modülünün yerine geçen yerel sunucu"""
+
+    def __init__(self, mode: str = "mock", config: Optional[StandinConfig] = None,
+                 fixture_dir: str = FIXTURE_DIR):
+        if mode not in MODES:
+            raise ValueError(f"Bilinmeyen mod: {mode}")
+        self.mode = mode
+        self.config = config or StandinConfig()
+        self.fixture_dir = fixture_dir
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._window = deque()
+        self._originals: Dict[str, object] = {}
+        self.in_flight = 0
+        self.stats = {"generate": 0, "stream": 0, "embed": 0, "list": 0, "cache": 0,
+                      "errors": 0, "replayed": 0, "recorded": 0, "synthetic": 0, "max_in_flight": 0}
+
+    # ------------------------------------------------------------------ kurulum
+    def install(self):
+        """genai modülündeki fonksiyonları bu taklitçiyle değiştirir."""
+        if self._originals:
+            return self
+        for name in ("configure", "list_models", "GenerativeModel", "embed_content"):
+            self._originals[name] = getattr(genai, name, None)
+        try:
+            from google.generativeai import caching
+        except ImportError:
+            caching = None
+        if caching is not None:
+            self._originals["caching.CachedContent"] = getattr(caching, "CachedContent", None)
+
+        standin = self
+        genai.configure = lambda *args, **kwargs: standin._configure(*args, **kwargs)
+        genai.list_models = lambda *args, **kwargs: standin.list_models(*args, **kwargs)
+        genai.embed_content = lambda *args, **kwargs: standin.embed_content(*args, **kwargs)
+        genai.GenerativeModel = _model_class(standin)
+        if caching is not None:
+            caching.CachedContent = _cached_content_class(standin)
+        return self
+
+    def uninstall(self):
+        for name, value in self._originals.items():
+            if name == "caching.CachedContent":
+                genai.caching.CachedContent = value
+            else:
+                setattr(genai, name, value)
+        self._originals = {}
+
+    def _original(self, name: str):
+        return self._originals.get(name) or getattr(genai, name)
+
+    def _configure(self, *args, **kwargs):
+        if self.mode == "record":
+            self._original("configure")(*args, **kwargs)
+
+    # ------------------------------------------------------------ davranış
+    def _enter(self, kind: str, model_name: Optional[str] = None):
+        """Sayaç, istek sınırı ve hata enjeksiyonu (gerçek kayıtta atlanır)."""
+        with self._lock:
+            self.stats[kind] += 1
+            self.in_flight += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.in_flight)
+            if self.mode == "record":
+                return
+            now = time.monotonic()
+            if self.config.rpm:
+                while self._window and now - self._window[0] > 60:
+                    self._window.popleft()
+                if len(self._window) >= self.config.rpm:
+                    self.stats["errors"] += 1
+                    self.in_flight -= 1
+                    raise _make_error("quota", "Resource has been exhausted (standin rpm)")
+                self._window.append(now)
+            if model_name and model_name.replace("models/", "") in [
+                    m.replace("models/", "") for m in self.config.unavailable_models]:
+                self.stats["errors"] += 1
+                self.in_flight -= 1
+                raise _make_error("not_found", f"models/{model_name.replace('models/', '')} is not found")
+            if self.config.error_rate and self._random.random() < self.config.error_rate:
+                kinds = list(self.config.error_kinds.items())
+                pick = self._random.random() * sum(w for _, w in kinds)
+                kind_name = kinds[-1][0]
+                for name, weight in kinds:
+                    pick -= weight
+                    if pick <= 0:
+                        kind_name = name
+                        break
+                self.stats["errors"] += 1
+                self.in_flight -= 1
+                raise _make_error(kind_name, "Injected standin error")
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _sleep(self, seconds: float):
+        if self.mode != "record" and seconds > 0:
+            time.sleep(max(0.0, seconds + self._random.uniform(-self.config.jitter, self.config.jitter)))
+
+    def _synthetic_text(self, model_name: str, key: str) -> str:
+        rng = random.Random(key)
+        words = ["dava", "mahkeme", "karar", "madde", "kanun", "sözleşme", "taraf", "bilirkişi",
+                 "tazminat", "süre", "itiraz", "delil", "hak", "talep", "esas"]
+        body = " ".join(rng.choice(words) for _ in range(max(1, self.config.response_tokens)))
+        return f"[{model_name.replace('models/', '')} taklit yanıtı {key[:8]}] {body}"
+
+    def _synthetic_vector(self, text: str) -> List[float]:
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).hexdigest())
+        vec = [rng.gauss(0, 1) for _ in range(self.config.embed_dim)]
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    # ------------------------------------------------------------ fikstürler
+    def _fixture_path(self, kind: str, key: str) -> str:
+        return os.path.join(self.fixture_dir, kind, f"{key}.json")
+
+    def _load_fixture(self, kind: str, key: str) -> Optional[Dict]:
+        if self.mode != "replay":
+            return None
+        try:
+            with open(self._fixture_path(kind, key), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            if self.config.strict:
+                raise _make_error("not_found", f"Fikstür yok: {kind}/{key}")
+            with self._lock:
+                self.stats["synthetic"] += 1
+            return None
+        with self._lock:
+            self.stats["replayed"] += 1
+        return data
+
+    def _save_fixture(self, kind: str, key: str, data: Dict):
+        path = self._fixture_path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        with self._lock:
+            self.stats["recorded"] += 1
+
+    # ------------------------------------------------------------ API yüzeyi
+    def list_models(self, *args, **kwargs) -> List[StandinModelInfo]:
+        self._enter("list")
+        try:
+            if self.mode == "record":
+                models = [{"name": m.name, "methods": list(m.supported_generation_methods)}
+                          for m in self._original("list_models")(*args, **kwargs)]
+                self._save_fixture("list_models", "models", {"models": models})
+            else:
+                data = self._load_fixture("list_models", "models")
+                models = data["models"] if data else STANDIN_MODELS
+            return [StandinModelInfo(m["name"], m["methods"]) for m in models]
+        finally:
+            self._leave()
+
+    def embed_content(self, model: str = "models/embedding-001", content=None,
+                      task_type: Optional[str] = None, **kwargs) -> Dict:
+        self._enter("embed", model)
+        try:
+            key = _digest([model, task_type or "", json.dumps(content, ensure_ascii=False)])
+            if self.mode == "record":
+                result = self._original("embed_content")(model=model, content=content, task_type=task_type, **kwargs)
+                self._save_fixture("embed", key, {"embedding": result["embedding"]})
+                return result
+            data = self._load_fixture("embed", key)
+            if data:
+                return {"embedding": data["embedding"]}
+            self._sleep(self.config.latency)
+            if isinstance(content, (list, tuple)):
+                return {"embedding": [self._synthetic_vector(c) for c in content]}
+            return {"embedding": self._synthetic_vector(content or "")}
+        finally:
+            self._leave()
+
+    def generate(self, model_name: str, contents, real_model=None, cached_content=None) -> StandinResponse:
+        self._enter("generate", model_name)
+        try:
+            key = _digest([model_name, cached_content.name if cached_content else "", contents])
+            if self.mode == "record":
+                response = real_model.generate_content(contents)
+                self._save_fixture("generate", key, {"model": model_name, "text": response.text})
+                return response
+            data = self._load_fixture("generate", key)
+            self._sleep(self.config.latency)
+            return StandinResponse(data["text"] if data else self._synthetic_text(model_name, key))
+        finally:
+            self._leave()
+
+    def stream(self, model_name: str, contents, real_model=None, cached_content=None) -> Iterator[StandinResponse]:
+        self._enter("stream", model_name)
+        key = _digest([model_name, cached_content.name if cached_content else "", contents])
+        if self.mode == "record":
+            try:
+                iterator = iter(real_model.generate_content(contents, stream=True))
+            except Exception:
+                self._leave()
+                raise
+            return self._record_stream(key, model_name, iterator)
+        try:
+            data = self._load_fixture("stream", key)
+        except Exception:
+            self._leave()
+            raise
+        chunks = data["chunks"] if data else self._split_chunks(self._synthetic_text(model_name, key))
+        return self._paced_stream(chunks)
+
+    def _split_chunks(self, text: str, words_per_chunk: int = 8) -> List[str]:
+        words = text.split(" ")
+        return [" ".join(words[i:i + words_per_chunk]) + " " for i in range(0, len(words), words_per_chunk)]
+
+    def _paced_stream(self, chunks: List[str]) -> Iterator[StandinResponse]:
+        try:
+            self._sleep(self.config.first_token)
+            for i, chunk in enumerate(chunks):
+                if i and self.config.tokens_per_sec:
+                    time.sleep(len(chunk.split()) / self.config.tokens_per_sec)
+                yield StandinResponse(chunk)
+        finally:
+            self._leave()
+
+    def _record_stream(self, key: str, model_name: str, iterator) -> Iterator:
+        chunks = []
+        try:
+            for chunk in iterator:
+                try:
+                    chunks.append(chunk.text or "")
+                except Exception:
+                    chunks.append("")
+                yield chunk
+            self._save_fixture("stream", key, {"model": model_name, "chunks": chunks})
+        finally:
+            self._leave()
+
+    def create_cached_content(self, model: str, contents=None, system_instruction=None, **kwargs):
+        self._enter("cache", model)
+        try:
+            if self.mode == "record":
+                original = self._originals.get("caching.CachedContent")
+                return original.create(model=model, contents=contents,
+                                       system_instruction=system_instruction, **kwargs)
+            self._sleep(self.config.latency)
+            return StandinCachedContent(model, contents, system_instruction)
+        finally:
+            self._leave()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, mode=self.mode, in_flight=self.in_flight)
+
+
+def _model_class(standin: GeminiStandin):
+    """Taklitçiye bağlı GenerativeModel sınıfı üretir."""
+    original = standin._originals.get("GenerativeModel")
+
+    class StandinGenerativeModel:
+        def __init__(self, model_name: str = "gemini-1.5-flash", *args, **kwargs):
+            self.model_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+            self.cached_content = None
+            self._real = original(model_name, *args, **kwargs) if standin.mode == "record" else None
+
+        @classmethod
+        def from_cached_content(cls, cached_content, *args, **kwargs):
+            model = cls(getattr(cached_content, "model", "gemini-1.5-flash"))
+            model.cached_content = cached_content
+            if standin.mode == "record":
+                model._real = original.from_cached_content(cached_content, *args, **kwargs)
+            return model
+
+        def generate_content(self, contents, stream: bool = False, **kwargs):
+            if stream:
+                return standin.stream(self.model_name, contents, self._real, self.cached_content)
+            return standin.generate(self.model_name, contents, self._real, self.cached_content)
+
+        def count_tokens(self, contents):
+            from context_packer import count_tokens
+            text = contents if isinstance(contents, str) else " ".join(str(c) for c in contents)
+            return type("CountTokensResponse", (), {"total_tokens": count_tokens(text)})()
+
+    return StandinGenerativeModel
+
+
+def _cached_content_class(standin: GeminiStandin):
+    class StandinCachedContentFactory:
+        @staticmethod
+        def create(model: str, contents=None, system_instruction=None, **kwargs):
+            return standin.create_cached_content(model, contents, system_instruction, **kwargs)
+
+    return StandinCachedContentFactory
+
+
+# ============================================================================
+# ORTAMDAN KURULUM
+# ============================================================================
+
+_active: Optional[GeminiStandin] = None
+_active_lock = threading.Lock()
+
+
+def install(mode: str = "mock", config: Optional[StandinConfig] = None,
+            fixture_dir: str = FIXTURE_DIR) -> GeminiStandin:
+    """Taklitçiyi süreç genelinde kurar (öncekini kaldırır)."""
+    global _active
+    with _active_lock:
+        if _active is not None:
+            _active.uninstall()
+        _active = GeminiStandin(mode, config, fixture_dir).install()
+        return _active
+
+
+def uninstall():
+    global _active
+    with _active_lock:
+        if _active is not None:
+            _active.uninstall()
+            _active = None
+
+
+def active_standin() -> Optional[GeminiStandin]:
+    return _active
+
+
+def install_from_env() -> Optional[GeminiStandin]:
+    """GEMINI_STANDIN=mock|record|replay tanımlıysa (bir kez) kurar."""
+    mode = os.environ.get("GEMINI_STANDIN", "").strip().lower()
+    if not mode or mode in ("0", "off"):
+        return None
+    with _active_lock:
+        if _active is not None:
+            return _active
+    return install(mode, StandinConfig.from_env())
+
+
+# ============================================================================
+# ÇEVRİMDIŞI KIYASLAMA
+# ============================================================================
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_benchmark(requests: int = 40, workers: int = 4, chunks: int = 500) -> Dict:
+    """Geçit, akış ve embedding hattını taklitçi üzerinde ölçer."""
+    from ai_executor import KeyScheduler, run_parallel, set_scheduler
+    from ai_gateway import generate_text, stream_text
+    from embedding_service import embed_texts
+
+    api_key = "standin-benchmark"
+    # Hız sınırı ve günlük bütçe kıyaslamaya girmesin: sınırsız zamanlayıcı
+    # (sunucu tarafı sınır gerekiyorsa taklitçinin rpm ayarıyla verilir)
+    set_scheduler(api_key, KeyScheduler(rate=1e9, capacity=10 ** 6, daily_budget=0))
+    report = {}
+    prompts = [f"Kıyaslama isteği {i}: kira tespit davası" for i in range(requests)]
+
+    def timed(prompt):
+        start = time.perf_counter()
+        generate_text(prompt, api_key)
+        return time.perf_counter() - start
+
+    for label in ("generate_cold", "generate_cached"):
+        start = time.perf_counter()
+        latencies = [t for t in run_parallel(timed, prompts, workers) if not isinstance(t, Exception)]
+        report[label] = {"sure_sn": round(time.perf_counter() - start, 3),
+                         "p50_sn": round(_percentile(latencies, 0.5), 3),
+                         "p95_sn": round(_percentile(latencies, 0.95), 3)}
+
+    stream = stream_text(f"Kıyaslama akışı {time.time()}", api_key, use_cache=False)
+    for _ in stream:
+        pass
+    report["stream"] = {"ttft_sn": round(stream.ttft or 0, 3), "toplam_sn": round(stream.total_time or 0, 3)}
+
+    texts = [f"Madde {i}: Kıyaslama parçası" for i in range(chunks)]
+    for label in ("embed_cold", "embed_cached"):
+        start = time.perf_counter()
+        embed_texts(texts, api_key)
+        report[label] = {"sure_sn": round(time.perf_counter() - start, 3)}
+
+    report["standin"] = active_standin().snapshot() if active_standin() else {}
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Yerel Gemini taklitçisiyle çevrimdışı kıyaslama")
+    parser.add_argument("--mode", choices=MODES, default="mock")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=0)
+    args = parser.parse_args()
+
+    # Kıyaslama gerçek önbellek klasörünü kirletmesin
+    if "HUKUK_CACHE_DIR" not in os.environ:
+        os.environ["HUKUK_CACHE_DIR"] = tempfile.mkdtemp(prefix="hukuk_bench_")
+    install(args.mode, StandinConfig(latency=args.latency, error_rate=args.error_rate, rpm=args.rpm, seed=7))
+    print(json.dumps(run_benchmark(args.requests, args.workers, args.chunks), ensure_ascii=False, indent=2))
@@ -0,0 +1,132 @@
+"""
+Hibrit Arama (Sözcüksel + Vektör, Sıralama Birleştirme)
+
+Vektör araması "5996 m.41" gibi birebir atıfları kaçırabiliyor, sözcüksel
+arama ise farklı kelimelerle anlatılan kavramları. Burada iki dizin aynı
+anda sorgulanır ve sonuçlar karşılıklı sıra birleştirmesiyle (Reciprocal
+Rank Fusion) tek listeye indirilir:
+
+    puan(belge) = Σ  ağırlık / (RRF_K + sıra)
+
+Puanlar farklı ölçeklerde olduğundan (BM25 / L2 mesafesi) yalnızca sıralar
+kullanılır. Aramalar gecikme bütçesiyle çalışır: süresi dolan dizin
+atlanır, gelen sonuçlarla devam edilir. Sorgu embedding'i gibi ağ çağrıları
+bütçeden önce yapılır (prepared_retriever); bütçe yalnızca yerel dizin
+aramalarını kapsar. Her sonuç hangi dizinde kaçıncı sırada bulunduğunu
+(kaynak bilgisi) taşır.
+"""
+
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+LEXICAL = "sözcük"
+VECTOR = "vektör"
+RRF_K = 60                  # Literatürdeki olağan değer; üst sıraların baskınlığını yumuşatır
+HYBRID_BUDGET = float(os.environ.get("AI_HYBRID_BUDGET_MS", "1500")) / 1000.0
+DEPTH_FACTOR = 4            # Birleştirmeden önce her dizinden k x DEPTH_FACTOR sonuç alınır
+
+# Bir arayıcı (sorgu, adet) alır, (anahtar, metin, ham_puan) listesini en iyiden başlayarak döndürür
+Retriever = Callable[[str, int], List[Tuple[Hashable, str, float]]]
+
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hibrit-arama")
+
+
+class HybridHit:
+    """Birleştirilmiş sonuç: anahtar, metin, RRF puanı ve dizin başına (sıra, ham puan)"""
+
+    def __init__(self, key: Hashable, text: str):
+        self.key = key
+        self.text = text
+        self.score = 0.0
+        self.sources: Dict[str, Tuple[int, float]] = {}
+
+    def provenance(self) -> str:
+        """Ör. 'sözcük #1 · vektör #3'"""
+        return " · ".join(f"{name} #{rank}" for name, (rank, _) in self.sources.items())
+
+
+class HybridResult(list):
+    """HybridHit listesi; atlanan dizinler (sebep) ve dizin başına süreler de tutulur."""
+
+    def __init__(self, hits: List[HybridHit], skipped: Dict[str, str], timings: Dict[str, float]):
+        super().__init__(hits)
+        self.skipped = skipped
+        self.timings = timings
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[Tuple[Hashable, str, float]]],
+                           k: int = RRF_K, weights: Optional[Dict[str, float]] = None) -> List[HybridHit]:
+    """Dizin sıralamalarını RRF ile birleştirir (puan sırasıyla)."""
+    hits: Dict[Hashable, HybridHit] = {}
+    for name, ranking in rankings.items():
+        weight = (weights or {}).get(name, 1.0)
+        for rank, (key, text, raw) in enumerate(ranking, start=1):
+            hit = hits.get(key)
+            if hit is None:
+                hit = hits[key] = HybridHit(key, text)
+            if name in hit.sources:
+                continue
+            hit.sources[name] = (rank, raw)
+            hit.score += weight / (k + rank)
+    return sorted(hits.values(), key=lambda h: -h.score)
+
+
+def prepared_retriever(prepare: Callable[[], object],
+                       search: Callable[[object, int], List[Tuple[Hashable, str, float]]]) -> Retriever:
+    """
+    Hazırlığı (ör. sorgu embedding'i) hemen, arama bütçesinin dışında yapar;
+    arayıcı yalnızca hazır değerle yerel aramayı çalıştırır. Hazırlık hata
+    verirse arayıcı aynı hatayı yükseltir (dizin sebebiyle atlanır).
+    """
+    try:
+        value = prepare()
+    except Exception as e:
+        error = e
+
+        def failed(query: str, depth: int):
+            raise error
+        return failed
+    return lambda query, depth: search(value, depth)
+
+
+def _timed(retriever: Retriever, query: str, depth: int):
+    start = time.perf_counter()
+    result = retriever(query, depth)
+    return result, time.perf_counter() - start
+
+
+def hybrid_search(query: str, retrievers: Dict[str, Retriever], k: int = 5,
+                  budget: float = HYBRID_BUDGET, weights: Optional[Dict[str, float]] = None) -> HybridResult:
+    """
+    Arayıcıları eşzamanlı çalıştırır; bütçe içinde dönenleri RRF ile birleştirir.
+    Hata veren ya da bütçeyi aşan dizin atlanır (skipped içinde sebebiyle).
+    """
+    depth = k * DEPTH_FACTOR
+    # Her arayıcı çağıranın bağlam değişkenleriyle (telemetri modülü, öncelik) çalışır
+    futures = {_pool.submit(contextvars.copy_context().run, _timed, fn, query, depth): name
+               for name, fn in retrievers.items()}
+    done, pending = wait(futures, timeout=budget)
+    # Henüz başlamamış aramalar havuzda yer tutmasın
+    for future in pending:
+        future.cancel()
+
+    rankings, skipped, timings = {}, {}, {}
+    for future, name in futures.items():
+        if future not in done:
+            skipped[name] = f"süre aşımı (> {budget * 1000:.0f} ms)"
+            continue
+        try:
+            ranking, elapsed = future.result()
+        except Exception as e:
+            skipped[name] = f"hata: {e}"
+            continue
+        rankings[name] = ranking
+        timings[name] = elapsed
+    return HybridResult(reciprocal_rank_fusion(rankings, weights=weights)[:k], skipped, timings)
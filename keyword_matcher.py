@@ -0,0 +1,143 @@
+"""
+Çoklu Kalıp Eşleştirici (Aho-Corasick)
+
+Takip listeleri ve anahtar kelime çıkarımı her belgede her kelime için
+ayrı ayrı `kelime in metin.lower()` taraması yapıyordu; maliyet kelime
+sayısıyla doğrusal büyüyordu. Burada tüm kalıplar tek bir otomatta
+derlenir ve belge tek geçişte taranır:
+- Kalıplar ve metin Türkçe katlamadan geçer (turkish_text.fold:
+  "İMAR" / "imar", "sözleşme" / "sozlesme" eşleşir)
+- Tarama maliyeti metin uzunluğu + bulunan eşleşme sayısı kadardır,
+  liste binlerce kelimeye çıksa da değişmez
+- Derlenen otomatlar kalıp listesine göre süreç genelinde saklanır;
+  yalnızca liste değiştiğinde yeniden kurulur
+"""
+
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Tuple
+
+from turkish_text import fold
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+MAX_MATCHERS = 32           # Bellekte tutulan en fazla derlenmiş otomat (LRU)
+
+
+# ============================================================================
+# OTOMAT
+# ============================================================================
+
+class KeywordMatcher:
+    """Kalıp listesinden derlenmiş Aho-Corasick otomatı"""
+
+    def __init__(self, patterns: Iterable[str]):
+        # Boş kalıplar atlanır, tekrarlar tek kez tutulur (ilk sıra korunur)
+        self.patterns: List[str] = list(dict.fromkeys(p for p in patterns if p and fold(p).strip()))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        self._lengths: List[int] = []
+        for pattern_id, pattern in enumerate(self.patterns):
+            key = fold(pattern).strip()
+            self._lengths.append(len(key))
+            node = 0
+            for ch in key:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = nxt
+            self._out[node] += (pattern_id,)
+        self._link()
+
+    def _link(self):
+        """Başarısızlık bağlantılarını genişlik öncelikli kurar, çıktıları birleştirir."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                state = self._fail[node]
+                while state and ch not in self._goto[state]:
+                    state = self._fail[state]
+                fail = self._goto[state].get(ch, 0)
+                self._fail[child] = fail if fail != child else 0
+                self._out[child] += self._out[self._fail[child]]
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """Tüm eşleşmeler: (başlangıç, bitiş, kalıp) listesi, metindeki sırayla."""
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = []
+        state = 0
+        for end, ch in enumerate(fold(text or ""), start=1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pattern_id in out[state]:
+                hits.append((end - self._lengths[pattern_id], end, self.patterns[pattern_id]))
+        return hits
+
+    def matches(self, text: str) -> List[str]:
+        """Metinde geçen farklı kalıplar, kalıp listesindeki sırayla."""
+        out = self._out
+        found = set()
+        if self.patterns:
+            goto, fail = self._goto, self._fail
+            state = 0
+            for ch in fold(text or ""):
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(ch, 0)
+                if out[state]:
+                    found.update(out[state])
+        return [self.patterns[i] for i in sorted(found)]
+
+
+# ============================================================================
+# ÖNBELLEK
+# ============================================================================
+
+class MatcherCache:
+    """Kalıp listesine göre derlenmiş otomatları (LRU) saklar."""
+
+    def __init__(self, max_matchers: int = MAX_MATCHERS):
+        self.max_matchers = max_matchers
+        self._matchers: "OrderedDict[Tuple[str, ...], KeywordMatcher]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+
+    def get(self, patterns: Iterable[str]) -> KeywordMatcher:
+        """Listenin otomatını döndürür; liste ilk kez görülüyorsa derler."""
+        key = tuple(patterns)
+        with self._lock:
+            matcher = self._matchers.get(key)
+            if matcher is not None:
+                self._matchers.move_to_end(key)
+                self.hits += 1
+                return matcher
+        matcher = KeywordMatcher(key)
+        with self._lock:
+            self.builds += 1
+            self._matchers[key] = matcher
+            while len(self._matchers) > self.max_matchers:
+                self._matchers.popitem(last=False)
+        return matcher
+
+
+# Süreç genelinde paylaşılan otomat önbelleği
+matcher_cache = MatcherCache()
+
+
+def get_matcher(patterns: Iterable[str]) -> KeywordMatcher:
+    """Kalıp listesi için (önbellekten) derlenmiş eşleştirici"""
+    return matcher_cache.get(patterns)
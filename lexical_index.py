@@ -0,0 +1,141 @@
+"""
+BM25 Ters Dizin (Sözcüksel Arama)
+
+Her sorguda tüm maddeleri tek tek gezip difflib benzerliği hesaplamak
+yerine terim → (belge, frekans) listelerinden oluşan bir ters dizin tutulur:
+- Terimler Türkçe çözümleyiciden geçer (turkish_text.analyze: katlama,
+  durak kelime, gövde), "Kiracı" / "kiracının" / "KIRACI" aynı terime düşer
+- Sorguda yalnızca sorgu terimlerinin listeleri taranır, BM25 ile puanlanır
+- Belgeler eklendikçe dizin artımlı güncellenir; silinenler işaretlenir
+- Sorgunun tamamı belgede birebir geçiyorsa (tam ifade) ek puan verilir
+"""
+
+import math
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from turkish_text import analyze, fold
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+PHRASE_BOOST = 1.5          # Tam ifade eşleşmesinde puan çarpanı
+PHRASE_CANDIDATES = 50      # Tam ifade kontrolü yapılacak en iyi aday sayısı
+
+
+class _Postings:
+    """Bir terimin belge kimlikleri ve frekansları (bitişik diziler, eklemeye açık)"""
+
+    __slots__ = ("doc_ids", "freqs")
+
+    def __init__(self):
+        self.doc_ids = array("i")
+        self.freqs = array("f")
+
+
+# ============================================================================
+# DİZİN
+# ============================================================================
+
+class BM25Index:
+    """Artımlı güncellenen, Türkçe çözümleyicili BM25 ters dizini"""
+
+    def __init__(self, texts: Optional[Iterable[str]] = None, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self.clear()
+        if texts:
+            self.add(texts)
+
+    def clear(self):
+        self.texts: List[str] = []
+        self._folded: List[str] = []
+        self._postings: Dict[str, _Postings] = {}
+        self._lengths = array("f")
+        self._deleted = set()
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self.texts) - len(self._deleted)
+
+    def add(self, texts: Iterable[str]) -> List[int]:
+        """Belgeleri ekler; verilen kimlikleri (sıra numarası) döndürür."""
+        ids = []
+        with self._lock:
+            for text in texts:
+                doc_id = len(self.texts)
+                terms = analyze(text)
+                counts: Dict[str, int] = {}
+                for term in terms:
+                    counts[term] = counts.get(term, 0) + 1
+                for term, count in counts.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = _Postings()
+                    postings.doc_ids.append(doc_id)
+                    postings.freqs.append(count)
+                self.texts.append(text)
+                self._folded.append(fold(text))
+                self._lengths.append(len(terms))
+                self._total_length += len(terms)
+                ids.append(doc_id)
+        return ids
+
+    def remove(self, doc_ids: Iterable[int]):
+        """Belgeleri aramadan çıkarır (listeler yeniden yazılmaz, işaretlenir)."""
+        with self._lock:
+            for doc_id in doc_ids:
+                if 0 <= doc_id < len(self.texts) and doc_id not in self._deleted:
+                    self._deleted.add(doc_id)
+                    self._total_length -= self._lengths[doc_id]
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """En yüksek puanlı k belge: (kimlik, puan) listesi, puan sırasıyla."""
+        terms = list(dict.fromkeys(analyze(query)))
+        with self._lock:
+            n_docs = len(self)
+            if not terms or not n_docs:
+                return []
+            lengths = np.frombuffer(self._lengths, dtype=np.float32)
+            avg_length = max(self._total_length / n_docs, 1.0)
+            scores = np.zeros(len(self.texts), dtype=np.float32)
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                ids = np.frombuffer(postings.doc_ids, dtype=np.int32)
+                tf = np.frombuffer(postings.freqs, dtype=np.float32)
+                df = len(ids)
+                idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * lengths[ids] / avg_length)
+                # Bir terim belgede en fazla bir kez listelenir; doğrudan toplanabilir
+                scores[ids] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+            if self._deleted:
+                scores[list(self._deleted)] = 0.0
+
+            candidates = np.flatnonzero(scores)
+            if not len(candidates):
+                return []
+            # Tam sıralama yerine kısmi seçim: yalnızca en iyi adaylar sıralanır
+            top = min(len(candidates), max(k, PHRASE_CANDIDATES))
+            best = candidates[np.argpartition(-scores[candidates], top - 1)[:top]]
+            phrase = fold(query).strip()
+            results = []
+            for doc_id in best:
+                score = float(scores[doc_id])
+                if phrase and phrase in self._folded[doc_id]:
+                    score *= PHRASE_BOOST
+                results.append((int(doc_id), score))
+        results.sort(key=lambda r: -r[1])
+        return results[:k]
+
+    def search_texts(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """search() sonucunu (metin, puan) olarak döndürür."""
+        return [(self.texts[doc_id], score) for doc_id, score in self.search(query, k)]
@@ -0,0 +1,139 @@
+"""
+Çoklu Dosya Map-Reduce Soru-Cevap
+
+Dalgıç sekmesi 30 dosyaya kadar yüklemeyi kabul ediyor, ama tüm dosyalar
+tek bir dev prompt'a sığdırılmaya çalışılıyordu; bütçeyi aşan kısım
+düşüyor, tek istek de yavaş kalıyordu. Burada:
+- map: her belge (uzunsa bölümleri) için ayrı bir bulgu çıkarma prompt'u
+  eşzamanlı çalışır; bulgular dosya adı + bölüm etiketiyle döner
+- reduce: soru, tüm bölümlerin bulgularıyla tek prompt'ta cevaplanır;
+  cevaptaki her bilgi kaynak dosyaya atıf yapar
+Map prompt'u sorudan bağımsızdır: bulgular bir kez çıkarılır, sonraki
+sorularda yalnızca reduce çalışır. Sonuçlar yanıt önbelleğine de yazıldığı
+için aynı dosyalar yeniden yüklendiğinde map istekleri tekrar gönderilmez.
+"""
+
+import os
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from ai_executor import run_parallel
+from ai_gateway import generate_text
+from context_packer import chunk_section, count_tokens, pack_context
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+MAP_CHUNK_TOKENS = int(os.environ.get("AI_MAP_CHUNK_TOKENS", "30000"))     # Map isteği başına en fazla metin
+
+
+class MapTask:
+    """Bir map isteğinin girdisi: dosyanın bir bölümü"""
+
+    def __init__(self, file_no: int, file: str, part: int, parts: int, text: str):
+        self.file_no = file_no
+        self.file = file
+        self.part = part
+        self.parts = parts
+        self.text = text
+
+    @property
+    def label(self) -> str:
+        """Atıf etiketi: 'dosya.pdf' ya da 'dosya.pdf, bölüm 2/3'"""
+        return self.file if self.parts == 1 else f"{self.file}, bölüm {self.part}/{self.parts}"
+
+
+class MapResult:
+    """Bir bölümün bulguları; başarısızsa notes None, error doludur."""
+
+    def __init__(self, task: MapTask, notes: Optional[str] = None, error: Optional[Exception] = None):
+        self.task = task
+        self.notes = notes
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.notes is not None
+
+
+# ============================================================================
+# MAP
+# ============================================================================
+
+def fits_single_prompt(documents: Sequence[Tuple[str, str]], budget: int = MAP_CHUNK_TOKENS) -> bool:
+    """Tüm dosyalar tek prompt'a sığıyorsa map-reduce gereksizdir."""
+    return sum(count_tokens(text) for _, text in documents) <= budget
+
+
+def split_documents(documents: Sequence[Tuple[str, str]], chunk_tokens: int = MAP_CHUNK_TOKENS) -> List[MapTask]:
+    """(dosya adı, metin) listesini map görevlerine böler (kısa dosya = tek görev)."""
+    tasks = []
+    for file_no, (name, text) in enumerate(documents):
+        parts = chunk_section(text, chunk_tokens) if count_tokens(text) > chunk_tokens else [text]
+        parts = [p for p in parts if p.strip()]
+        for part_no, part in enumerate(parts, start=1):
+            tasks.append(MapTask(file_no, name, part_no, len(parts), part))
+    return tasks
+
+
+def map_prompt(task: MapTask) -> str:
+    return (
+        "GÖREV: Aşağıdaki belge bölümünden hukuken önemli TÜM bulguları çıkar: taraflar, tarihler, "
+        "olaylar, iddia ve savunmalar, tanık / bilirkişi beyanları, deliller, miktarlar, kararlar.\n"
+        "KURALLAR: Her bulguyu tek satırlık madde olarak yaz; belgedeki ifadeye sadık kal, yorum ekleme. "
+        "Önemli beyanları kısa alıntıyla ver. Bulgu yoksa yalnızca 'BULGU YOK' yaz.\n"
+        f"KAYNAK: {task.label}\n"
+        f"METİN:\n{task.text}"
+    )
+
+
+def run_map(tasks: Sequence[MapTask], api_key: str, max_workers: Optional[int] = None,
+            on_result: Optional[Callable[[int, MapResult], None]] = None) -> List[MapResult]:
+    """
+    Map isteklerini eşzamanlı çalıştırır; sonuçlar görev sırasıyla döner.
+    on_result(sıra, sonuç) çağıran iş parçacığında her bölüm bitince çağrılır.
+    """
+    def extract(task):
+        return generate_text(map_prompt(task), api_key)
+
+    def wrap(index, value) -> MapResult:
+        task = tasks[index]
+        if isinstance(value, Exception):
+            return MapResult(task, error=value)
+        if value is None:
+            return MapResult(task, error=RuntimeError("AI yanıt veremedi"))
+        return MapResult(task, notes=value)
+
+    def finished(index, value):
+        if on_result:
+            on_result(index, wrap(index, value))
+
+    values = run_parallel(extract, list(tasks), max_workers, on_result=finished)
+    return [wrap(i, v) for i, v in enumerate(values)]
+
+
+# ============================================================================
+# REDUCE
+# ============================================================================
+
+def reduce_prompt(question: str, results: Sequence[MapResult], budget: int):
+    """
+    Bulguları soruya göre bütçeye sığdırıp reduce prompt'unu kurar.
+    (prompt, paketleme sonucu) döner; paketleme kırpıldıysa çağıran bildirebilir.
+    """
+    notes = [{"title": r.task.label, "text": r.notes} for r in results if r.ok]
+    packed = pack_context(notes, budget, query=question)
+    missing = [r.task.label for r in results if not r.ok]
+    missing_note = f"\nOKUNAMAYAN BÖLÜMLER: {', '.join(missing)}" if missing else ""
+    prompt = (
+        "GÖREV: Aşağıda birden fazla dosyadan bölüm bölüm çıkarılmış bulgular var. "
+        "Soruyu yalnızca bu bulgulara dayanarak cevapla.\n"
+        "KURALLAR:\n"
+        "1. Her bilginin sonunda kaynağını köşeli parantezle belirt (Örn: [tanik_ifadesi.pdf, bölüm 2/3]).\n"
+        "2. Farklı dosyalardaki bulguları birleştir; dosyalar arasında çelişki varsa ayrıca belirt.\n"
+        "3. Bulgularda yoksa 'Dosyalarda bu bilgiye rastlanmadı' de."
+        f"{missing_note}\n"
+        f"SORU: {question}\n"
+        f"BULGULAR:\n{packed.text}"
+    )
+    return prompt, packed
@@ -1,41 +1,26 @@
 import streamlit as st
 import google.generativeai as genai
 import re
-import difflib
 from PyPDF2 import PdfReader
+from lexical_index import BM25Index
 import numpy as np
 
 # Sayfa Ayarları
 st.set_page_config(page_title="Mevzuat Analiz Sistemi", layout="wide", page_icon="⚖️")
 
 # --- GELİŞMİŞ ARAMA MOTORU (STANDART KÜTÜPHANE İLE) ---
-def akilli_ara(sorgu, mevzuat_listesi, limit=5):
-    sorgu = sorgu.lower().strip()
-    sonuclar = []
-    
-    for madde in mevzuat_listesi:
-        skor = 0
-        madde_lower = madde.lower()
-        
-        # 1. Tam Eşleşme (En yüksek puan)
-        if sorgu in madde_lower:
-            skor += 100
-        
-        # 2. Kelime Bazlı Eşleşme
-        sorgu_kelimeleri = sorgu.split()
-        eslesen_kelime_sayisi = sum(1 for k in sorgu_kelimeleri if k in madde_lower)
-        skor += (eslesen_kelime_sayisi * 20)
-        
-        # 3. Benzerlik (Fuzzy) Skoru (difflib ile - Kurulum gerektirmez)
-        # Maddenin ilk 200 karakteriyle sorgu arasındaki benzerliğe bakar
-        benzerlik = difflib.SequenceMatcher(None, sorgu, madde_lower[:200]).ratio()
-        skor += (benzerlik * 50)
-        
-        if skor > 10: # Belirli bir eşiğin üzerindekileri getir
-            sonuclar.append((madde, skor))
-    
-    # Skorlara göre sırala
-    return sorted(sonuclar, key=lambda x: x[1], reverse=True)[:limit]
+def akilli_ara(sorgu, dizin, limit=5):
+    """BM25 ters dizininde arar; (madde, skor) listesi döner.
+    Yalnızca sorgu terimlerinin geçtiği maddeler puanlanır (tüm liste gezilmez)."""
+    return dizin.search_texts(sorgu, limit)
+
+def arama_dizini():
+    """Oturumun sözcüksel dizini; madde listesiyle uyuşmuyorsa (ilk açılış, temizleme) yeniden kurulur."""
+    dizin = st.session_state.get("mevzuat_dizini")
+    if dizin is None or len(dizin.texts) != len(st.session_state.mevzuat_verisi):
+        dizin = BM25Index(st.session_state.mevzuat_verisi)
+        st.session_state.mevzuat_dizini = dizin
+    return dizin
 
 # --- VERİ YÖNETİMİ ---
 if 'mevzuat_verisi' not in st.session_state:
@@ -55,13 +40,18 @@ with st.sidebar:
     st.subheader("📂 Mevzuat Ekle")
     uploaded_file = st.file_uploader("PDF Yükle", type="pdf")
     
-    if uploaded_file:
+    # Aynı dosya her yeniden çizimde tekrar eklenmez
+    dosya_anahtari = f"{uploaded_file.name}:{uploaded_file.size}" if uploaded_file else None
+    if uploaded_file and dosya_anahtari not in st.session_state.setdefault("yuklenen_dosyalar", set()):
+        st.session_state.yuklenen_dosyalar.add(dosya_anahtari)
         reader = PdfReader(uploaded_file)
         yeni_metin = ""
         for page in reader.pages:
             yeni_metin += page.extract_text() + "\n"
         # Paragraf bazlı bölme (Noktadan sonra yeni satır olan yerler)
         paragraflar = [p.strip() for p in yeni_metin.split('\n') if len(p.strip()) > 40]
+        # Dizin artımlı güncellenir: yalnızca yeni paragraflar çözümlenir
+        arama_dizini().add(paragraflar)
         st.session_state.mevzuat_verisi.extend(paragraflar)
         st.success(f"Sisteme {len(paragraflar)} yeni madde eklendi!")
 
@@ -70,7 +60,7 @@ with st.sidebar:
     hizli_sorgu = st.text_input("Anahtar kelimeler (Örn: gübre ceza yetki)")
     
     if hizli_sorgu:
-        bulunanlar = akilli_ara(hizli_sorgu, st.session_state.mevzuat_verisi)
+        bulunanlar = akilli_ara(hizli_sorgu, arama_dizini())
         if bulunanlar:
             for metin, skor in bulunanlar:
                 # Vurgulama
@@ -97,7 +87,7 @@ else:
     
     if st.button("Analiz Et"):
         # En alakalı 10 maddeyi AI'ya gönder
-        en_alakali = akilli_ara(soru, st.session_state.mevzuat_verisi, limit=10)
+        en_alakali = akilli_ara(soru, arama_dizini(), limit=10)
         baglam = "\n".join([m[0] for m in en_alakali])
         
         model = genai.GenerativeModel('gemini-2.5-flash')
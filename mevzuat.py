@@ -4,6 +4,11 @@ import numpy as np
 import faiss
 import re
 from PyPDF2 import PdfReader
+from embedding_service import embed_texts, embed_query
+from gemini_client import gemini_model
+from vector_index import IncrementalIndex
+from lexical_index import BM25Index
+from hybrid_retrieval import LEXICAL, VECTOR, hybrid_search, prepared_retriever
 
 # Sayfa Yapılandırması
 st.set_page_config(page_title="Mevzuat Pro AI", page_icon="⚖️", layout="wide")
@@ -17,12 +22,49 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- SESSION STATE (Veri Saklama) ---
+VARSAYILAN_MEVZUAT = [
+    "Tarımda Kullanılan Gübrelerin Piyasa Gözetimi Yönetmeliği Madde 15: Denetimler Bakanlıkça yetkilendirilen personel tarafından yapılır.",
+    "Gübre Yönetmeliği Madde 41: İdari para cezaları 5996 sayılı Kanun hükümlerine göre Valilikler veya Bakanlık merkez teşkilatı tarafından uygulanır.",
+    "5996 Sayılı Kanun Madde 41: Teknik düzenlemelere aykırı ürün arz edenlere 20.000 TL'den başlayan idari para cezası verilir."
+]
+
 if 'mevzuat_listesi' not in st.session_state:
-    st.session_state.mevzuat_listesi = [
-        "Tarımda Kullanılan Gübrelerin Piyasa Gözetimi Yönetmeliği Madde 15: Denetimler Bakanlıkça yetkilendirilen personel tarafından yapılır.",
-        "Gübre Yönetmeliği Madde 41: İdari para cezaları 5996 sayılı Kanun hükümlerine göre Valilikler veya Bakanlık merkez teşkilatı tarafından uygulanır.",
-        "5996 Sayılı Kanun Madde 41: Teknik düzenlemelere aykırı ürün arz edenlere 20.000 TL'den başlayan idari para cezası verilir."
-    ]
+    st.session_state.mevzuat_listesi = list(VARSAYILAN_MEVZUAT)
+    # Vektör dizini artımlı tutulur: satırlar eklenirken bir kez vektörlenir
+    st.session_state.mevzuat_dizin = IncrementalIndex()
+    # Birebir atıflar ("5996 m.41") için sözcüksel dizin; API anahtarı gerektirmez
+    st.session_state.mevzuat_sozcuk = BM25Index(VARSAYILAN_MEVZUAT)
+    # Henüz vektörlenmemiş satırlar, geldikleri dosyaya göre ("" = varsayılan maddeler)
+    st.session_state.mevzuat_bekleyen = {"": list(VARSAYILAN_MEVZUAT)}
+    st.session_state.mevzuat_dosyalar = {}                           # Dosya -> (vektör, sözcük) kimlikleri
+    st.session_state.mevzuat_yukleyici = 0                           # Temizlenince yükleme alanı da sıfırlanır
+
+def dizine_ekle(satirlar, api_key):
+    """Satırları vektörleyip dizine ekler (diskte önbellekli); kimlikleri döndürür."""
+    if not satirlar:
+        return []
+    bar = st.progress(0.0)
+    vektorler = embed_texts(satirlar, api_key, on_progress=lambda done, total: bar.progress(done / total))
+    bar.empty()
+    return st.session_state.mevzuat_dizin.add(satirlar, vektorler)
+
+def bekleyenleri_isle(api_key):
+    """
+    API anahtarı girilmeden önce eklenen satırları dizine alır; dönen kimlikler
+    dosyasının kaydına yazılır (temizlenince bu vektörler de çıkarılır).
+    """
+    bekleyen = st.session_state.mevzuat_bekleyen
+    if not bekleyen or not api_key:
+        return
+    anahtarlar = list(bekleyen)
+    kimlikler = dizine_ekle([satir for a in anahtarlar for satir in bekleyen[a]], api_key)
+    baslangic = 0
+    for anahtar in anahtarlar:
+        adet = len(bekleyen[anahtar])
+        if anahtar in st.session_state.mevzuat_dosyalar:
+            st.session_state.mevzuat_dosyalar[anahtar][0].extend(kimlikler[baslangic:baslangic + adet])
+        baslangic += adet
+    st.session_state.mevzuat_bekleyen = {}
 
 # --- YAN MENÜ (Sidebar) ---
 with st.sidebar:
@@ -33,8 +75,11 @@ with st.sidebar:
     
     # Dosya Yükleme
     st.subheader("📂 Belge Yükle")
-    uploaded_file = st.file_uploader("PDF Mevzuat Yükle", type="pdf")
-    if uploaded_file:
+    uploaded_file = st.file_uploader("PDF Mevzuat Yükle", type="pdf",
+                                     key=f"mevzuat_pdf_{st.session_state.mevzuat_yukleyici}")
+    # Aynı dosya her yeniden çizimde tekrar eklenmez
+    dosya_anahtari = f"{uploaded_file.name}:{uploaded_file.size}" if uploaded_file else None
+    if uploaded_file and dosya_anahtari not in st.session_state.mevzuat_dosyalar:
         reader = PdfReader(uploaded_file)
         text_content = ""
         for page in reader.pages:
@@ -42,8 +87,34 @@ with st.sidebar:
         # Metni maddelere bölme simülasyonu (noktaya göre)
         new_maddeler = [m.strip() for m in text_content.split('\n') if len(m) > 20]
         st.session_state.mevzuat_listesi.extend(new_maddeler)
+        sozcuk_kimlikleri = st.session_state.mevzuat_sozcuk.add(new_maddeler)
+        kimlikler = []
+        if api_key:
+            try:
+                with st.spinner("Yeni satırlar vektörleniyor..."):
+                    kimlikler = dizine_ekle(new_maddeler, api_key)
+            except Exception as e:
+                st.warning(f"Vektörleme yapılamadı, soru sorulurken tekrar denenecek: {e}")
+                st.session_state.mevzuat_bekleyen[dosya_anahtari] = new_maddeler
+        else:
+            st.session_state.mevzuat_bekleyen[dosya_anahtari] = new_maddeler
+        st.session_state.mevzuat_dosyalar[dosya_anahtari] = (kimlikler, sozcuk_kimlikleri)
         st.success(f"{len(new_maddeler)} yeni satır eklendi!")
 
+    st.caption(f"Dizindeki madde: {len(st.session_state.mevzuat_dizin)} · "
+               f"Bekleyen: {sum(len(s) for s in st.session_state.mevzuat_bekleyen.values())}")
+    if st.button("🗑️ Yüklenen Belgeleri Temizle"):
+        # Yalnızca yüklenen satırların vektörleri çıkarılır; varsayılan maddeler kalır
+        for kimlikler, sozcuk_kimlikleri in st.session_state.mevzuat_dosyalar.values():
+            st.session_state.mevzuat_dizin.remove(kimlikler)
+            st.session_state.mevzuat_sozcuk.remove(sozcuk_kimlikleri)
+        st.session_state.mevzuat_dosyalar = {}
+        st.session_state.mevzuat_listesi = list(VARSAYILAN_MEVZUAT)
+        st.session_state.mevzuat_bekleyen = {a: s for a, s in st.session_state.mevzuat_bekleyen.items() if a == ""}
+        # Yükleme alanındaki dosya bir sonraki çizimde yeniden eklenmesin
+        st.session_state.mevzuat_yukleyici += 1
+        st.rerun()
+
     st.divider()
 
     # DİREKT KAVRAM ARAMA (İstediğin Özellik)
@@ -69,8 +140,6 @@ st.info("Gemini 2.5 Flash ile hızlı analiz modundasınız.")
 if not api_key:
     st.warning("Lütfen sol menüden API anahtarınızı girerek sistemi aktif edin.")
 else:
-    genai.configure(api_key=api_key)
-    
     # Soru Sorma Alanı
     query = st.text_input("🤖 Yapay Zekaya Sorun", placeholder="Örn: Gübre denetiminde yetki kimde ve cezası ne kadar?")
 
@@ -78,23 +147,33 @@ else:
         col1, col2 = st.columns([2, 1])
         
         with col1:
+            ilgili_maddeler = []
             with st.spinner("Mevzuat taranıyor ve analiz ediliyor..."):
                 try:
-                    # 1. Embedding ve FAISS (Hızlı Arama)
-                    def get_emb(text):
-                        return genai.embed_content(model="models/embedding-001", content=text, task_type="retrieval_query")['embedding']
+                    # 1. Hibrit Arama: FAISS (anlam) + BM25 (birebir ifade) aynı anda
+                    # Maddeler eklenirken vektörlendi; burada yalnızca soru vektöre çevrilir
+                    bekleyenleri_isle(api_key)
+                    vektor_dizini = st.session_state.mevzuat_dizin
+                    sozcuk_dizini = st.session_state.mevzuat_sozcuk
+
+                    def vektor_ara(sorgu_vektoru, adet):
+                        return [(metin, metin, mesafe) for _, metin, mesafe
+                                in vektor_dizini.search(sorgu_vektoru, k=adet)]
 
-                    embeddings = [get_emb(m) for m in st.session_state.mevzuat_listesi[:50]] # Hız için ilk 50 madde
-                    index = faiss.IndexFlatL2(len(embeddings[0]))
-                    index.add(np.array(embeddings).astype('float32'))
+                    def sozcuk_ara(sorgu, adet):
+                        return [(metin, metin, puan) for metin, puan in sozcuk_dizini.search_texts(sorgu, adet)]
 
-                    query_vec = np.array([get_emb(query)]).astype('float32')
-                    D, I = index.search(query_vec, k=3)
+                    # Soru embedding'i (ağ çağrısı) arama bütçesinden önce alınır
+                    vektor = prepared_retriever(lambda: embed_query(query, api_key), vektor_ara)
+                    sonuclar = hybrid_search(query, {LEXICAL: sozcuk_ara, VECTOR: vektor}, k=3)
+                    for ad, sebep in sonuclar.skipped.items():
+                        st.caption(f"⚠️ {ad} araması atlandı: {sebep}")
+                    ilgili_maddeler = [(hit.text, hit.provenance()) for hit in sonuclar]
                     
-                    context = "\n".join([st.session_state.mevzuat_listesi[i] for i in I[0]])
+                    context = "\n".join(metin for metin, _ in ilgili_maddeler)
 
                     # 2. Gemini Analizi
-                    model = genai.GenerativeModel('gemini-2.5-flash')
+                    model = gemini_model(api_key, 'gemini-2.5-flash')
                     prompt = f"""
                     Aşağıdaki mevzuat metinlerine dayanarak soruyu cevapla. 
                     Eksik bilgi varsa 'Mevzuatta bulunamadı' de.
@@ -113,8 +192,8 @@ else:
 
         with col2:
             st.subheader("📌 İlgili Maddeler")
-            for i in I[0]:
-                st.caption(f"• {st.session_state.mevzuat_listesi[i]}")
+            for madde, kaynak in ilgili_maddeler:
+                st.caption(f"• {madde}  \n_🔎 {kaynak}_")
 
 # Karşılaştırma ve Analiz Butonları
 st.divider()
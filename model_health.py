@@ -0,0 +1,190 @@
+"""
+Model Sağlık Hafızası (Devre Kesici)
+
+Yedek model zincirindeki her model için hataları hatırlar:
+- Bulunamadı (404 / emekliye ayrılmış model) → uzun bekleme
+- Yetki (401 / 403) → orta bekleme
+- Kota (429) → kısa bekleme
+- Diğer hatalar → arka arkaya birkaç hatadan sonra kısa bekleme
+Bekleme süresince model atlanır, süre dolunca bir deneme hakkı verilir
+(yarı-açık). En son çalışan model sıranın başına alınır.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+COOLDOWNS = {
+    "not_found": 6 * 3600,
+    "permission": 3600,
+    "quota": 60,
+    "error": 30,
+}
+ERROR_THRESHOLD = 3     # Sınıflandırılamayan hatada devrenin açılması için ardışık hata sayısı
+
+
+def _key_id(api_key: str) -> str:
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def classify_error(exc: Exception) -> str:
+    """Hatayı not_found / permission / quota / error olarak sınıflandırır."""
+    if google_exceptions is not None:
+        if isinstance(exc, google_exceptions.NotFound):
+            return "not_found"
+        if isinstance(exc, (google_exceptions.PermissionDenied, google_exceptions.Unauthenticated)):
+            return "permission"
+        if isinstance(exc, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+            return "quota"
+    # Mesaj metnine bakılmaz: içinde "404" / "not found" geçen her hata 6 saatlik devre açmasın
+    code = getattr(exc, "code", None)
+    if callable(code):
+        code = None
+    code = code if isinstance(code, int) else getattr(exc, "status_code", None)
+    if code == 404:
+        return "not_found"
+    if code in (401, 403):
+        return "permission"
+    if code == 429:
+        return "quota"
+    return "error"
+
+
+# ============================================================================
+# DEVRE KESİCİ
+# ============================================================================
+
+class ModelHealth:
+    """API anahtarı + model başına devre kesici ve son çalışan model hafızası"""
+
+    def __init__(self, cooldowns: Optional[Dict[str, int]] = None, error_threshold: int = ERROR_THRESHOLD):
+        self.cooldowns = dict(COOLDOWNS, **(cooldowns or {}))
+        self.error_threshold = error_threshold
+        self._circuits: Dict[tuple, Dict] = {}
+        self._last_ok: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, kid: str, model_name: str) -> Dict:
+        key = (kid, model_name)
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            circuit = {"state": "closed", "failures": 0, "open_until": 0.0,
+                       "last_error": "", "last_kind": "", "successes": 0, "trial": False}
+            self._circuits[key] = circuit
+        return circuit
+
+    def allow(self, api_key: str, model_name: str) -> bool:
+        """Model şu an denenebilir mi? Bekleme bittiyse tek deneme hakkı verir."""
+        with self._lock:
+            circuit = self._circuit(_key_id(api_key), model_name)
+            if circuit["state"] == "closed":
+                return True
+            if circuit["state"] == "open" and time.time() >= circuit["open_until"]:
+                circuit["state"] = "half_open"
+                circuit["trial"] = False
+            if circuit["state"] == "half_open" and not circuit["trial"]:
+                circuit["trial"] = True
+                return True
+            return False
+
+    def release_trial(self, api_key: str, model_name: str):
+        """Sonuçsuz kalan yarı-açık denemeyi (ör. bütçe hatası) geri verir."""
+        with self._lock:
+            circuit = self._circuits.get((_key_id(api_key), model_name))
+            if circuit is not None:
+                circuit["trial"] = False
+
+    def record_success(self, api_key: str, model_name: str):
+        kid = _key_id(api_key)
+        with self._lock:
+            circuit = self._circuit(kid, model_name)
+            circuit.update(state="closed", failures=0, open_until=0.0, trial=False)
+            circuit["successes"] += 1
+            self._last_ok[kid] = model_name
+
+    def record_failure(self, api_key: str, model_name: str, exc: Exception):
+        kind = classify_error(exc)
+        kid = _key_id(api_key)
+        with self._lock:
+            circuit = self._circuit(kid, model_name)
+            circuit["failures"] += 1
+            circuit["last_error"] = str(exc)[:200]
+            circuit["last_kind"] = kind
+            circuit["trial"] = False
+            if kind != "error" or circuit["failures"] >= self.error_threshold or circuit["state"] == "half_open":
+                circuit["state"] = "open"
+                circuit["open_until"] = time.time() + self.cooldowns[kind]
+            if self._last_ok.get(kid) == model_name:
+                self._last_ok.pop(kid, None)
+
+    def order(self, api_key: str, candidates: List[str]) -> List[str]:
+        """
+        Son çalışan modeli başa alır, devresi açık modelleri sona iter.
+        Hiçbir model kapalı değilse yine de sırayı döndürür (hiç denememekten iyidir).
+        """
+        kid = _key_id(api_key)
+        now = time.time()
+        with self._lock:
+            last_ok = self._last_ok.get(kid)
+            healthy, tripped = [], []
+            for name in candidates:
+                circuit = self._circuits.get((kid, name))
+                if circuit and circuit["state"] == "open" and circuit["open_until"] > now:
+                    tripped.append((circuit["open_until"], name))
+                else:
+                    healthy.append(name)
+        if last_ok in healthy:
+            healthy.remove(last_ok)
+            healthy.insert(0, last_ok)
+        return healthy + [name for _, name in sorted(tripped)]
+
+    def soonest(self, api_key: str, candidates: List[str]) -> Optional[str]:
+        """Devresi en erken açılacak model (adaylar boşsa None)"""
+        kid = _key_id(api_key)
+        with self._lock:
+            timed = [(self._circuits.get((kid, name), {}).get("open_until", 0.0), i, name)
+                     for i, name in enumerate(candidates)]
+        return min(timed)[2] if timed else None
+
+    def reset(self, api_key: Optional[str] = None):
+        with self._lock:
+            if api_key is None:
+                self._circuits.clear()
+                self._last_ok.clear()
+            else:
+                kid = _key_id(api_key)
+                self._circuits = {k: v for k, v in self._circuits.items() if k[0] != kid}
+                self._last_ok.pop(kid, None)
+
+    def snapshot(self) -> List[Dict]:
+        """Teşhis paneli için tüm devrelerin durumu"""
+        now = time.time()
+        with self._lock:
+            rows = []
+            for (kid, name), circuit in self._circuits.items():
+                rows.append({
+                    "anahtar": kid,
+                    "model": name,
+                    "durum": circuit["state"],
+                    "son_calisan": self._last_ok.get(kid) == name,
+                    "hata_sayisi": circuit["failures"],
+                    "basari_sayisi": circuit["successes"],
+                    "hata_turu": circuit["last_kind"],
+                    "kalan_bekleme_sn": max(0, int(circuit["open_until"] - now)) if circuit["state"] == "open" else 0,
+                    "son_hata": circuit["last_error"],
+                })
+            return rows
+
+
+# Süreç genelinde paylaşılan sağlık hafızası
+model_health = ModelHealth()
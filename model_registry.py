@@ -0,0 +1,182 @@
+"""
+Gemini Model Kayıt Defteri
+
+Her API anahtarı için `genai.list_models()` çağrısını bir kez yapar,
+sonucu TTL ile süreç genelinde saklar ve modellerin metin / görsel / ses /
+embedding desteğini kaydeder. Tüm modüller model seçimini buradaki
+`pick_best_model` üzerinden yapar; böylece her butona basışta ekstra bir
+ağ gidiş-dönüşü yaşanmaz.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from gemini_client import get_client
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+MODEL_LIST_TTL = 3600        # Başarılı listeleme kaç saniye geçerli
+FAILED_LIST_TTL = 60         # Listeleme hatasında yedek liste kaç saniye kullanılsın
+
+CAPABILITIES = ("text", "vision", "audio", "embed", "cache")
+
+# Bilinen iyi modeller (öncelik sırasıyla)
+PREFERRED_MODELS = [
+    "models/gemini-1.5-flash",
+    "models/gemini-1.5-pro",
+    "models/gemini-1.5-flash-latest",
+    "models/gemini-1.0-pro",
+    "models/gemini-pro",
+]
+
+# Listeleme yapılamazsa kullanılacak yedek liste
+FALLBACK_MODELS = [
+    {"name": "models/gemini-1.5-flash", "text": True, "vision": True, "audio": True, "embed": False, "cache": False},
+    {"name": "models/gemini-1.5-pro", "text": True, "vision": True, "audio": True, "embed": False, "cache": False},
+    {"name": "models/gemini-pro", "text": True, "vision": False, "audio": False, "embed": False, "cache": False},
+    {"name": "models/text-embedding-004", "text": False, "vision": False, "audio": False, "embed": True, "cache": False},
+]
+
+# İsminde bunlar geçen modeller görsel ve ses girdisini kabul eder
+MULTIMODAL_TAGS = ("1.5", "2.0", "2.5", "flash", "gemini-exp")
+
+
+def _key_id(api_key: str) -> str:
+    """API anahtarını bellekte düz metin tutmamak için özetler."""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _describe_model(m) -> Dict:
+    """genai model nesnesinden yetenek sözlüğü üretir."""
+    name = m.name
+    lname = name.lower()
+    methods = list(getattr(m, "supported_generation_methods", None) or [])
+    generates = "generateContent" in methods
+    multimodal = any(tag in lname for tag in MULTIMODAL_TAGS)
+    return {
+        "name": name,
+        "text": generates and "vision" not in lname,
+        "vision": generates and (multimodal or "vision" in lname),
+        "audio": generates and multimodal,
+        "embed": "embedContent" in methods,
+        "cache": "createCachedContent" in methods,   # Sunucu tarafı bağlam önbelleği
+    }
+
+
+def _rank(name: str) -> Tuple[int, int]:
+    """Küçük değer = daha öncelikli. (Hız > Kalite sıralaması)"""
+    lname = name.lower()
+    if "gemini" not in lname:
+        group = 3
+    elif "flash" in lname:
+        group = 0
+    elif "pro" in lname:
+        group = 1
+    else:
+        group = 2
+    known = PREFERRED_MODELS.index(name) if name in PREFERRED_MODELS else len(PREFERRED_MODELS)
+    return group, known
+
+
+# ============================================================================
+# KAYIT DEFTERİ
+# ============================================================================
+
+class ModelRegistry:
+    """API anahtarı başına model listesini önbellekleyen kayıt defteri"""
+
+    def __init__(self, ttl: int = MODEL_LIST_TTL, failed_ttl: int = FAILED_LIST_TTL):
+        self.ttl = ttl
+        self.failed_ttl = failed_ttl
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def _fetch(self, api_key: str) -> Optional[List[Dict]]:
+        """Modelleri API'den çeker. Hata olursa None döner."""
+        try:
+            return [_describe_model(m) for m in get_client(api_key).list_models()]
+        except Exception:
+            return None
+
+    def get_models(self, api_key: str) -> List[Dict]:
+        """Anahtarın erişebildiği modelleri (önbellekten) döndürür."""
+        kid = _key_id(api_key)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(kid, threading.Lock())
+
+        # Aynı anahtar için eşzamanlı istekler tek listeleme çağrısını bekler
+        with key_lock:
+            entry = self._entries.get(kid)
+            if entry and entry["expires"] > time.time():
+                return entry["models"]
+
+            models = self._fetch(api_key)
+            now = time.time()
+            if models:
+                entry = {"models": models, "expires": now + self.ttl, "fallback": False}
+            else:
+                models = [dict(m) for m in FALLBACK_MODELS]
+                entry = {"models": models, "expires": now + self.failed_ttl, "fallback": True}
+            with self._lock:
+                self._entries[kid] = entry
+            return models
+
+    def candidates(self, api_key: str, capability: str = "text") -> List[str]:
+        """İstenen yeteneği destekleyen modelleri öncelik sırasıyla döndürür."""
+        if capability not in CAPABILITIES:
+            raise ValueError(f"Bilinmeyen yetenek: {capability}")
+        names = [m["name"] for m in self.get_models(api_key) if m.get(capability)]
+        return sorted(names, key=_rank)
+
+    def pick_best_model(self, api_key: str, capability: str = "text") -> str:
+        """Yeteneğe göre en uygun modeli seçer."""
+        names = self.candidates(api_key, capability)
+        if names:
+            return names[0]
+        return "models/text-embedding-004" if capability == "embed" else "models/gemini-1.5-flash"
+
+    def has_live_list(self, api_key: str) -> bool:
+        """Anahtar için API'den gerçek (yedek olmayan) liste alınmış mı?"""
+        entry = self._entries.get(_key_id(api_key))
+        return bool(entry) and not entry["fallback"] and entry["expires"] > time.time()
+
+    def invalidate(self, api_key: Optional[str] = None):
+        """Önbelleği temizler (anahtar verilmezse tamamını)."""
+        with self._lock:
+            if api_key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(_key_id(api_key), None)
+
+    def stats(self) -> List[Dict]:
+        """Teşhis paneli için önbellek durumunu döndürür."""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "anahtar": kid,
+                    "model_sayisi": len(entry["models"]),
+                    "yedek_liste": entry["fallback"],
+                    "kalan_sure_sn": max(0, int(entry["expires"] - now)),
+                }
+                for kid, entry in self._entries.items()
+            ]
+
+
+# Süreç genelinde tek kayıt defteri (Streamlit oturumları arasında paylaşılır)
+registry = ModelRegistry()
+
+
+def pick_best_model(api_key: str, capability: str = "text") -> str:
+    """Paylaşılan kayıt defterinden en uygun modeli seçer."""
+    return registry.pick_best_model(api_key, capability)
+
+
+def model_candidates(api_key: str, capability: str = "text") -> List[str]:
+    """Paylaşılan kayıt defterinden aday modelleri sıralı döndürür."""
+    return registry.candidates(api_key, capability)
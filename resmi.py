@@ -31,6 +31,8 @@ from collections import Counter
 import plotly.express as px
 import plotly.graph_objects as go
 
+from keyword_matcher import get_matcher
+
 # ============================================================================
 # SAYFA YAPILANDIRMASI
 # ============================================================================
@@ -428,14 +430,8 @@ class ResmiGazeteScraper:
     
     def extract_keywords(self, text: str) -> List[str]:
         """Metinden anahtar kelimeleri cikar"""
-        text_lower = text.lower()
-        found_keywords = []
-        
-        for keyword in self.IMPORTANT_KEYWORDS:
-            if keyword in text_lower:
-                found_keywords.append(keyword)
-        
-        return found_keywords
+        # Tum liste tek otomatta, metin tek geciste taranir
+        return get_matcher(self.IMPORTANT_KEYWORDS).matches(text)
 
 
 # ============================================================================
@@ -562,6 +558,8 @@ class NotificationManager:
     def check_notifications(self, items: List[Dict]) -> List[Dict]:
         """Bildirimleri kontrol et"""
         alerts = []
+        # Liste degismedikce ayni derlenmis otomat kullanilir
+        keyword_matcher = get_matcher(self.watched_keywords)
         
         for item in items:
             # Kategori kontrolu
@@ -574,16 +572,16 @@ class NotificationManager:
                 })
             
             # Anahtar kelime kontrolu
-            item_text = f"{item['title']} {item.get('summary', '')}".lower()
-            for keyword in self.watched_keywords:
-                if keyword in item_text:
-                    alerts.append({
-                        "type": "keyword",
-                        "trigger": keyword,
-                        "item": item,
-                        "message": f"Takip ettiginiz kelime bulundu: {keyword}"
-                    })
-                    break
+            item_text = f"{item['title']} {item.get('summary', '')}"
+            found = keyword_matcher.matches(item_text)
+            if found:
+                keyword = found[0]
+                alerts.append({
+                    "type": "keyword",
+                    "trigger": keyword,
+                    "item": item,
+                    "message": f"Takip ettiginiz kelime bulundu: {keyword}"
+                })
         
         return alerts
 
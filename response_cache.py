@@ -0,0 +1,202 @@
+"""
+Kalıcı AI Yanıt Önbelleği
+
+Model adı, prompt ve ekli dosyaların özetinden (SHA-256) oluşan içerik
+adresli anahtarla Gemini yanıtlarını SQLite dosyasında saklar.
+Boyut sınırı aşılınca en uzun süredir kullanılmayan (LRU) kayıtlar silinir,
+her kaydın kendi geçerlilik süresi (TTL) vardır. Aynı dilekçe, rapor veya
+gazete maddesinin tekrar analizi milisaniyeler içinde ve kota harcamadan döner.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from io import BytesIO
+from typing import Dict, List, Optional
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+CACHE_DIR = os.environ.get("HUKUK_CACHE_DIR", "Hukuk_Onbellek")
+RESPONSE_CACHE_FILE = os.path.join(CACHE_DIR, "ai_yanitlari.sqlite")
+RESPONSE_CACHE_MAX_BYTES = 200 * 1024 * 1024   # 200 MB
+RESPONSE_CACHE_TTL = 7 * 24 * 3600             # 7 gün
+
+
+def digest_part(part) -> str:
+    """Prompt parçasının (metin, bayt, dosya, resim) içerik özetini çıkarır."""
+    h = hashlib.sha256()
+    if isinstance(part, str):
+        h.update(b"text:" + part.encode("utf-8"))
+    elif isinstance(part, (bytes, bytearray)):
+        h.update(b"bytes:" + bytes(part))
+    elif isinstance(part, BytesIO):
+        h.update(b"bytes:" + part.getvalue())
+    elif isinstance(part, dict):
+        # {"mime_type": ..., "data": ...} biçimindeki Gemini parçaları
+        data = part.get("data", b"")
+        if isinstance(data, BytesIO):
+            data = data.getvalue()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        h.update(f"blob:{part.get('mime_type', '')}:".encode("utf-8") + bytes(data))
+    elif hasattr(part, "tobytes") and hasattr(part, "size"):
+        # PIL.Image
+        h.update(f"image:{getattr(part, 'mode', '')}:{part.size}:".encode("utf-8") + part.tobytes())
+    else:
+        h.update(b"repr:" + repr(part).encode("utf-8"))
+    return h.hexdigest()
+
+
+def make_cache_key(model_name: str, prompt, attachments: Optional[List] = None) -> str:
+    """Model + prompt + ek dosya özetlerinden önbellek anahtarı üretir."""
+    parts = prompt if isinstance(prompt, (list, tuple)) else [prompt]
+    parts = list(parts) + list(attachments or [])
+    payload = json.dumps(
+        {"model": model_name.replace("models/", ""), "parts": [digest_part(p) for p in parts]},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ============================================================================
+# ÖNBELLEK
+# ============================================================================
+
+class ResponseCache:
+    """SQLite tabanlı, LRU tahliyeli ve TTL destekli yanıt önbelleği"""
+
+    def __init__(self, path: str = RESPONSE_CACHE_FILE,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 default_ttl: int = RESPONSE_CACHE_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    value TEXT,
+                    size INTEGER,
+                    created REAL,
+                    expires REAL,
+                    last_access REAL,
+                    hit_count INTEGER DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        """Geçerli kayıt varsa döndürür ve LRU zamanını günceller."""
+        return self.lookup([key])
+
+    def lookup(self, keys: List[str]) -> Optional[str]:
+        """Anahtarları sırayla dener, ilk geçerli kaydı döndürür (tek isabet/ıskalama sayılır)."""
+        if not keys:
+            return None
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            marks = ",".join("?" * len(keys))
+            rows = {
+                row[0]: row[1:]
+                for row in conn.execute(f"SELECT key, value, expires FROM responses WHERE key IN ({marks})", keys)
+            }
+            for key in keys:
+                if key not in rows:
+                    continue
+                value, expires = rows[key]
+                if expires and expires < now:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    continue
+                conn.execute(
+                    "UPDATE responses SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?",
+                    (now, key),
+                )
+                conn.commit()
+                self.hits += 1
+                return value
+            conn.commit()
+            self.misses += 1
+            return None
+
+    def put(self, key: str, model_name: str, value: str, ttl: Optional[int] = None):
+        """Yanıtı kaydeder, gerekirse eski kayıtları siler."""
+        if not value:
+            return
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, value, size, created, expires, last_access, hit_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, model_name, value, size, now, now + ttl if ttl else None, now),
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Süresi dolanları, sonra boyut sınırını aşan LRU kayıtları siler."""
+        conn.execute("DELETE FROM responses WHERE expires IS NOT NULL AND expires < ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+    def clear(self):
+        """Tüm kayıtları siler."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        """İsabet/ıskalama sayaçları ve doluluk bilgisi"""
+        with self._lock:
+            conn = self._connect()
+            entries, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+        }
+
+
+# Süreç genelinde paylaşılan önbellek
+response_cache = ResponseCache()
@@ -0,0 +1,222 @@
+"""
+Anlamsal Yanıt Önbelleği
+
+"Bana Sor" ve "İçtihat" sekmelerine aynı sorunun farklı ifadeleri sıkça
+gelir ("kiracı tahliye süreci", "kirayı ödemeyen kiracı nasıl çıkarılır").
+Yanıt önbelleği yalnızca birebir aynı prompt'u tanır; burada soru
+embedding'e çevrilir ve önceki soru / cevap çiftleri arasında kosinüs
+benzerliğiyle aranır. Eşik üzerindeki en yakın sorunun cevabı döndürülür.
+- Kayıtlar SQLite'ta, vektörler bellekte normalize matris olarak tutulur
+- Kapsam (sekme) başına ayrı dizin; yaş ve sayı sınırıyla tahliye (LRU)
+- Kapsam API anahtarına özeldir (anahtarın özeti): bir kullanıcının sorusu
+  ve cevabı başka anahtara gösterilmez
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from embedding_service import embed_query
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+CACHE_DIR = os.environ.get("HUKUK_CACHE_DIR", "Hukuk_Onbellek")
+SEMANTIC_CACHE_FILE = os.path.join(CACHE_DIR, "anlamsal_onbellek.sqlite")
+SEMANTIC_THRESHOLD = float(os.environ.get("AI_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_MAX_ENTRIES = int(os.environ.get("AI_SEMANTIC_CACHE_MAX", "2000"))       # Kapsam başına
+SEMANTIC_MAX_AGE = int(os.environ.get("AI_SEMANTIC_CACHE_MAX_DAYS", "30")) * 24 * 3600
+
+
+class SemanticHit:
+    """Önbellekten dönen cevap ve eşleşen önceki soru"""
+
+    def __init__(self, answer: str, question: str, similarity: float, created: float):
+        self.answer = answer
+        self.question = question
+        self.similarity = similarity
+        self.created = created
+
+
+class _ScopeIndex:
+    """Bir kapsamın bellekteki vektör dizini (satır i ↔ ids[i])"""
+
+    def __init__(self, ids: List[int], matrix: np.ndarray):
+        self.ids = ids
+        self.matrix = matrix
+
+
+def _key_id(api_key: str) -> str:
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _owned(scope: str, api_key: str) -> str:
+    """Kayıtlarda tutulan kapsam: anahtarın özeti + sekme ('1a2b...:bana_sor')"""
+    return f"{_key_id(api_key)}:{scope}"
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+
+# ============================================================================
+# ÖNBELLEK
+# ============================================================================
+
+class SemanticCache:
+    """Soru embedding'ine göre benzer önceki cevabı bulan önbellek"""
+
+    def __init__(self, path: str = SEMANTIC_CACHE_FILE, threshold: float = SEMANTIC_THRESHOLD,
+                 max_entries: int = SEMANTIC_MAX_ENTRIES, max_age: int = SEMANTIC_MAX_AGE):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._indexes: Dict[str, _ScopeIndex] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    scope TEXT,
+                    question TEXT,
+                    answer TEXT,
+                    vector BLOB,
+                    created REAL,
+                    last_used REAL,
+                    hits INTEGER DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_scope ON answers(scope, last_used)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _index(self, scope: str) -> _ScopeIndex:
+        """Kapsamın dizinini (gerekirse diskten) yükler; kilit altında çağrılır."""
+        index = self._indexes.get(scope)
+        if index is None:
+            rows = self._connect().execute(
+                "SELECT id, vector FROM answers WHERE scope = ? AND created >= ?",
+                (scope, time.time() - self.max_age)).fetchall()
+            ids = [row[0] for row in rows]
+            if rows:
+                matrix = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            else:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+            index = _ScopeIndex(ids, matrix)
+            self._indexes[scope] = index
+        return index
+
+    def embed(self, question: str, api_key: str) -> Optional[np.ndarray]:
+        """Sorunun normalize vektörü; embedding alınamazsa None (önbellek atlanır)."""
+        try:
+            return _normalize(embed_query(question.strip(), api_key)[0])
+        except Exception:
+            return None
+
+    def lookup(self, scope: str, question: str, api_key: str,
+               vector: Optional[np.ndarray] = None) -> Optional[SemanticHit]:
+        """Eşik üzerindeki en benzer önceki sorunun cevabını döndürür."""
+        if vector is None:
+            vector = self.embed(question, api_key)
+        if vector is None:
+            return None
+        scope = _owned(scope, api_key)
+        with self._lock:
+            index = self._index(scope)
+            if not index.ids or index.matrix.shape[1] != vector.shape[0]:
+                self.misses += 1
+                return None
+            scores = index.matrix @ vector
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+            conn = self._connect()
+            row = conn.execute("SELECT question, answer, created FROM answers WHERE id = ?",
+                               (index.ids[best],)).fetchone()
+            if row is None or row[2] < time.time() - self.max_age:
+                self._indexes.pop(scope, None)
+                self.misses += 1
+                return None
+            conn.execute("UPDATE answers SET last_used = ?, hits = hits + 1 WHERE id = ?",
+                         (time.time(), index.ids[best]))
+            conn.commit()
+            self.hits += 1
+        return SemanticHit(row[1], row[0], similarity, row[2])
+
+    def put(self, scope: str, question: str, answer: str, api_key: str,
+            vector: Optional[np.ndarray] = None):
+        """Soru / cevap çiftini ekler, sonra yaş ve sayı sınırına göre tahliye eder."""
+        if vector is None:
+            vector = self.embed(question, api_key)
+        if vector is None or not answer:
+            return
+        scope = _owned(scope, api_key)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO answers (scope, question, answer, vector, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (scope, question, answer, vector.astype(np.float32).tobytes(), now, now),
+            )
+            conn.execute("DELETE FROM answers WHERE created < ?", (now - self.max_age,))
+            conn.execute("""
+                DELETE FROM answers WHERE scope = ? AND id NOT IN (
+                    SELECT id FROM answers WHERE scope = ? ORDER BY last_used DESC LIMIT ?
+                )
+            """, (scope, scope, self.max_entries))
+            conn.commit()
+            # Dizin bir sonraki aramada diskten yeniden kurulur
+            self._indexes.clear()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def clear(self, scope: Optional[str] = None, api_key: Optional[str] = None):
+        """Kapsamı (anahtar verilirse yalnızca o anahtarınkini) ya da tüm önbelleği siler."""
+        with self._lock:
+            conn = self._connect()
+            if scope and api_key is not None:
+                conn.execute("DELETE FROM answers WHERE scope = ?", (_owned(scope, api_key),))
+            elif scope:
+                conn.execute("DELETE FROM answers WHERE scope LIKE ?", (f"%:{scope}",))
+            else:
+                conn.execute("DELETE FROM answers")
+            conn.commit()
+            self._indexes.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "kayit": self.count(),
+            "isabet": self.hits,
+            "iskalama": self.misses,
+            "oran": round(self.hits / total, 2) if total else 0.0,
+            "esik": self.threshold,
+        }
+
+
+# Süreç genelinde paylaşılan anlamsal önbellek
+semantic_cache = SemanticCache()
@@ -0,0 +1,74 @@
+"""
+Eşzamanlı İstek Birleştirme (Single-Flight)
+
+Birkaç kullanıcı aynı Resmi Gazete maddesini veya emsal bültenini aynı
+anda analiz ettiğinde her tıklama ayrı ve özdeş bir Gemini çağrısı
+başlatıyordu. Burada aynı anahtarlı (model + prompt + ek dosya özeti)
+bir istek sürerken gelen diğer çağıranlar yeni istek atmaz; ilk isteğin
+(lider) sonucunu bekleyip paylaşır. İstek bitince anahtar serbest kalır;
+sonraki çağrılar zaten yanıt önbelleğinden döner.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Tuple
+
+
+class SingleFlight:
+    """Anahtar başına süren tek isteği ve onu bekleyenleri tutar."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def join(self, key: str) -> Tuple[Future, bool]:
+        """
+        Anahtarın süren isteğine katılır. (future, lider_mi) döner; lider
+        isteği kendisi yapmalı ve sonunda mutlaka finish() çağırmalıdır.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.leaders += 1
+            return future, True
+
+    def finish(self, key: str, future: Future, result=None, error: Optional[BaseException] = None):
+        """Liderin sonucunu bekleyenlere iletir ve anahtarı serbest bırakır."""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn: Callable, *args, **kwargs) -> Tuple[object, bool]:
+        """
+        fn(*args, **kwargs) çağrısını anahtar başına tek seferde yapar.
+        (sonuç, paylaşıldı_mı) döner; lider hata aldıysa bekleyenlere de aynı hata yükselir.
+        """
+        future, leader = self.join(key)
+        if not leader:
+            return future.result(), True
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, result)
+        return result, False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {"suren": in_flight, "lider": self.leaders, "birlestirilen": self.coalesced}
+
+
+# Süreç genelinde paylaşılan birleştirici
+single_flight = SingleFlight()
@@ -0,0 +1,283 @@
+"""
+Madde Düzeyinde Mevzuat Dizini
+
+Mevzuat sekmesi "5996 m.41" gibi bir sorguda maddeyi yapay zekaya ezberden
+yazdırıyordu; yavaş ve güvenilmezdi. Burada yüklenen kanun metinleri madde
+başlıklarından (Madde N / Geçici Madde N / Ek Madde N) ve fıkra
+numaralarından ((1), (2) ...) bölünür ve
+
+    (kanun no, madde türü, madde no, fıkra)  →  metin
+
+anahtarıyla SQLite'a yazılır. Tüm dizin ilk kullanımda belleğe alınır;
+bir atıf sözlük aramasıyla (mikrosaniyeler içinde) yerel metinden çözülür.
+Fıkra 0 maddenin tamamıdır. Yapay zeka yalnızca yorum için kullanılır.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from turkish_text import fold
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+CACHE_DIR = os.environ.get("HUKUK_CACHE_DIR", "Hukuk_Onbellek")
+STATUTE_INDEX_FILE = os.path.join(CACHE_DIR, "madde_dizini.sqlite")
+
+ARTICLE = "madde"
+TEMPORARY = "gecici"
+ADDITIONAL = "ek"
+KIND_LABELS = {ARTICLE: "Madde", TEMPORARY: "Geçici Madde", ADDITIONAL: "Ek Madde"}
+
+# Sık kullanılan kanun kısaltmaları → kanun numarası
+LAW_ALIASES = {
+    "tmk": "4721", "tbk": "6098", "ttk": "6102", "hmk": "6100", "tck": "5237",
+    "cmk": "5271", "iik": "2004", "ik": "4857", "iyuk": "2577", "tkhk": "6502",
+}
+# Metin içinde adıyla anılan kanunlar (katlanmış ad kökü → kanun numarası)
+LAW_NAMES = {
+    "turk medeni kanun": "4721", "turk borclar kanun": "6098", "turk ticaret kanun": "6102",
+    "hukuk muhakemeleri kanun": "6100", "turk ceza kanun": "5237", "ceza muhakemesi kanun": "5271",
+    "icra ve iflas kanun": "2004", "idari yargilama usulu kanun": "2577",
+    "tuketicinin korunmasi hakkinda kanun": "6502",
+}
+
+# Satır başındaki madde başlıkları (katlanmış metin üzerinde): "MADDE 41 –", "Geçici Madde 3-";
+# tire şartı "madde 5 hükümleri saklıdır" gibi satır başına denk gelen atıfları ayıklar
+_HEADER_RE = re.compile(r"^[ \t]*(?:(gecici|ek)[ \t]+)?madde[ \t]+(\d+(?:/[a-z])?)[ \t]*\.?[ \t]*[-–—]", re.MULTILINE)
+# Tiresiz başlık kullanan metinler için satır başı deseni
+_LINE_HEADER_RE = re.compile(r"^[ \t]*(?:(gecici|ek)[ \t]+)?madde[ \t]+(\d+(?:/[a-z])?)\b", re.MULTILINE)
+# Satır başı şartı aranmayan yedek desenler (PDF'ten satır sonları kaybolmuşsa)
+_LOOSE_DASH_HEADER_RE = re.compile(r"(?:(gecici|ek)\s+)?madde\s+(\d+(?:/[a-z])?)\s*\.?\s*[-–—]")
+_LOOSE_HEADER_RE = re.compile(r"(?:(gecici|ek)\s+)?madde\s+(\d+(?:/[a-z])?)\b")
+_HEADER_PATTERNS = (_HEADER_RE, _LINE_HEADER_RE, _LOOSE_DASH_HEADER_RE, _LOOSE_HEADER_RE)
+# Fıkra numarası satır başında ya da başlık tiresinden hemen sonra ("MADDE 41 – (1) ...")
+_PARAGRAPH_RE = re.compile(r"(?:^|\n|[-–—])[ \t]*(\((\d+)\))[ \t]")
+_LAW_NO_RE = re.compile(r"kanun\s+numarasi\s*:?\s*(\d{3,5})")
+
+# Sorgu: "5996 m.41", "5996 sayılı kanun madde 41/2", "TMK m. 166 f.1", "5996 geçici madde 3"
+_QUERY_RE = re.compile(
+    r"^\s*(?P<law>\d{3,5}|[a-z]{2,6})\b(?:\s+sayili)?(?:\s+kanun\w*)?[\s,.]*"
+    r"(?:(?P<kind>gecici|ek)\s*)?(?:m|md|madde\w*)\s*\.?\s*(?P<no>\d+(?:/[a-z])?)"
+    r"(?:\s*(?:/|,|f\.?|fikra\w*)\s*(?P<par>\d+))?\s*$"
+)
+# Cümle biçimi: "5996 sayılı Kanunun 41. maddesi", "TMK geçici 3 üncü maddesinin 2 nci fıkrası"
+_QUERY_SENTENCE_RE = re.compile(
+    r"^\s*(?P<law>\d{3,5}|[a-z]{2,6})\b(?:\s+sayili)?(?:\s+kanun\w*)?\s+"
+    r"(?:(?P<kind>gecici|ek)\s+)?(?P<no>\d+(?:/[a-z])?)\s*\.?\s*(?:[a-z]{1,4}\s+)?madde\w*"
+    r"(?:\s+(?P<par>\d+)\s*\.?\s*(?:[a-z]{1,4}\s+)?fikra\w*)?\s*$"
+)
+
+
+def _fold_aligned(text: str) -> str:
+    """Karakter karakter katlar: konumlar orijinal metinle birebir örtüşür."""
+    return "".join((fold(ch) or ch)[0] for ch in text)
+
+
+class ArticleRef:
+    """Bir madde atfı: kanun no, madde türü, madde no, fıkra (0 = tüm madde)"""
+
+    def __init__(self, law_no: str, kind: str, no: str, paragraph: int = 0):
+        self.law_no = law_no
+        self.kind = kind
+        self.no = no
+        self.paragraph = paragraph
+
+    @property
+    def key(self) -> Tuple[str, str, str, int]:
+        return (self.law_no, self.kind, self.no, self.paragraph)
+
+    def __str__(self) -> str:
+        par = f" f.{self.paragraph}" if self.paragraph else ""
+        return f"{self.law_no} s. Kanun {KIND_LABELS[self.kind]} {self.no.upper()}{par}"
+
+
+def parse_reference(query: str) -> Optional[ArticleRef]:
+    """'5996 m.41' biçimindeki atfı çözer; tanınmazsa None."""
+    folded = fold(query or "")
+    match = _QUERY_RE.match(folded) or _QUERY_SENTENCE_RE.match(folded)
+    if not match:
+        return None
+    law = match.group("law")
+    law = LAW_ALIASES.get(law, law)
+    if not law.isdigit():
+        return None
+    kind = {"gecici": TEMPORARY, "ek": ADDITIONAL}.get(match.group("kind"), ARTICLE)
+    return ArticleRef(law, kind, match.group("no"), int(match.group("par") or 0))
+
+
+# ============================================================================
+# AYRIŞTIRMA
+# ============================================================================
+
+def detect_law_number(text: str) -> Optional[str]:
+    """Mevzuat metninin künyesinden ("Kanun Numarası : 5996") kanun numarası"""
+    match = _LAW_NO_RE.search(fold(text[:5000]))
+    return match.group(1) if match else None
+
+
+def detect_title(text: str) -> str:
+    """Metnin ilk dolu satırı (mevzuat PDF'lerinde kanunun adı)"""
+    for line in text[:3000].splitlines():
+        if line.strip():
+            return line.strip()[:200]
+    return ""
+
+
+def split_paragraphs(body: str) -> List[Tuple[int, str]]:
+    """Madde gövdesini numaralı fıkralara böler; numara yoksa boş liste."""
+    marks = list(_PARAGRAPH_RE.finditer(body))
+    paragraphs = []
+    for i, mark in enumerate(marks):
+        end = marks[i + 1].start() if i + 1 < len(marks) else len(body)
+        paragraphs.append((int(mark.group(2)), body[mark.start(1):end].strip()))
+    return paragraphs
+
+
+def split_articles(text: str) -> List[Tuple[str, str, str]]:
+    """
+    Metni (tür, madde no, madde metni) listesine böler. Aynı madde birden
+    fazla kez başlık gibi görünürse büyük harfli "MADDE" başlığı, o da yoksa
+    ilki seçilir; seçilmeyen satır önceki maddenin metninde kalır.
+    """
+    folded = _fold_aligned(text)
+    # En sıkı desenden başlanır; birden fazla başlık bulan ilk desen kullanılır
+    found = [list(pattern.finditer(folded)) for pattern in _HEADER_PATTERNS]
+    marks = next((m for m in found if len(m) > 1), None) or next((m for m in found if m), [])
+    chosen: Dict[Tuple[str, str], re.Match] = {}
+    for mark in marks:
+        key = ({"gecici": TEMPORARY, "ek": ADDITIONAL}.get(mark.group(1), ARTICLE), mark.group(2))
+        if key not in chosen or ("MADDE" in text[mark.start():mark.end()]
+                                 and "MADDE" not in text[chosen[key].start():chosen[key].end()]):
+            chosen[key] = mark
+    headings = sorted(chosen.items(), key=lambda item: item[1].start())
+    articles = []
+    for i, ((kind, no), mark) in enumerate(headings):
+        end = headings[i + 1][1].start() if i + 1 < len(headings) else len(text)
+        articles.append((kind, no, text[mark.start():end].strip()))
+    return articles
+
+
+# ============================================================================
+# DİZİN
+# ============================================================================
+
+class StatuteIndex:
+    """Kalıcı madde / fıkra dizini (SQLite + bellekte sözlük)"""
+
+    def __init__(self, path: str = STATUTE_INDEX_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._entries: Optional[Dict[Tuple[str, str, str, int], str]] = None
+        self._titles: Dict[str, str] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS laws (
+                    law_no TEXT PRIMARY KEY,
+                    title TEXT,
+                    source TEXT,
+                    articles INTEGER,
+                    ingested REAL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    law_no TEXT,
+                    kind TEXT,
+                    no TEXT,
+                    paragraph INTEGER,
+                    text TEXT,
+                    PRIMARY KEY (law_no, kind, no, paragraph)
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _load(self) -> Dict[Tuple[str, str, str, int], str]:
+        """Tüm dizini belleğe alır; kilit altında çağrılır."""
+        if self._entries is None:
+            conn = self._connect()
+            self._entries = {(row[0], row[1], row[2], row[3]): row[4]
+                             for row in conn.execute("SELECT law_no, kind, no, paragraph, text FROM articles")}
+            self._titles = {row[0]: row[1] for row in conn.execute("SELECT law_no, title FROM laws")}
+        return self._entries
+
+    def ingest(self, text: str, law_no: str, title: str = "", source: str = "") -> int:
+        """Kanun metnini maddelere / fıkralara bölüp yazar (aynı kanunun eski kaydı silinir)."""
+        rows = []
+        for kind, no, article in split_articles(text):
+            rows.append((law_no, kind, no, 0, article))
+            rows.extend((law_no, kind, no, par, par_text) for par, par_text in split_paragraphs(article))
+        if not rows:
+            return 0
+        articles = sum(1 for row in rows if row[3] == 0)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM articles WHERE law_no = ?", (law_no,))
+            conn.executemany("INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, ?)", rows)
+            conn.execute("INSERT OR REPLACE INTO laws VALUES (?, ?, ?, ?, ?)",
+                         (law_no, title, source, articles, time.time()))
+            conn.commit()
+            self._entries = None
+        return articles
+
+    def lookup(self, ref: ArticleRef) -> Optional[str]:
+        """Atfın yerel metni; dizinde yoksa None."""
+        with self._lock:
+            return self._load().get(ref.key)
+
+    def title(self, law_no: str) -> str:
+        with self._lock:
+            self._load()
+            return self._titles.get(law_no, "")
+
+    def articles(self, law_no: str) -> List[Tuple[str, str, str]]:
+        """Kanunun maddeleri: (tür, madde no, madde metni) listesi"""
+        with self._lock:
+            return [(key[1], key[2], text) for key, text in self._load().items()
+                    if key[0] == law_no and key[3] == 0]
+
+    def laws(self) -> List[Dict]:
+        """Dizindeki kanunlar (yeniden eskiye)"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT law_no, title, source, articles, ingested FROM laws ORDER BY ingested DESC").fetchall()
+        return [{"kanun_no": r[0], "baslik": r[1], "kaynak": r[2], "madde_sayisi": r[3],
+                 "eklenme": time.strftime("%d.%m.%Y %H:%M", time.localtime(r[4]))} for r in rows]
+
+    def delete(self, law_no: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM articles WHERE law_no = ?", (law_no,))
+            conn.execute("DELETE FROM laws WHERE law_no = ?", (law_no,))
+            conn.commit()
+            self._entries = None
+
+
+# Süreç genelinde paylaşılan madde dizini
+statute_index = StatuteIndex()
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    # Kendi kendine kontrol: başlık satırındaki 1. fıkra da dizine girmeli
+    ornek = StatuteIndex(os.path.join(tempfile.mkdtemp(prefix="madde_dizini_"), "dizin.sqlite"))
+    ornek.ingest("MADDE 41 – (1) Birinci fıkra.\n(2) İkinci fıkra.\nMADDE 42 – (1) Kırk ikinci madde.", "5996")
+    for sorgu in ("5996 m.41/1", "5996 m.41/2", "5996 m.42 f.1"):
+        assert ornek.lookup(parse_reference(sorgu)), f"çözülemedi: {sorgu}"
+    print("madde / fıkra çözümü: tamam")
@@ -0,0 +1,332 @@
+"""
+AI Çağrı Telemetrisi
+
+Her Gemini çağrısı için yapılandırılmış bir olay kaydeder (SQLite):
+modül (sekme / fonksiyon), model, prompt ve ek dosya baytı, giriş / çıkış
+token sayısı, gecikme, ilk parça süresi (TTFT), tekrar deneme ve yedek model
+sayısı, önbellek isabeti ve hata. Yönetim panelindeki telemetri sekmesi
+buradaki özetleri (modül başına p50 / p95 gecikme ve hacim) gösterir.
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+from context_packer import count_tokens
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+CACHE_DIR = os.environ.get("HUKUK_CACHE_DIR", "Hukuk_Onbellek")
+TELEMETRY_FILE = os.path.join(CACHE_DIR, "telemetri.sqlite")
+TELEMETRY_RETENTION = 30 * 24 * 3600     # 30 gün
+TELEMETRY_ENABLED = os.environ.get("AI_TELEMETRY", "1") != "0"
+
+# Modül adı çıkarılırken atlanan (altyapı) dosyaları
+_INFRA_FILES = {
+    "telemetry.py", "ai_gateway.py", "ai_executor.py", "context_cache.py",
+    "embedding_service.py", "gemini_standin.py", "contextlib.py",
+}
+
+_current_module: ContextVar[Optional[str]] = ContextVar("llm_module", default=None)
+
+
+@contextmanager
+def llm_module(name: str):
+    """Bu blok içindeki AI çağrıları verilen modül (sekme) adıyla kaydedilir."""
+    token = _current_module.set(name)
+    try:
+        yield
+    finally:
+        _current_module.reset(token)
+
+
+def current_module() -> str:
+    """Etkin modül adı; tanımlı değilse çağrı yığınındaki ilk uygulama fonksiyonu."""
+    name = _current_module.get()
+    if name:
+        return name
+    stdlib = os.path.dirname(os.__file__)
+    frame = sys._getframe(1)
+    while frame is not None:
+        path = frame.f_code.co_filename
+        base = os.path.basename(path)
+        if base not in _INFRA_FILES and not path.startswith(stdlib) and "site-packages" not in path:
+            return f"{base}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "bilinmiyor"
+
+
+def payload_bytes(parts) -> int:
+    """Prompt / ek parçalarının yaklaşık bayt büyüklüğü"""
+    if parts is None:
+        return 0
+    if isinstance(parts, str):
+        return len(parts.encode("utf-8"))
+    if isinstance(parts, (bytes, bytearray)):
+        return len(parts)
+    if isinstance(parts, BytesIO):
+        return parts.getbuffer().nbytes
+    if isinstance(parts, dict):
+        return payload_bytes(parts.get("data"))
+    if isinstance(parts, (list, tuple)):
+        return sum(payload_bytes(p) for p in parts)
+    if hasattr(parts, "size") and hasattr(parts, "mode"):
+        # PIL.Image: sıkıştırılmamış boyut
+        width, height = parts.size
+        return width * height * max(1, len(parts.mode))
+    return 0
+
+
+def _text_parts(parts) -> str:
+    if isinstance(parts, str):
+        return parts
+    if isinstance(parts, (list, tuple)):
+        return "\n".join(p for p in parts if isinstance(p, str))
+    return ""
+
+
+def usage_tokens(response) -> Tuple[Optional[int], Optional[int]]:
+    """Yanıttaki usage_metadata'dan (giriş, çıkış) token sayıları"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None, None
+    return getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None)
+
+
+# ============================================================================
+# DEPO
+# ============================================================================
+
+class TelemetryStore:
+    """Olayları SQLite'a yazan ve panel için özetleyen depo"""
+
+    def __init__(self, path: str = TELEMETRY_FILE, retention: int = TELEMETRY_RETENTION):
+        self.path = path
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    ts REAL,
+                    module TEXT,
+                    kind TEXT,
+                    model TEXT,
+                    prompt_bytes INTEGER,
+                    attachment_bytes INTEGER,
+                    input_tokens INTEGER,
+                    output_tokens INTEGER,
+                    latency REAL,
+                    ttft REAL,
+                    retries INTEGER,
+                    fallbacks INTEGER,
+                    cache_hit INTEGER,
+                    ok INTEGER,
+                    error TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts)")
+            conn.execute("DELETE FROM events WHERE ts < ?", (time.time() - self.retention,))
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def record(self, event: Dict):
+        if not TELEMETRY_ENABLED:
+            return
+        columns = ("ts", "module", "kind", "model", "prompt_bytes", "attachment_bytes", "input_tokens",
+                   "output_tokens", "latency", "ttft", "retries", "fallbacks", "cache_hit", "ok", "error")
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    f"INSERT INTO events ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    tuple(event.get(c) for c in columns),
+                )
+                conn.commit()
+        except sqlite3.Error:
+            # Telemetri hatası asıl isteği asla bozmamalı
+            pass
+
+    def events(self, since: float = 0.0, limit: Optional[int] = None) -> List[Dict]:
+        """Belirtilen zamandan sonraki olaylar (yeniden eskiye)"""
+        sql = "SELECT * FROM events WHERE ts >= ? ORDER BY ts DESC"
+        params: list = [since]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(sql, params)
+            names = [d[0] for d in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def summary(self, since: float = 0.0) -> List[Dict]:
+        """Modül başına hacim, p50 / p95 gecikme, TTFT, token ve önbellek oranı"""
+        groups: Dict[str, List[Dict]] = {}
+        for event in self.events(since):
+            groups.setdefault(event["module"] or "bilinmiyor", []).append(event)
+        rows = []
+        for module, events in groups.items():
+            live = [e for e in events if not e["cache_hit"]]
+            latencies = [e["latency"] for e in live if e["ok"] and e["latency"] is not None]
+            ttfts = [e["ttft"] for e in live if e["ttft"] is not None]
+            rows.append({
+                "modul": module,
+                "cagri": len(events),
+                "p50_sn": round(percentile(latencies, 0.50), 2),
+                "p95_sn": round(percentile(latencies, 0.95), 2),
+                "ort_ttft_sn": round(sum(ttfts) / len(ttfts), 2) if ttfts else None,
+                "giris_token": sum(e["input_tokens"] or 0 for e in events),
+                "cikis_token": sum(e["output_tokens"] or 0 for e in events),
+                "gonderilen_mb": round(sum((e["prompt_bytes"] or 0) + (e["attachment_bytes"] or 0)
+                                           for e in live) / 1024 / 1024, 2),
+                "onbellek_orani": round(sum(1 for e in events if e["cache_hit"]) / len(events), 2),
+                "tekrar": sum(e["retries"] or 0 for e in events),
+                "hata": sum(1 for e in events if not e["ok"]),
+            })
+        return sorted(rows, key=lambda r: -r["p95_sn"])
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM events")
+            conn.commit()
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Sıralı listede en yakın sıra yöntemiyle yüzdelik"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+# Süreç genelinde paylaşılan depo
+telemetry_store = TelemetryStore()
+
+
+# ============================================================================
+# ÇAĞRI İZİ
+# ============================================================================
+
+class CallTrace:
+    """Tek bir AI çağrısının ölçümü; finish() ile depoya yazılır."""
+
+    def __init__(self, kind: str, model: Optional[str] = None, prompt=None,
+                 attachments: Optional[List] = None, module: Optional[str] = None):
+        self.kind = kind
+        self.model = model
+        self.module = module or current_module()
+        self.prompt = prompt
+        self.prompt_bytes = payload_bytes(_text_parts(prompt))
+        self.attachment_bytes = payload_bytes(attachments) + payload_bytes(prompt) - self.prompt_bytes
+        self.start = time.perf_counter()
+        self.ttft: Optional[float] = None
+        self.retries = 0
+        self.fallbacks = 0
+        self.finished = False
+
+    def retry(self, attempt: int = 0, exc: Optional[Exception] = None):
+        """call_with_backoff'un on_retry geri çağrısı"""
+        self.retries += 1
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.start
+
+    def finish(self, model: Optional[str] = None, response=None, text: Optional[str] = None,
+               error: Optional[Exception] = None, cache_hit: bool = False,
+               input_tokens: Optional[int] = None, output_tokens: Optional[int] = None):
+        if self.finished:
+            return
+        self.finished = True
+        used_in, used_out = usage_tokens(response)
+        input_tokens = input_tokens if input_tokens is not None else used_in
+        output_tokens = output_tokens if output_tokens is not None else used_out
+        if input_tokens is None and not cache_hit:
+            input_tokens = count_tokens(_text_parts(self.prompt))
+        if output_tokens is None and text:
+            output_tokens = count_tokens(text)
+        telemetry_store.record({
+            "ts": time.time(),
+            "module": self.module,
+            "kind": self.kind,
+            "model": (model or self.model or "").replace("models/", ""),
+            "prompt_bytes": self.prompt_bytes,
+            "attachment_bytes": self.attachment_bytes,
+            "input_tokens": 0 if cache_hit else input_tokens,
+            "output_tokens": output_tokens,
+            "latency": time.perf_counter() - self.start,
+            "ttft": self.ttft,
+            "retries": self.retries,
+            "fallbacks": self.fallbacks,
+            "cache_hit": int(cache_hit),
+            "ok": int(error is None),
+            "error": str(error)[:200] if error is not None else None,
+        })
+
+
+class TracedStream:
+    """Akışlı yanıtı sarar: ilk parçada TTFT, akış bitince olayı yazar.
+    Diğer öznitelikler (ör. `.text`, `.resolve()`) asıl yanıta yönlendirilir."""
+
+    def __init__(self, response, trace: CallTrace):
+        self._response = response
+        self._trace = trace
+
+    def __iter__(self):
+        text, last = "", None
+        try:
+            for chunk in self._response:
+                self._trace.first_token()
+                last = chunk
+                try:
+                    text += chunk.text or ""
+                except Exception:
+                    pass
+                yield chunk
+        except Exception as e:
+            self._trace.finish(response=last, text=text, error=e)
+            raise
+        self._trace.finish(response=last, text=text)
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+def traced_generate(model, contents, **kwargs):
+    """
+    `model.generate_content(contents, **kwargs)` çağrısını ölçerek yapar.
+    Doğrudan model kullanan eski modüller için (ağ geçidi kendi ölçümünü yapar).
+    """
+    stream = bool(kwargs.get("stream"))
+    trace = CallTrace("stream" if stream else "generate", getattr(model, "model_name", None), contents)
+    try:
+        response = model.generate_content(contents, **kwargs)
+    except Exception as e:
+        trace.finish(error=e)
+        raise
+    if stream:
+        return TracedStream(response, trace)
+    try:
+        text = response.text
+    except Exception:
+        text = None
+    trace.finish(response=response, text=text)
+    return response
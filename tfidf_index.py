@@ -0,0 +1,127 @@
+"""
+Bir Kez Eğitilen TF-IDF Dizini
+
+Mevzuat Soru-Cevap (RAG) sekmesi her soruda TfidfVectorizer'ı belgenin
+tüm parçaları üzerinde yeniden eğitiyordu (fit_transform). Burada parça
+matrisi belge başına bir kez kurulur ve içerik özetiyle saklanır; her
+soruda yalnızca soru dönüştürülür (transform) ve seyrek matris çarpımıyla
+benzerlik hesaplanır. Kurulan dizinler süreç genelinde (LRU) paylaşılır,
+istenirse diske de yazılır (sunucu yeniden başlasa da tekrar eğitilmez).
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import sklearn
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+CACHE_DIR = os.environ.get("HUKUK_CACHE_DIR", "Hukuk_Onbellek")
+TFIDF_DIR = os.path.join(CACHE_DIR, "tfidf")
+TFIDF_PERSIST = os.environ.get("AI_TFIDF_PERSIST", "1") != "0"
+MAX_INDEXES = 16            # Bellekte tutulan en fazla dizin (LRU)
+
+
+def chunks_digest(chunks: Sequence[str]) -> str:
+    """Parça listesinin içerik özeti (sıra dahil)"""
+    h = hashlib.sha256()
+    for chunk in chunks:
+        h.update((chunk or "").encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class TfidfChunkIndex:
+    """Parçalar üzerinde bir kez eğitilmiş vektörleştirici + L2 normlu seyrek matris"""
+
+    def __init__(self, chunks: Sequence[str]):
+        self.chunks = list(chunks)
+        self.vectorizer = TfidfVectorizer()
+        # norm='l2' (varsayılan): satır çarpımı doğrudan kosinüs benzerliğidir
+        self.matrix = self.vectorizer.fit_transform(self.chunks)
+
+    def search(self, question: str, top_k: int = 3) -> List[Tuple[int, float]]:
+        """En benzer parçalar: (sıra no, kosinüs) listesi"""
+        query = self.vectorizer.transform([question])
+        scores = (self.matrix @ query.T).toarray().ravel()
+        if not len(scores):
+            return []
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(i), float(scores[i])) for i in best]
+
+    def relevant_chunks(self, question: str, top_k: int = 3) -> List[str]:
+        return [self.chunks[i] for i, _ in self.search(question, top_k)]
+
+
+# ============================================================================
+# ÖNBELLEK
+# ============================================================================
+
+class TfidfIndexCache:
+    """İçerik özetine göre dizinleri bellekte (LRU) ve isteğe bağlı diskte tutar."""
+
+    def __init__(self, folder: str = TFIDF_DIR, persist: bool = TFIDF_PERSIST, max_indexes: int = MAX_INDEXES):
+        self.folder = folder
+        self.persist = persist
+        self.max_indexes = max_indexes
+        self._indexes: "OrderedDict[str, TfidfChunkIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.fits = 0
+        self.hits = 0
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.folder, f"{digest}.pkl")
+
+    def _load(self, digest: str) -> Optional[TfidfChunkIndex]:
+        try:
+            with open(self._path(digest), "rb") as f:
+                version, index = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+            return None
+        # Farklı scikit-learn sürümüyle kaydedilmiş vektörleştirici güvenilmez
+        return index if version == sklearn.__version__ else None
+
+    def _save(self, digest: str, index: TfidfChunkIndex):
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            tmp = f"{self._path(digest)}.tmp-{os.getpid()}"
+            with open(tmp, "wb") as f:
+                pickle.dump((sklearn.__version__, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(digest))
+        except OSError:
+            pass
+
+    def get(self, chunks: Sequence[str]) -> TfidfChunkIndex:
+        """Parçaların dizinini döndürür; yoksa diskten yükler ya da bir kez eğitir."""
+        digest = chunks_digest(chunks)
+        with self._lock:
+            index = self._indexes.get(digest)
+            if index is not None:
+                self._indexes.move_to_end(digest)
+                self.hits += 1
+                return index
+        index = self._load(digest) if self.persist else None
+        if index is None:
+            index = TfidfChunkIndex(chunks)
+            self.fits += 1
+            if self.persist:
+                self._save(digest, index)
+        with self._lock:
+            self._indexes[digest] = index
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        return index
+
+
+# Süreç genelinde paylaşılan TF-IDF dizin önbelleği
+tfidf_cache = TfidfIndexCache()
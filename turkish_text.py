@@ -0,0 +1,55 @@
+"""
+Türkçe Metin Yardımcıları
+
+Arama, bağlam paketleme ve anahtar kelime eşleştirme modüllerinin ortak
+kullandığı küçük harf / aksan katlama, kelimelere ayırma ve basit gövdeleme.
+"""
+
+import re
+from typing import List
+
+# Türkçe büyük-küçük harf dönüşümü ("I" → "ı", "İ" → "i")
+_LOWER_MAP = str.maketrans({"I": "ı", "İ": "i"})
+# Aksanları ASCII karşılığına katlar (kira / kıra, şirket / sirket eşleşsin)
+_ASCII_MAP = str.maketrans({
+    "ç": "c", "ğ": "g", "ı": "i", "ö": "o", "ş": "s", "ü": "u",
+    "â": "a", "î": "i", "û": "u",
+})
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+STEM_LENGTH = 5     # Eklemeli yapı için kelimenin ilk N harfi gövde kabul edilir
+
+STOPWORDS = {
+    "ve", "veya", "ile", "bir", "bu", "su", "o", "da", "de", "ki", "mi", "mu",
+    "icin", "gibi", "olan", "olarak", "ise", "ama", "fakat", "ancak", "her",
+    "daha", "en", "cok", "kadar", "sonra", "once", "ne", "nasil", "hangi",
+    "nedir", "midir", "mudur", "var", "yok", "the", "of", "and",
+}
+
+
+def turkish_lower(text: str) -> str:
+    """Türkçe kurallarına uygun küçük harfe çevirir."""
+    return text.translate(_LOWER_MAP).lower()
+
+
+def fold(text: str) -> str:
+    """Küçük harf + aksansız biçim (karşılaştırma anahtarı)."""
+    return turkish_lower(text).translate(_ASCII_MAP)
+
+
+def tokenize(text: str) -> List[str]:
+    """Katlanmış kelime listesi"""
+    return _WORD_RE.findall(fold(text))
+
+
+def stem(token: str) -> str:
+    """Çok basit gövdeleme: sayılar aynen, kelimeler ilk STEM_LENGTH harf."""
+    if token.isdigit():
+        return token
+    return token[:STEM_LENGTH]
+
+
+def analyze(text: str) -> List[str]:
+    """Arama terimleri: katla → ayır → durak kelimeleri at → gövdele."""
+    return [stem(t) for t in tokenize(text) if t not in STOPWORDS and (len(t) > 1 or t.isdigit())]
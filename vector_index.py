@@ -0,0 +1,531 @@
+"""
+Kalıcı Vektör Dizini
+
+Mevzuat PDF'inden kurulan FAISS dizini oturum belleğinde tutuluyordu;
+sayfa yenilenince kayboluyor ve her oturum aynı kanunu baştan
+endeksliyordu. Burada dizin, madde metinleri ve bir manifest diske yazılır:
+
+    <CACHE_DIR>/vektor_dizinleri/<dizin_id>/
+        manifest.json          kaynak PDF özeti, parçalayıcı sürümü, embedding modeli, boyut
+        dizin.faiss            FAISS dizini
+        parcalar.bin           madde metinleri (UTF-8, art arda)
+        parcalar_ofset.npy     her maddenin başlangıç / bitiş baytı (int64)
+
+Dizin kimliği kaynak özeti + parçalayıcı sürümü + modelden türetilir; biri
+değişince yeni dizin kurulur. Yükleme bellek eşlemeli (mmap) yapılır ve
+yüklenen dizin süreç genelinde paylaşılır: tüm oturumlar aynı salt okunur
+nesneyi kullanır, 2.000 maddelik bir kanun anında açılır.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from lexical_index import BM25Index
+
+# ============================================================================
+# AYARLAR
+# ============================================================================
+
+CACHE_DIR = os.environ.get("HUKUK_CACHE_DIR", "Hukuk_Onbellek")
+INDEX_ROOT = os.path.join(CACHE_DIR, "vektor_dizinleri")
+MANIFEST_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "dizin.faiss"
+CHUNKS_FILE = "parcalar.bin"
+OFFSETS_FILE = "parcalar_ofset.npy"
+
+
+def source_digest(data: bytes) -> str:
+    """Kaynak dosyanın (PDF) içerik özeti"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_index_id(source_hash: str, chunker_version: str, embed_model: str, kind: str = "flat") -> str:
+    payload = f"{source_hash}\x00{chunker_version}\x00{embed_model.replace('models/', '')}"
+    if kind != "flat":
+        payload += f"\x00{kind}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+# ============================================================================
+# DİZİN TİPLERİ (YAKLAŞIK EN YAKIN KOMŞU)
+# ============================================================================
+
+# flat     : kaba kuvvet, kesin sonuç (küçük kanunlar için)
+# ivf_flat : kümelere bölünmüş, vektörler sıkıştırılmamış (hız)
+# hnsw     : grafik tabanlı, eğitim gerektirmez (hız, bellek biraz artar)
+# ivf_sq8  : kümeler + vektör başına boyut kadar bayt (int8, ~4 kat küçük)
+# ivf_pq   : kümeler + ürün nicemleme (boyut / 4 bayt, ~16 kat küçük; recall daha düşük)
+INDEX_KINDS = ("flat", "ivf_flat", "hnsw", "ivf_sq8", "ivf_pq")
+INDEX_KIND = os.environ.get("AI_INDEX_KIND", "auto")
+RECALL_TARGET = float(os.environ.get("AI_INDEX_RECALL_TARGET", "0.95"))
+AUTO_FLAT_LIMIT = 20000         # Bundan küçük derlemlerde kaba kuvvet yeterince hızlı
+MIN_TRAIN_PER_LIST = 39         # FAISS'in küme başına önerdiği asgari eğitim örneği
+PQ_BITS = 8
+HNSW_M = 32
+NPROBE_STEPS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+EF_SEARCH_STEPS = (16, 32, 64, 128, 256, 512)
+
+
+def choose_index_kind(n: int, kind: str = INDEX_KIND) -> str:
+    """'auto' ise derlem büyüklüğüne göre seçer; eğitilemeyecek kadar küçükse flat'e düşer."""
+    if kind == "auto":
+        # int8 nicemleme kıyaslamada top-5 recall'u 0,95 üstünde tutarken belleği ~4 kat düşürür
+        kind = "flat" if n < AUTO_FLAT_LIMIT else "ivf_sq8"
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Bilinmeyen dizin tipi: {kind}")
+    if kind.startswith("ivf") and n < MIN_TRAIN_PER_LIST * 4:
+        return "flat"
+    if kind == "ivf_pq" and n < MIN_TRAIN_PER_LIST * (1 << PQ_BITS):
+        # PQ kod kitabı 256 merkez ister; az veride int8 nicemleme kullanılır
+        return "ivf_sq8"
+    return kind
+
+
+def _nlist(n: int) -> int:
+    """Küme sayısı: ~4·√n, her kümeye yeterli eğitim örneği düşecek şekilde"""
+    return int(max(1, min(4 * int(np.sqrt(n)), n // MIN_TRAIN_PER_LIST, 65536)))
+
+
+def _pq_m(dim: int) -> int:
+    """Alt nicemleyici sayısı: boyutu bölen, alt vektörü ~4 boyutlu en büyük m
+    (8 boyutlu alt vektörlerde top-5 recall 0,5 civarında kalıyor)"""
+    for m in range(max(1, dim // 4), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def build_faiss_index(vectors: np.ndarray, kind: str = INDEX_KIND) -> Tuple[object, Dict]:
+    """
+    Vektörlerden istenen tipte dizin kurar (gerekirse eğitir). (dizin, parametreler)
+    döner; parametreler manifeste yazılır.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    kind = choose_index_kind(n, kind)
+    params: Dict = {"dizin_tipi": kind}
+    if kind == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        params["hnsw_m"] = HNSW_M
+    else:
+        nlist = _nlist(n)
+        quantizer = faiss.IndexFlatL2(dim)
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        elif kind == "ivf_sq8":
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, faiss.ScalarQuantizer.QT_8bit)
+        else:
+            m = _pq_m(dim)
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, PQ_BITS)
+            params["pq_m"] = m
+        index.train(vectors)
+        params["nlist"] = nlist
+    index.add(vectors)
+    return index, params
+
+
+def set_search_params(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """nprobe (IVF) / efSearch (HNSW) ayarlar; dizin tipine uymayan parametre yok sayılır."""
+    if nprobe:
+        try:
+            faiss.extract_index_ivf(index).nprobe = int(nprobe)
+        except Exception:
+            pass
+    if ef_search and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = int(ef_search)
+
+
+def bytes_per_vector(index) -> float:
+    """Serileştirilmiş dizin büyüklüğünün vektör başına payı (bellek / disk maliyeti)"""
+    if not index.ntotal:
+        return 0.0
+    return float(faiss.serialize_index(index).nbytes) / index.ntotal
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """Her sorguda kesin ilk k sonucun ne kadarının bulunduğu (ortalama)"""
+    k = truth.shape[1]
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / float(truth.shape[0] * k)
+
+
+def tune_search(index, vectors: np.ndarray, kind: str, target: float = RECALL_TARGET,
+                k: int = 5, sample: int = 200, seed: int = 0) -> Dict:
+    """
+    Derlemden örneklenen (hafif gürültülü) sorgularla hedef recall'a ulaşan en
+    küçük nprobe / efSearch değerini bulur ve dizine uygular.
+    """
+    if kind == "flat":
+        return {}
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(sample, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(0, 0.01, size=(len(picks), vectors.shape[1])).astype(np.float32)
+    truth = _exact_neighbours(vectors, queries, k)
+    steps, name = (EF_SEARCH_STEPS, "ef_search") if kind == "hnsw" else (NPROBE_STEPS, "nprobe")
+    chosen, recall = steps[-1], 0.0
+    for value in steps:
+        if name == "nprobe" and value > faiss.extract_index_ivf(index).nlist:
+            break
+        set_search_params(index, **{name: value})
+        recall = recall_at_k(index.search(queries, k)[1], truth)
+        chosen = value
+        if recall >= target:
+            break
+    set_search_params(index, **{name: chosen})
+    return {name: chosen, "olculen_recall": round(recall, 3)}
+
+
+def _exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    return flat.search(queries, k)[1]
+
+
+def benchmark_index_kinds(vectors: np.ndarray, queries: np.ndarray, kinds: Sequence[str] = INDEX_KINDS,
+                          k: int = 5) -> List[Dict]:
+    """
+    Her dizin tipini kesin (flat) sonuca karşı ölçer: recall@k, sorgu başına
+    gecikme, vektör başına bayt ve kurulum süresi. nprobe / efSearch
+    basamakları ayrı satırlar olarak döner (recall - gecikme eğrisi).
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    truth = _exact_neighbours(vectors, queries, k)
+    rows = []
+    for requested in kinds:
+        start = time.perf_counter()
+        index, params = build_faiss_index(vectors, requested)
+        build_time = time.perf_counter() - start
+        kind = params["dizin_tipi"]
+        size = bytes_per_vector(index)
+        if kind == "flat":
+            settings = [{}]
+        elif kind == "hnsw":
+            settings = [{"ef_search": v} for v in EF_SEARCH_STEPS]
+        else:
+            settings = [{"nprobe": v} for v in NPROBE_STEPS if v <= params["nlist"]]
+        for setting in settings:
+            set_search_params(index, **setting)
+            start = time.perf_counter()
+            found = index.search(queries, k)[1]
+            elapsed = time.perf_counter() - start
+            rows.append({
+                "istenen": requested,
+                "dizin_tipi": kind,
+                "ayar": ", ".join(f"{key}={value}" for key, value in setting.items()) or "-",
+                f"recall@{k}": round(recall_at_k(found, truth), 3),
+                "sorgu_ms": round(elapsed / len(queries) * 1000, 3),
+                "bayt_vektor": round(size, 1),
+                "kurulum_sn": round(build_time, 2),
+            })
+    return rows
+
+
+# ============================================================================
+# PARÇA DEPOSU
+# ============================================================================
+
+class ChunkStore:
+    """Madde metinlerine bellek eşlemeli, sıra numarasıyla erişim (liste gibi davranır)"""
+
+    def __init__(self, folder: str):
+        self.offsets = np.load(os.path.join(folder, OFFSETS_FILE), mmap_mode="r")
+        path = os.path.join(folder, CHUNKS_FILE)
+        self._file = open(path, "rb")
+        # Boş dosya mmap'lenemez
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+
+    @staticmethod
+    def write(folder: str, chunks: Sequence[str]):
+        offsets = [0]
+        with open(os.path.join(folder, CHUNKS_FILE), "wb") as f:
+            for chunk in chunks:
+                data = chunk.encode("utf-8")
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        np.save(os.path.join(folder, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return max(0, len(self.offsets) - 1)
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._data[int(self.offsets[i]):int(self.offsets[i + 1])].decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+# ============================================================================
+# DİZİN
+# ============================================================================
+
+class PersistentIndex:
+    """Diskten yüklenmiş salt okunur dizin + parçalar + manifest"""
+
+    def __init__(self, folder: str, manifest: Dict, index, chunks: ChunkStore):
+        self.folder = folder
+        self.manifest = manifest
+        self.index = index
+        self.chunks = chunks
+        self._lock = threading.Lock()
+        self._lexical = None
+        # Kurulumda ayarlanan nprobe / efSearch varsayılan olur
+        set_search_params(index, **{k: v for k, v in manifest.get("arama", {}).items()
+                                    if k in ("nprobe", "ef_search")})
+
+    @property
+    def kind(self) -> str:
+        return self.manifest.get("dizin_tipi", "flat")
+
+    def lexical(self):
+        """Aynı parçalar üzerinde BM25 dizini (yüklemede kurulur, oturumlar paylaşır)"""
+        with self._lock:
+            if self._lexical is None:
+                self._lexical = BM25Index(self.chunks)
+            return self._lexical
+
+    @property
+    def index_id(self) -> str:
+        return self.manifest["dizin_id"]
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search(self, query_vectors: np.ndarray, k: int = 5, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None):
+        """
+        FAISS search: (mesafeler, sıra numaraları); eksik sonuçlar -1 ile döner.
+        nprobe / efSearch yalnızca bu arama için geçerlidir (paylaşılan dizin değişmez).
+        """
+        query_vectors = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.manifest["boyut"])
+        k = min(k, max(1, len(self)))
+        if not (nprobe or ef_search) or self.kind == "flat":
+            return self.index.search(query_vectors, k)
+        params = _search_parameters(self.kind, nprobe, ef_search)
+        if params is not None:
+            return self.index.search(query_vectors, k, params=params)
+        # Eski FAISS: ayar geçici olarak dizine yazılır, aramalar sıraya girer
+        default = self.manifest.get("arama", {})
+        with self._lock:
+            set_search_params(self.index, nprobe, ef_search)
+            try:
+                return self.index.search(query_vectors, k)
+            finally:
+                set_search_params(self.index, default.get("nprobe"), default.get("ef_search"))
+
+
+def _search_parameters(kind: str, nprobe: Optional[int], ef_search: Optional[int]):
+    """Arama başına parametre nesnesi (FAISS >= 1.7.3); desteklenmiyorsa None"""
+    try:
+        if kind == "hnsw" and ef_search:
+            return faiss.SearchParametersHNSW(efSearch=int(ef_search))
+        if kind.startswith("ivf") and nprobe:
+            return faiss.SearchParametersIVF(nprobe=int(nprobe))
+    except (AttributeError, TypeError):
+        return None
+    return None
+
+
+def _read_faiss(path: str):
+    """Mümkünse bellek eşlemeli ve salt okunur okur; desteklenmiyorsa normal okur."""
+    flags = getattr(faiss, "IO_FLAG_MMAP", 0) | getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+    if flags:
+        try:
+            return faiss.read_index(path, flags)
+        except Exception:
+            pass
+    return faiss.read_index(path)
+
+
+class IndexStore:
+    """Diskteki dizinleri yöneten ve yüklenenleri süreç genelinde paylaştıran depo"""
+
+    def __init__(self, root: str = INDEX_ROOT):
+        self.root = root
+        self._lock = threading.Lock()
+        self._loaded: Dict[str, PersistentIndex] = {}
+
+    def _folder(self, index_id: str) -> str:
+        return os.path.join(self.root, index_id)
+
+    def exists(self, index_id: str) -> bool:
+        return os.path.exists(os.path.join(self._folder(index_id), MANIFEST_FILE))
+
+    def save(self, index_id: str, index, chunks: Sequence[str], manifest: Dict) -> PersistentIndex:
+        """
+        Dizini ve parçaları geçici klasöre yazar, sonra tek adımda yerine taşır
+        (yarım yazılmış dizin hiçbir zaman okunmaz). Yüklenmiş dizini döndürür.
+        """
+        if index.ntotal != len(chunks):
+            raise ValueError(f"Dizin ({index.ntotal}) ve parça ({len(chunks)}) sayısı uyuşmuyor")
+        os.makedirs(self.root, exist_ok=True)
+        folder = self._folder(index_id)
+        tmp = f"{folder}.tmp-{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        manifest = dict(manifest, surum=MANIFEST_VERSION, dizin_id=index_id, boyut=int(index.d),
+                        parca_sayisi=len(chunks), olusturma=time.time())
+        faiss.write_index(index, os.path.join(tmp, INDEX_FILE))
+        ChunkStore.write(tmp, chunks)
+        with open(os.path.join(tmp, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        with self._lock:
+            self._loaded.pop(index_id, None)
+            if os.path.exists(folder):
+                shutil.rmtree(folder, ignore_errors=True)
+            os.replace(tmp, folder)
+        return self.load(index_id)
+
+    def load(self, index_id: str) -> Optional[PersistentIndex]:
+        """Dizini (ilk seferde diskten, sonra bellekten) döndürür; yoksa None."""
+        with self._lock:
+            loaded = self._loaded.get(index_id)
+            if loaded is not None:
+                return loaded
+            folder = self._folder(index_id)
+            try:
+                with open(os.path.join(folder, MANIFEST_FILE), encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                return None
+            if manifest.get("surum") != MANIFEST_VERSION:
+                return None
+            loaded = PersistentIndex(folder, manifest, _read_faiss(os.path.join(folder, INDEX_FILE)),
+                                     ChunkStore(folder))
+            self._loaded[index_id] = loaded
+        # BM25 yüklemede kurulur; ilk aramanın süre bütçesine binmez
+        loaded.lexical()
+        return loaded
+
+    def list(self) -> List[Dict]:
+        """Diskteki dizinlerin manifestleri (yeniden eskiye)"""
+        manifests = []
+        if not os.path.isdir(self.root):
+            return manifests
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name, MANIFEST_FILE)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    manifests.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(manifests, key=lambda m: -m.get("olusturma", 0))
+
+    def delete(self, index_id: str):
+        with self._lock:
+            self._loaded.pop(index_id, None)
+            shutil.rmtree(self._folder(index_id), ignore_errors=True)
+
+
+# Süreç genelinde paylaşılan dizin deposu
+index_store = IndexStore()
+
+
+# ============================================================================
+# ARTIMLI (OTURUM) DİZİNİ
+# ============================================================================
+
+class IncrementalIndex:
+    """
+    Parçaları eklendikçe vektörleyip ekleyen, kimlikle çıkarılabilen dizin.
+    Sorgu anında yalnızca soru vektöre çevrilir; derlemin tamamı aranır.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.texts: Dict[int, str] = {}
+        self.next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def add(self, texts: Sequence[str], vectors: np.ndarray) -> List[int]:
+        """Parçaları ve vektörlerini ekler, verilen kimlikleri döndürür."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(texts) != len(vectors):
+            raise ValueError(f"Parça ({len(texts)}) ve vektör ({len(vectors)}) sayısı uyuşmuyor")
+        if not len(texts):
+            return []
+        with self._lock:
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+            ids = list(range(self.next_id, self.next_id + len(texts)))
+            self.next_id += len(texts)
+            self.index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+            self.texts.update(zip(ids, texts))
+        return ids
+
+    def remove(self, ids: Sequence[int]):
+        with self._lock:
+            ids = [i for i in ids if i in self.texts]
+            if not ids or self.index is None:
+                return
+            self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+            for i in ids:
+                del self.texts[i]
+
+    def clear(self):
+        with self._lock:
+            self.index = None
+            self.texts = {}
+
+    def search(self, query_vectors: np.ndarray, k: int = 5) -> List[Tuple[int, str, float]]:
+        """İlk sorgu için (kimlik, metin, mesafe) listesi"""
+        with self._lock:
+            if self.index is None or not self.texts:
+                return []
+            query_vectors = np.asarray(query_vectors, dtype=np.float32).reshape(1, -1)
+            D, I = self.index.search(query_vectors, min(k, len(self.texts)))
+            return [(int(i), self.texts[int(i)], float(d)) for d, i in zip(D[0], I[0]) if i >= 0]
+
+
+# ============================================================================
+# KOMUT SATIRI: recall - gecikme kıyaslaması
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Dizin tiplerini kesin (flat) aramaya karşı kıyaslar")
+    parser.add_argument("--vectors", help="(n, boyut) float32 .npy dosyası; verilmezse sentetik kümeli veri")
+    parser.add_argument("-n", type=int, default=100000, help="Sentetik vektör sayısı")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--kinds", default=",".join(INDEX_KINDS))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.vectors:
+        data = np.load(args.vectors, mmap_mode="r").astype(np.float32)
+    else:
+        # Gerçek embedding'lere benzesin diye kümeli, birim normlu veri
+        centers = rng.normal(size=(max(1, args.n // 500), args.dim)).astype(np.float32)
+        data = centers[rng.integers(0, len(centers), args.n)] + 0.3 * rng.normal(size=(args.n, args.dim)).astype(np.float32)
+        data /= np.linalg.norm(data, axis=1, keepdims=True)
+    picks = rng.choice(len(data), size=min(args.queries, len(data)), replace=False)
+    queries = data[picks] + 0.01 * rng.normal(size=(len(picks), data.shape[1])).astype(np.float32)
+
+    rows = benchmark_index_kinds(data, queries, args.kinds.split(","), args.k)
+    columns = list(rows[0])
+    print("  ".join(f"{c:>12}" for c in columns))
+    for row in rows:
+        print("  ".join(f"{str(row[c]):>12}" for c in columns))